@@ -0,0 +1,199 @@
+"""
+In-process cache of verified access tokens
+- token hash -> immutable snapshot of the user it authenticates, plus the
+  token's session id so cache hits still go through the revocation check
+- Entries live for AUTH_CACHE_TTL seconds at most, and never past the
+  token's own expiry
+- Invalidated per token (logout) or per user (deactivation, profile
+  changes, refresh-token revocation); logged-out tokens stay denied until
+  they expire
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+import uuid
+
+from src.cache import TTLCache
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the fields request handlers use from auth_models.User"""
+    id: uuid.UUID
+    email: str
+    name: str
+    thread_id: Optional[str]
+    created_at: Optional[datetime]
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            thread_id=user.thread_id,
+            created_at=user.created_at,
+            is_active=bool(user.is_active),
+        )
+
+
+def token_key(token: str) -> str:
+    """Tokens are keyed by hash so raw credentials are never held as cache keys"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class AuthCache:
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, maxsize: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._denied = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._keys_by_user: Dict[uuid.UUID, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_denied(self, token: str) -> bool:
+        return self._denied.get(token_key(token)) is not None
+
+    def get(self, token: str) -> Optional[Tuple[UserSnapshot, Optional[str]]]:
+        """(user snapshot, session id) cached for token, or None"""
+        entry = self._users.get(token_key(token))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, token: str, user, expires_at: Optional[float] = None,
+            sid: Optional[str] = None) -> UserSnapshot:
+        """Cache the user (and the token's session id) for token and return its snapshot"""
+        snapshot = user if isinstance(user, UserSnapshot) else UserSnapshot.from_user(user)
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl > 0:
+            key = token_key(token)
+            self._users.set(key, (snapshot, sid), ttl=ttl)
+            with self._lock:
+                # Drop keys that expired or were evicted, so a user's set holds
+                # live tokens only instead of one hash per refresh forever
+                live = {k for k in self._keys_by_user.get(snapshot.id, ()) if k in self._users}
+                live.add(key)
+                self._keys_by_user[snapshot.id] = live
+        return snapshot
+
+    def invalidate_token(self, token: str, expires_at: Optional[float] = None) -> None:
+        """Forget token; with expires_at, also deny it until then (logout)"""
+        key = token_key(token)
+        self._users.delete(key)
+        if expires_at is not None and expires_at > time.time():
+            self._denied.set(key, True, ttl=expires_at - time.time())
+
+    def invalidate_user(self, user_id: Any) -> None:
+        """Drop every cached token of a user, e.g. after deactivation or an update"""
+        if not isinstance(user_id, uuid.UUID):
+            user_id = uuid.UUID(str(user_id))
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, set())
+        for key in keys:
+            self._users.delete(key)
+
+    def clear(self) -> None:
+        self._users.clear()
+        with self._lock:
+            self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._users),
+            "denied": len(self._denied),
+        }
+
+
+auth_cache = AuthCache()
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_auth_cache(requests: int = 20000, users: int = 200, concurrency: int = 200,
+                         db_latency: float = 0.002):
+    """
+    Resolve `requests` bearer tokens through AuthService.get_current_user at
+    `concurrency`, with and without the cache. The session is an in-memory
+    stand-in whose queries take `db_latency` seconds, like a pooled round trip.
+    """
+    import asyncio
+    from datetime import timezone
+    from types import SimpleNamespace
+
+    from .auth_service import AuthService
+    from .auth_utils import create_access_token
+
+    people = [
+        SimpleNamespace(id=uuid.uuid4(), email=f"user{i}@example.com", name=f"User {i}",
+                        thread_id=str(uuid.uuid4()), created_at=datetime.now(timezone.utc), is_active=True)
+        for i in range(users)
+    ]
+    tokens = [create_access_token(data={"sub": str(person.id), "sid": str(uuid.uuid4())}) for person in people]
+    by_id = {person.id: person for person in people}
+
+    class _Session:
+        queries = 0
+
+        async def execute(self, statement):
+            _Session.queries += 1
+            await asyncio.sleep(db_latency)
+            user_id = statement.compile().params["id_1"]
+            return SimpleNamespace(scalar_one_or_none=lambda: by_id.get(user_id))
+
+    async def run(cache: AuthCache):
+        import src.Auth.auth_service as service
+
+        original = service.auth_cache
+        service.auth_cache = cache
+        _Session.queries = 0
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                await AuthService.get_current_user(_Session(), tokens[i % users])
+                latencies.append(time.perf_counter() - start)
+
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+        finally:
+            service.auth_cache = original
+        latencies.sort()
+        return (requests / elapsed, latencies[len(latencies) // 2] * 1000,
+                latencies[int(len(latencies) * 0.99)] * 1000, _Session.queries)
+
+    print(f"\n⏱️ Auth dependency benchmark ({requests} requests, {users} users, "
+          f"concurrency {concurrency}, {db_latency * 1000:.1f} ms per query)")
+    print("=" * 60)
+    print(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}")
+    for mode, cache in (("no cache", AuthCache(ttl=0)), ("cache", AuthCache())):
+        rps, p50, p99, queries = asyncio.run(run(cache))
+        print(f"{mode:<10}{rps:>10.0f}{p50:>10.2f}{p99:>10.2f}{queries:>10}")
+
+
+if __name__ == "__main__":
+    benchmark_auth_cache()
@@ -23,7 +23,9 @@ class RefreshToken(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    token = Column(String(512), unique=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    # One login; rotation keeps it, revocation ends it (access tokens carry it as "sid")
+    session_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    token = Column(String(512), unique=True, nullable=False)  # sha256 of the token, never the token
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_revoked = Column(Boolean, default=False)
\ No newline at end of file
@@ -1,8 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from . import auth_models, auth_utils, auth_schemas
+from . import auth_models, auth_utils, auth_schemas, token_store
+from .auth_cache import auth_cache, UserSnapshot
 from fastapi import HTTPException, status
 import uuid
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 
 class AuthService:
     @staticmethod
@@ -47,10 +52,10 @@ class AuthService:
         
         # Generate thread_id for the new user
         thread_id = str(uuid.uuid4())
-        print(f"🆕 Creating user with thread_id: {thread_id}")
+        logger.debug("Creating user", extra={"new_thread_id": thread_id})
         
         # Create new user with thread_id
-        hashed_password = auth_utils.get_password_hash(user_data.password)
+        hashed_password = await AuthService._hash_password(user_data.password)
         db_user = auth_models.User(
             email=user_data.email,
             name=user_data.name,
@@ -91,16 +96,65 @@ class AuthService:
         )
         user = result.scalar_one_or_none()
         
-        if not user or not auth_utils.verify_password(password, user.password_hash):
+        valid = False
+        if user:
+            try:
+                valid, new_hash = await auth_utils.verify_password_async(password, user.password_hash)
+            except auth_utils.PasswordHashBusy:
+                raise AuthService._busy()
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
+
+        # Stored with a different bcrypt cost: upgrade it while we have the password
+        if new_hash:
+            user.password_hash = new_hash
+            await db.commit()
+            await db.refresh(user)
         
         return user
 
+    @staticmethod
+    async def _hash_password(password: str) -> str:
+        try:
+            return await auth_utils.get_password_hash_async(password)
+        except auth_utils.PasswordHashBusy:
+            raise AuthService._busy()
+
+    @staticmethod
+    def _busy() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
     @staticmethod
     async def get_current_user(db: AsyncSession, token: str):
+        """
+        User snapshot for a valid access token. Verified tokens are served
+        from auth_cache for a short TTL, skipping JWT decoding and the query;
+        their session is still checked against the revocation bloom filter,
+        so a revoked session is refused on its next request.
+        """
+        cached = auth_cache.get(token)
+        if cached is not None:
+            snapshot, sid = cached
+            if sid and await token_store.revocations.is_revoked(db, sid):
+                auth_cache.invalidate_token(token)
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Session revoked"
+                )
+            return snapshot
+        if auth_cache.is_denied(token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
+
         payload = auth_utils.verify_token(token)
         if not payload:
             raise HTTPException(
@@ -114,6 +168,14 @@ class AuthService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
+
+        # Logged-out or compromised session (bloom filter; rarely a query)
+        sid = payload.get("sid")
+        if sid and await token_store.revocations.is_revoked(db, sid):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Session revoked"
+            )
         
         result = await db.execute(
             select(auth_models.User).where(
@@ -128,5 +190,39 @@ class AuthService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
-        
-        return user
\ No newline at end of file
+
+        # Ensure user has thread_id - create one if missing
+        if not user.thread_id:
+            user.thread_id = str(uuid.uuid4())
+            await db.commit()
+            await db.refresh(user)
+            logger.info("Created thread_id for user", extra={"user_id": str(user.id), "new_thread_id": user.thread_id})
+        
+        return auth_cache.put(token, user, expires_at=payload.get("exp"), sid=sid)
+
+    @staticmethod
+    async def set_thread_id(db: AsyncSession, user_id: uuid.UUID, thread_id: str):
+        """Point the user at a new conversation thread"""
+        user = await db.get(auth_models.User, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        user.thread_id = thread_id
+        await db.commit()
+        auth_cache.invalidate_user(user_id)
+        return UserSnapshot.from_user(user)
+
+    @staticmethod
+    async def deactivate_user(db: AsyncSession, user_id: uuid.UUID):
+        """Disable the account; its sessions and cached tokens stop working immediately"""
+        user = await db.get(auth_models.User, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        user.is_active = False
+        await db.commit()
+        await token_store.revoke_user_sessions(db, user_id)
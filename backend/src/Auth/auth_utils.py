@@ -1,4 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
@@ -13,7 +16,22 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with another cost are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL while hashing, so threads keep the event loop free
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash requests allowed to wait for a worker before logins are shed
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+
+class PasswordHashBusy(RuntimeError):
+    """The hashing queue is full"""
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -21,6 +39,26 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_in_hash_pool(fn, *args):
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE:
+        raise PasswordHashBusy("password hashing queue is full")
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify off the event loop. Returns (valid, new_hash); new_hash is set when
+    the stored hash uses an outdated cost and should be replaced.
+    """
+    return await _run_in_hash_pool(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_in_hash_pool(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -43,4 +81,57 @@ def verify_token(token: str):
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_login_storm(logins: int = 20, streams: int = 20, tick: float = 0.02):
+    """
+    `streams` simulated chat streams emit a token every `tick` seconds while
+    `logins` password checks run, first inline on the event loop (the old
+    handlers) and then through the hash pool. Reports how late tokens arrive.
+    """
+    import time
+
+    stored = get_password_hash("correct horse battery staple")
+
+    async def storm(offloaded: bool):
+        lateness = []
+        done = asyncio.Event()
+
+        async def chat_stream():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(tick)
+                lateness.append(time.perf_counter() - start - tick)
+
+        async def login():
+            if offloaded:
+                await verify_password_async("correct horse battery staple", stored)
+            else:
+                verify_password("correct horse battery staple", stored)
+            await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(chat_stream()) for _ in range(streams)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*tasks)
+        lateness.sort()
+        return (elapsed, lateness[len(lateness) // 2] * 1000,
+                lateness[int(len(lateness) * 0.99)] * 1000, lateness[-1] * 1000)
+
+    print(f"\n⏱️ Login storm benchmark ({logins} logins, {streams} chat streams, "
+          f"bcrypt rounds {BCRYPT_ROUNDS}, {PASSWORD_HASH_WORKERS} hash workers)")
+    print("=" * 60)
+    print(f"{'mode':<10}{'logins s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}  (token lateness)")
+    for mode, offloaded in (("inline", False), ("pool", True)):
+        elapsed, p50, p99, worst = asyncio.run(storm(offloaded))
+        print(f"{mode:<10}{elapsed:>10.2f}{p50:>10.2f}{p99:>10.2f}{worst:>10.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_login_storm()
@@ -0,0 +1,342 @@
+"""
+Refresh-token store backed by the refresh_tokens table
+- Refresh tokens are opaque random strings; only their sha256 is stored
+  (the unique `token` column), so lookups go through its index
+- Each login starts a session; every refresh rotates the token inside it
+  and presenting an already-rotated token revokes the whole session
+- Access tokens carry the session id ("sid"). Revoked sessions are kept in
+  a bloom filter in front of a small LRU, so authenticated requests only
+  reach Postgres for the rare bloom positive
+- A background task re-syncs revocations from other workers and purges
+  expired rows in batches
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import TTLCache
+from src.logging_config import get_logger
+from . import auth_models, auth_utils
+from .auth_cache import auth_cache
+
+logger = get_logger(__name__)
+
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))
+REVOCATION_FALSE_POSITIVE_RATE = float(os.getenv("REVOCATION_FALSE_POSITIVE_RATE", "0.001"))
+REVOCATION_LRU_SIZE = int(os.getenv("REVOCATION_LRU_SIZE", "10000"))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "60"))
+REFRESH_TOKEN_PURGE_INTERVAL = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600"))
+REFRESH_TOKEN_PURGE_BATCH = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH", "1000"))
+
+REFRESH_TOKEN_EXPIRE_SECONDS = auth_utils.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# ============================================================================
+# REVOCATION LIST
+# ============================================================================
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int = REVOCATION_CAPACITY,
+                 false_positive_rate: float = REVOCATION_FALSE_POSITIVE_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """
+    Revoked session ids. A bloom miss means "not revoked" with certainty;
+    a hit is confirmed from the LRU or, failing that, the database.
+    """
+
+    def __init__(self, capacity: int = REVOCATION_CAPACITY):
+        self.capacity = capacity
+        self.bloom = BloomFilter(capacity)
+        # sid -> revoked?; revocation is final, "not revoked" is rechecked after a minute
+        self.confirmed = TTLCache(maxsize=REVOCATION_LRU_SIZE, ttl=REFRESH_TOKEN_EXPIRE_SECONDS)
+        self.checks = 0
+        self.bloom_hits = 0
+        self.db_checks = 0
+        self.synced_at = 0.0
+        # Revoked here since the last sync: a concurrent sync query may predate them
+        self._local: Dict[str, float] = {}
+
+    def add(self, sid: str) -> None:
+        self.bloom.add(sid)
+        self.confirmed.set(sid, True)
+        self._local[sid] = time.time()
+
+    def replace(self, sids: Iterable[str], queried_at: float) -> None:
+        """Rebuild from the revoked, unexpired sessions read from the database at queried_at"""
+        sids = list(sids)
+        self._local = {sid: at for sid, at in self._local.items() if at >= queried_at - 1}
+        bloom = BloomFilter(max(self.capacity, 2 * (len(sids) + len(self._local))))
+        for sid in sids + list(self._local):
+            bloom.add(sid)
+        self.bloom = bloom
+        self.synced_at = time.time()
+
+    async def is_revoked(self, db: AsyncSession, sid: str) -> bool:
+        self.checks += 1
+        if sid not in self.bloom:
+            return False
+        self.bloom_hits += 1
+        known = self.confirmed.get(sid)
+        if known is not None:
+            return known
+        self.db_checks += 1
+        revoked = await session_is_revoked(db, sid)
+        self.confirmed.set(sid, revoked, ttl=None if revoked else 60)
+        return revoked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checks": self.checks,
+            "bloom_hits": self.bloom_hits,
+            "db_checks": self.db_checks,
+            "revoked_sessions": self.bloom.count,
+            "synced_at": self.synced_at,
+        }
+
+
+revocations = RevocationList()
+
+
+# ============================================================================
+# REFRESH TOKENS
+# ============================================================================
+
+def _session_rows(sid: str):
+    return auth_models.RefreshToken.session_id == uuid.UUID(sid)
+
+
+async def session_is_revoked(db: AsyncSession, sid: str) -> bool:
+    """A session is revoked once none of its tokens is still usable"""
+    active = await db.execute(
+        select(exists().where(_session_rows(sid), auth_models.RefreshToken.is_revoked == False))
+    )
+    return not active.scalar()
+
+
+def issue_refresh_token(db: AsyncSession, user_id: uuid.UUID,
+                        session_id: Optional[uuid.UUID] = None) -> Tuple[str, uuid.UUID]:
+    """Create a refresh token (a new session unless session_id is given); caller commits"""
+    token = secrets.token_urlsafe(48)
+    session_id = session_id or uuid.uuid4()
+    db.add(auth_models.RefreshToken(
+        user_id=user_id,
+        session_id=session_id,
+        token=hash_refresh_token(token),
+        expires_at=datetime.utcnow() + timedelta(days=auth_utils.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token, session_id
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[str, uuid.UUID, uuid.UUID]]:
+    """
+    Exchange a refresh token for a new one in the same session.
+    Returns (token, session_id, user_id), or None when the token is unknown,
+    expired or was already used - reuse revokes the session.
+    """
+    result = await db.execute(
+        select(auth_models.RefreshToken)
+        .where(auth_models.RefreshToken.token == hash_refresh_token(token))
+        .with_for_update()
+    )
+    row = result.scalar_one_or_none()
+    if row is None or row.expires_at < datetime.utcnow():
+        return None
+    if row.is_revoked:
+        # A rotated token came back: it leaked, so end the session for everyone
+        if row.session_id is not None:
+            await revoke_session(db, str(row.session_id), row.user_id)
+        return None
+
+    row.is_revoked = True
+    new_token, session_id = issue_refresh_token(db, row.user_id, row.session_id)
+    await db.commit()
+    return new_token, session_id, row.user_id
+
+
+async def revoke_session(db: AsyncSession, sid: str, user_id: Optional[uuid.UUID] = None) -> None:
+    """Revoke every token of a session; its access tokens stop working at once"""
+    await db.execute(
+        update(auth_models.RefreshToken)
+        .where(_session_rows(sid), auth_models.RefreshToken.is_revoked == False)
+        .values(is_revoked=True)
+    )
+    await db.commit()
+    revocations.add(sid)
+    if user_id is not None:
+        auth_cache.invalidate_user(user_id)
+
+
+async def revoke_user_sessions(db: AsyncSession, user_id: uuid.UUID) -> None:
+    """Revoke every open session of a user (deactivation)"""
+    result = await db.execute(
+        select(auth_models.RefreshToken.session_id)
+        .where(auth_models.RefreshToken.user_id == user_id, auth_models.RefreshToken.is_revoked == False)
+        .distinct()
+    )
+    sids = [str(sid) for sid in result.scalars() if sid is not None]
+    await db.execute(
+        update(auth_models.RefreshToken)
+        .where(auth_models.RefreshToken.user_id == user_id, auth_models.RefreshToken.is_revoked == False)
+        .values(is_revoked=True)
+    )
+    await db.commit()
+    for sid in sids:
+        revocations.add(sid)
+    auth_cache.invalidate_user(user_id)
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> None:
+    result = await db.execute(
+        select(auth_models.RefreshToken.session_id, auth_models.RefreshToken.user_id)
+        .where(auth_models.RefreshToken.token == hash_refresh_token(token))
+    )
+    row = result.first()
+    if row is not None and row.session_id is not None:
+        await revoke_session(db, str(row.session_id), row.user_id)
+
+
+# ============================================================================
+# BACKGROUND MAINTENANCE
+# ============================================================================
+
+async def sync_revocations(db: AsyncSession) -> int:
+    """Reload revoked sessions whose tokens have not expired yet (covers other workers)"""
+    queried_at = time.time()
+    result = await db.execute(
+        select(auth_models.RefreshToken.session_id)
+        .where(auth_models.RefreshToken.session_id.isnot(None))
+        .group_by(auth_models.RefreshToken.session_id)
+        .having(func.bool_and(auth_models.RefreshToken.is_revoked))
+        .having(func.max(auth_models.RefreshToken.expires_at) > datetime.utcnow())
+    )
+    sids = [str(sid) for sid in result.scalars()]
+    revocations.replace(sids, queried_at)
+    return len(sids)
+
+
+async def purge_expired_refresh_tokens(db: AsyncSession, batch_size: int = REFRESH_TOKEN_PURGE_BATCH) -> int:
+    """Delete expired rows batch by batch so no single statement holds long locks"""
+    removed = 0
+    while True:
+        batch = (
+            select(auth_models.RefreshToken.id)
+            .where(auth_models.RefreshToken.expires_at < datetime.utcnow())
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(delete(auth_models.RefreshToken).where(auth_models.RefreshToken.id.in_(batch)))
+        await db.commit()
+        removed += result.rowcount or 0
+        if (result.rowcount or 0) < batch_size:
+            return removed
+        await asyncio.sleep(0)
+
+
+async def run_token_maintenance(session_factory, sync_interval: float = REVOCATION_SYNC_INTERVAL,
+                                purge_interval: float = REFRESH_TOKEN_PURGE_INTERVAL) -> None:
+    """Lifespan task: sync revocations every sync_interval, purge every purge_interval"""
+    last_purge = 0.0
+    while True:
+        try:
+            async with session_factory() as db:
+                await sync_revocations(db)
+                if time.time() - last_purge >= purge_interval:
+                    removed = await purge_expired_refresh_tokens(db)
+                    last_purge = time.time()
+                    if removed:
+                        logger.info("Purged %d expired refresh tokens", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Refresh token maintenance failed: %s", e)
+        await asyncio.sleep(sync_interval)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_revocation_checks(revoked: int = 100000, checks: int = 100000, db_latency: float = 0.002):
+    """
+    Cost of the per-request session revocation check with `revoked` revoked
+    sessions, against querying Postgres on every request (`db_latency` s).
+    """
+    from types import SimpleNamespace
+
+    class _Session:
+        queries = 0
+
+        async def execute(self, statement):
+            # Only bloom false positives get here; they are live sessions
+            _Session.queries += 1
+            await asyncio.sleep(db_latency)
+            return SimpleNamespace(scalar=lambda: True)
+
+    async def run():
+        revocation_list = RevocationList(capacity=revoked)
+        revoked_sids = [str(uuid.uuid4()) for _ in range(revoked)]
+        for sid in revoked_sids:
+            revocation_list.add(sid)
+        live_sids = [str(uuid.uuid4()) for _ in range(checks)]
+
+        start = time.perf_counter()
+        for sid in live_sids:
+            assert not await revocation_list.is_revoked(_Session(), sid)
+        live = (time.perf_counter() - start) / checks
+
+        recent = revoked_sids[-(REVOCATION_LRU_SIZE // 2):]
+        start = time.perf_counter()
+        for sid in recent:
+            assert await revocation_list.is_revoked(_Session(), sid)
+        dead = (time.perf_counter() - start) / len(recent)
+        return live, dead, _Session.queries, len(revocation_list.bloom.bits)
+
+    live, dead, queries, size = asyncio.run(run())
+    print(f"\n⏱️ Session revocation check ({revoked} revoked sessions, {checks} checks)")
+    print("=" * 60)
+    print(f"bloom filter:            {size / 1024:.0f} KB")
+    print(f"live session:            {live * 1e6:.2f} µs/check (incl. false positives)")
+    print(f"revoked session (LRU):   {dead * 1e6:.2f} µs/check")
+    print(f"queries:                 {queries} ({queries / checks:.3%} of live checks)")
+    print(f"query per request:       {db_latency * 1e6:.0f} µs/check")
+
+
+if __name__ == "__main__":
+    benchmark_revocation_checks()
@@ -27,6 +27,7 @@ from src.config import  api_key, OPENAI_API_KEY
 from langchain_core.messages import SystemMessage
 #from src.visuals import units_visual_tool_struct
 from langchain_core.tools import tool, InjectedToolCallId
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
 from psycopg_pool import AsyncConnectionPool
@@ -36,18 +37,24 @@ from psycopg_pool import ConnectionPool
 #from langgraph.checkpoint.postgres import PostgresSaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 import os
+import time
 import asyncio
+from src.logging_config import get_logger, log_payload
+from src.metrics import TOOL_DURATION, TOOL_ERRORS, instrument_node
+from src.llm_cache import llm_cache, planner_cache
+from src.llm_clients import llm_clients
+from src.prompts import PLANNER_PREFIX, PROMPT_VERSION, REASONING_PREFIX, planner_request, prefix_fingerprint, reasoning_context
 from src.tools import find_properties_tool, google_maps_link_tool, nearby_places_tool
 from src.projects_tools import get_project_info_tool,  compare_projects_tool
 from src.python_code_tool import execute_python_query 
 from src.search_tool import search_egyptian_real_estate_tavily
 from src.market_info_tool import search_market_intelligence
+from src.legal_docs_tool import search_legal_documents
 from src.map_tool import analyze_egyptian_neighborhood_advanced
 from src.proj_intelligent_tool import get_project_details, semantic_project_search,intelligent_project_matcher, get_project_availability
 #from src.user_profile import load_user_profile_by_email,save_user_profile_by_email
-# Initialize your datasets (replace with your actual data loading)
-projects_df = pd.read_csv("data/projects_cleaned.csv")
-units_df = pd.read_csv("data/units_cleaned.csv")
+
+logger = get_logger(__name__)
 
 class UserInfo(TypedDict, total=False):
     email: str
@@ -95,16 +102,32 @@ search_memory=create_search_memory_tool(namespace=("real_estate_assistant", "{us
     
  
 # Initialize the LLM with tools
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0.3, api_key=OPENAI_API_KEY, max_retries=2)
+# cache=None leaves caching off unless LLM_CACHE=true (see src/llm_cache.py)
+def default_llm():
+    """The agent's chat client; a fresh one once llm_clients.aclose() has run"""
+    return llm_clients.chat_openai("gpt-4o", temperature=0.3, max_retries=2, cache=llm_cache, stream_usage=True)
+
+
+llm = default_llm()
 #llm = ChatGroq(model_name="llama-3.1-8b-instant",temperature=0,api_key=api_key)
 #llm = ChatGroq(model_name="llama-3.3-70b-versatile",temperature=0,api_key=api_key)
 #  VERIFY
-print("=" * 50)
-print(f" CONFIRMED ACTIVE MODEL: {llm.model_name}")
-print("=" * 50)
+logger.info("Active model: %s", llm.model_name)
 tools = [execute_python_query,find_properties_tool, google_maps_link_tool, nearby_places_tool,get_project_details,semantic_project_search,intelligent_project_matcher,
-         compare_projects_tool,search_egyptian_real_estate_tavily,search_market_intelligence,analyze_egyptian_neighborhood_advanced,get_project_availability,manage_memeory,search_memory] 
-llm_with_tools = llm.bind_tools(tools)
+         compare_projects_tool,search_egyptian_real_estate_tavily,search_market_intelligence,search_legal_documents,analyze_egyptian_neighborhood_advanced,get_project_availability,manage_memeory,search_memory] 
+# Schemas are converted once and the same JSON is sent with every reasoning
+# call, so the tools block stays byte-identical ahead of the static prompt prefix
+tool_schemas = [convert_to_openai_tool(t) for t in tools]
+llm_with_tools = llm.bind_tools(tool_schemas)
+logger.info("Prompt prefix version %s (%s)", PROMPT_VERSION,
+            prefix_fingerprint(json.dumps(tool_schemas, sort_keys=True), PLANNER_PREFIX, REASONING_PREFIX))
+
+
+def use_llm(model) -> None:
+    """Make the planner and reasoning nodes call `model`"""
+    global llm, llm_with_tools
+    llm = model
+    llm_with_tools = model.bind_tools(tool_schemas)
 
 
 
@@ -143,90 +166,15 @@ def planning_node(state: AgentState) -> dict:
 - User says "I prefer quiet areas" → manage_memory (user_email="{user_email}", action="save", content="User prefers quiet neighborhoods")
 - Before property search → search_memory(user_email="{user_email}", query="user preferences quiet budget location")
 """
-    planning_prompt = f"""Analyze this real estate query and create a simple plan.
-
-    
-
-USER: "{last_human_msg}"
- USER CONTEXT:
-- Budget: {user_info.get('averageBudget', 'N/A')} EGP
-- Preferred Locations: {', '.join(user_info.get('preferredLocations', [])) or 'N/A'}
-- Family Size: {user_info.get('family_size', 'N/A')}
-
-## SMART TOOL MATCHING:
-
-###  USER ASKS ABOUT PROPERTIES TO BUY/RENT
-Use ALL three (combo approach):
-1. **intelligent_project_matcher** - Find matching projects by budget/location
-2. **semantic_project_search** - If user mentions specific features ("quiet", "modern", "family-friendly")
-3. **search_egyptian_real_estate_tavily** - Get online listings with real sources
- Return: Projects + online options + sources
-
-###  USER ASKS ABOUT AREA/NEIGHBORHOOD QUALITY
-Use **analyze_egyptian_neighborhood_advanced** ONLY
- When they ask: "Is it quiet?", "Good for families?", "Schools nearby?", "Tell me about [Area]"
-
-###  USER ASKS ABOUT MARKET/TRENDS/INVESTMENT
-Use **search_market_intelligence** 
-USE WHEN USER ASKS ABOUT*:
-   Market Trends: "What are current real estate trends in Egypt?"
-   Investment Advice: "Is it a good time to invest?", "Best ROI areas?"
-   Price Trends: "Are prices going up or down?", "Price appreciation rates?"
-   Laws/Regulations: "Can foreigners buy?", "What are ownership laws?", "Property taxes?"
-   Economic Factors: "How does inflation affect prices?", "Currency impact?"
-   Market Forecasts: "What's the outlook for 2026?", "Future predictions?"
-   Government Policies: "Mortgage programs?", "Government initiatives?"
-   Rental Market: "Typical rental yields?", "Tenant demand?"
-   Developer Activity: "Top developers?", "New project pipelines?"
-   Market Analysis: "Market size?", "Growth rate?", "Market health?"
-   Location Analysis: "Tell me about New Administrative Capital as investment"
-   General Advice: "Should I invest now or wait?", "Risks in Egyptian market?"
-    *CRITICAL RULES*:
-- DO NOT use this for finding specific properties
-- Use for questions, analysis, advice, information
-- Great for "why", "how", "should I", "what about" questions
-
-
-### USER ASKS ABOUT SPECIFIC PROJECT
-Use **get_project_details** for info
-Use **get_project_availability** to check units
- When they ask: "Tell me about [Project Name]", "What units are available?"
-
-###  USER WANTS PROXIMITY/NEARBY PLACES
-Use **find_properties_tool** - Search near locations (work, school)
-Use **nearby_places_tool** - Show amenities near a property
- When they ask: "Near my office?", "What's around [Project]?", "Schools nearby?"
-
-###  USER NEEDS ANALYSIS/STATISTICS
-Use **execute_python_query** with smart functions
- When they ask: "Compare prices", "Budget breakdown", "Stats by area"
-
----
-
-## DECISION RULES (Pick 1-3 tools):
-
-**Property Search** → intelligent_project_matcher + semantic_project_search + search_egyptian_real_estate_tavily
-**Area Info** → analyze_egyptian_neighborhood_advanced (+ nearby_places_tool if asking about amenities)
-**Market Info** → search_market_intelligence (include sources)
-**Specific Project** → get_project_details + get_project_availability
-**Proximity** → find_properties_tool + nearby_places_tool
-**Stats/Analysis** → execute_python_query
-
----
-
-## PLAN FORMAT:
-1. [Tool Name] - Why we need it
-2. [Tool Name] - Why we need it (optional)
-3. [Tool Name] - Why we need it (optional)
-
-Keep it short. 1 tool for simple questions, max 3 for complex ones.
-Always mention sources when using search_market_intelligence"""
-    
     # Get planning from LLM
-    planning_msg = llm.invoke([
-        SystemMessage(content="You are a real estate planning expert. Create concise step-by-step plans."),
-        HumanMessage(content=planning_prompt)
-    ])
+    planning_messages = [
+        SystemMessage(content=PLANNER_PREFIX),
+        HumanMessage(content=planner_request(last_human_msg, user_info))
+    ]
+    if planner_cache is not None:
+        planning_msg = planner_cache.invoke(llm, planning_messages, last_human_msg)
+    else:
+        planning_msg = llm.invoke(planning_messages)
     
     # Add plan to state
     plan_content = f"""
@@ -244,7 +192,7 @@ def clean_messages_for_token_limit(messages, max_messages=4):
     if len(messages) <= max_messages:
         return messages
     
-    print(f"🧹 Cleaning messages: {len(messages)} → {max_messages}")
+    logger.debug("Cleaning messages: %d → %d", len(messages), max_messages)
     
     # Strategy: Keep system + last user + last assistant + last tool result
     cleaned = []
@@ -288,22 +236,6 @@ def reasoning_agent_node(state: AgentState) -> AgentState:
     user_email = user_info['email']
 
     
-    personal_context = f"""
- ACTIVE USER: **{user_info.get('name', 'User')}**
-
- USER PROFILE:
-- Locations: {', '.join(user_info.get('preferredLocations', [])) or ' Not set'}
-- Budget: {user_info.get('averageBudget', ' Not set')} EGP
-- Family: {user_info.get('family_size', ' Unknown')} members
-- Type: {' Investor' if user_info.get('is_investor') else ' Residence'}
-
-
-
-
- **When recommending properties, ALWAYS consider proximity to frequent places!**
-"""
-
-    
     memory_instructions = f"""
  **MEMORY TOOLS**:
 - ALWAYS pass user_email: "{user_email}" when calling memory tools
@@ -315,118 +247,21 @@ def reasoning_agent_node(state: AgentState) -> AgentState:
 - Before property search → search_memory(user_email="{user_email}", query="user preferences quiet budget location")
 """
     
-    system_context = f"""You are a smart real estate AI assistant. Think before you act.
-    
-
-{personal_context}
-
-
-
-PLAN: {plan}
-
----
-
-## STEP 1: UNDERSTAND THE USER'S CORE NEED (Think)
-Before executing tools:
-- What is the user REALLY asking? (property search, area advice, investment decision?)
-- What matters to them? (budget, family, commute, lifestyle, investment ROI?)
-- Extract: budget, location, family size, specific concerns from context
-- Use user's requirements IF given, else use context info
-
----
-
-## STEP 2: EXECUTE THE PLAN (Act)
-Run the tools from your plan above with actual parameters.
-
----
-
-## STEP 3: SYNTHESIZE & PERSONALIZE (Reason & Format)
- DON'T: Just list tool outputs
- DO: 
-- Reference user's specific situation ("Based on your 2M budget and family of 4...")
-- Interpret results in their context ("This area is good for you because...")
-- Compare options if multiple ("Property A is closer to your work, Property B is quieter...")
-- Flag concerns ("Note: Area B has limited schools nearby")
-- Make clear recommendations ("I suggest focusing on...")
-
----
-
-## ANSWER STRUCTURE:
-
-1️ **OPENING** (1-2 sentences)- do not explictly right opening this is just to show you structure
-   - Acknowledge their question
-   - Reference their specific situation
-
-2️ **FINDINGS** (Tool outputs formatted naturally)-do not explictly right findings this is just to show you structure
-   - For properties: "Here are the best options for you..."
-   - For areas: "This neighborhood is ideal because..."
-   - Weave results into narrative, not bullet lists
-   - Include links/sources but integrated, not raw
-
-3️ **PERSONALIZED ANALYSIS** (2-3 sentences)
-   - What do these results mean FOR THEM?
-   - How does it match their needs?
-   - Any trade-offs to consider?
-
-4️ **SUMMARY & SUGGESTIONS** (3-5 points)
-   - Top 2-3 recommendations for them specifically
-   - Next steps ("Would you like to know more about X?")
-   - Questions to consider ("How important is school proximity?")
-
----
-
-## TOOL EXECUTION REFERENCE:
-
-search_egyptian_real_estate_tavily(
-    location="New Cairo",
-    bedrooms=3,
-    max_price=8000000
-)
-
-analyze_egyptian_neighborhood_advanced(
-    neighborhood="Rehab",
-    user_scenario="family",
-    specific_needs=["schools", "parks"]
-)
-
-search_market_intelligence(
-    query="What are the current investment trends in Egyptian real estate?"
-)
-
-get_project_details(project_name="Palm Hills")
-
-get_project_availability(project_name="Palm Hills", bedrooms=3)
-
-nearby_places_tool(project_name="Palm Hills", radius_m=2000)
-
-find_properties_tool(place_name="German University in Cairo", radius_km=5)
-
-execute_python_query(code="get_market_summary()")
-
----
-
-## CRITICAL RULES:
-1.  Always reference user's personal context (budget, family, location preferences)
-2.  Format as flowing narrative, not tool dumps
-3.  Include links/sources but naturally integrated
-4.  End with 2-3 personalized suggestions
-5.  Be friendly, clear, and conversational, make the user feel like its taking to someone not a robot
-6.  Flag risks or trade-offs relevant to them
-7.  Ask follow-up questions to refine future searches
-
-Execute the plan now using this reasoning approach."""
-    
-    # Add reasoning to messages
-    enhanced_messages = [SystemMessage(content=system_context)] + clean_messages_for_groq(messages)
+    # Static prefix first so the provider can reuse its cached prefix; the
+    # per-user block follows it
+    enhanced_messages = [
+        SystemMessage(content=REASONING_PREFIX),
+        SystemMessage(content=reasoning_context(user_info, plan)),
+    ] + clean_messages_for_groq(messages)
     
-    response = llm_with_tools.invoke(enhanced_messages)
+    response = normalize_tool_calls(llm_with_tools.invoke(enhanced_messages))
     
     # Log reasoning decision
     if response.tool_calls:
         tool_names = [tc.get('name') for tc in response.tool_calls]
-        print(f" REASONING: Calling tools {tool_names} to advance the plan")
+        logger.info("Reasoning: calling tools to advance the plan", extra={"tools": tool_names})
     else:
-        print(" REASONING: Providing final answer - plan complete")
+        logger.info("Reasoning: providing final answer - plan complete")
     
     return {"messages": [response], "next": "tools" if response.tool_calls else "end"}
 
@@ -462,31 +297,31 @@ def tool_node(state: AgentState) -> dict:
     for tool_call in getattr(last_message, "tool_calls", []) or []:
         #  VALIDATE tool_call structure BEFORE processing
         if not isinstance(tool_call, dict):
-            print(f"⚠️ Skipping non-dict tool_call: {tool_call}")
+            logger.warning("Skipping non-dict tool_call: %r", tool_call)
             continue
             
         tool_name = tool_call.get("name")
         tool_args = tool_call.get("args", {})
         tool_call_id = tool_call.get("id")
 
-        #  CRITICAL: Ensure args is always a valid dict
-        if tool_args is None:
-            tool_args = {}
-        elif not isinstance(tool_args, dict):
-            print(f" Converting non-dict args to dict for tool {tool_name}")
+        #  CRITICAL: Ensure args is always a valid dict (normalize_tool_calls fixes new messages;
+        #  this covers ones restored from older checkpoints)
+        if not isinstance(tool_args, dict):
+            logger.warning("Converting non-dict args to dict for tool %s", tool_name)
             tool_args = {}
 
         if not tool_name:
-            print(f" Skipping tool_call without name: {tool_call}")
+            logger.warning("Skipping tool_call without name: %r", tool_call)
             continue
             
         if not tool_call_id:
             tool_call_id = f"call_{uuid.uuid4().hex[:8]}"
 
-        print(f" Executing tool: {tool_name}")
-        print(f" Tool arguments: {tool_args}")
+        logger.info("Executing tool %s", tool_name, extra={"tool": tool_name})
+        log_payload(logger, "Tool arguments", tool_args, tool=tool_name)
 
         result = None
+        tool_start = time.perf_counter()
         
         try:
             #  CREATE FULL TOOL CALL STRUCTURE for tools that need it
@@ -522,6 +357,9 @@ def tool_node(state: AgentState) -> dict:
             elif tool_name == "search_market_intelligence":
                 result = search_market_intelligence.invoke(full_tool_call)
             
+            elif tool_name == "search_legal_documents":
+                result = search_legal_documents.invoke(full_tool_call)
+            
             elif tool_name == "analyze_egyptian_neighborhood_advanced":
                 result = analyze_egyptian_neighborhood_advanced.invoke(full_tool_call)
             elif tool_name == "get_project_details":
@@ -541,11 +379,13 @@ def tool_node(state: AgentState) -> dict:
 
         except Exception as e:
             result = f"Error executing tool {tool_name}: {str(e)}"
-            print(f" Tool error: {e}")
+            logger.warning("Tool %s failed: %s", tool_name, e, extra={"tool": tool_name})
+            TOOL_ERRORS.inc(tool=tool_name)
+        TOOL_DURATION.observe(time.perf_counter() - tool_start, tool=tool_name)
 
         # Handle result
         if isinstance(result, Command):
-            print(" Tool returned Command - extracting state updates")
+            logger.debug("Tool %s returned Command - extracting state updates", tool_name)
             if hasattr(result, 'update') and result.update:
                 for key, value in result.update.items():
                     if key == "messages":
@@ -555,7 +395,7 @@ def tool_node(state: AgentState) -> dict:
                         if key not in state_updates:
                             state_updates[key] = []
                         state_updates[key].extend(value)
-                        print(f" Added {len(value)} plot(s) to state updates")
+                        logger.debug("Added %d plot(s) to state updates", len(value))
                     else:
                         state_updates[key] = value
 
@@ -608,27 +448,29 @@ async def setup_postgres_checkpointer(
     #  Await setup
     #await checkpointer.setup()
     
-    print(" PostgreSQL checkpointer initialized successfully")
+    logger.info("PostgreSQL checkpointer initialized")
     
     return checkpointer
 
 
-async def build_agent(llm,verbose: bool = True,use_postgres: bool = True):
+async def build_agent(llm=None,verbose: bool = True,use_postgres: bool = True):
+    if llm is not None:
+        use_llm(llm)
     # Build the graph
     workflow = StateGraph(AgentState)
 
     # Add nodes with verbose wrapper if needed
     if verbose:
         #workflow.add_node("profiler", lambda state: verbose_wrapper(user_profiling_node, state, "profiler"))
-        workflow.add_node("planner", lambda state: verbose_wrapper(planning_node, state, "planner"))
-        workflow.add_node("reasoning_agent", lambda state: verbose_wrapper(reasoning_agent_node, state, "reasoning_agent"))
-        workflow.add_node("tools", lambda state: verbose_wrapper(tool_node, state, "tools"))
+        workflow.add_node("planner", instrument_node("planner", lambda state: verbose_wrapper(planning_node, state, "planner")))
+        workflow.add_node("reasoning_agent", instrument_node("reasoning_agent", lambda state: verbose_wrapper(reasoning_agent_node, state, "reasoning_agent")))
+        workflow.add_node("tools", instrument_node("tools", lambda state: verbose_wrapper(tool_node, state, "tools")))
     else:
         
         #workflow.add_node("profiler", user_profiling_node)
-        workflow.add_node("planner", planning_node)  # Replace router with planner
-        workflow.add_node("reasoning_agent", reasoning_agent_node)  # Enhanced agent
-        workflow.add_node("tools", tool_node)
+        workflow.add_node("planner", instrument_node("planner", planning_node))  # Replace router with planner
+        workflow.add_node("reasoning_agent", instrument_node("reasoning_agent", reasoning_agent_node))  # Enhanced agent
+        workflow.add_node("tools", instrument_node("tools", tool_node))
 
     
     workflow.add_edge(START, "planner")
@@ -680,10 +522,8 @@ async def build_agent(llm,verbose: bool = True,use_postgres: bool = True):
 
 #     return result
 def verbose_wrapper(node_func, state, node_name):
-    """Wrapper to add verbose logging to node execution"""
-    print(f"\n{'─'*80}")
-    print(f" NODE: {node_name.upper()}")
-    print(f"{'─'*80}")
+    """Wrapper to add verbose logging to node execution (payloads are sampled, see log_payload)"""
+    logger.debug("Node %s", node_name, extra={"node": node_name})
     config = None
     if isinstance(state, tuple) and len(state) == 2:
         state, config = state
@@ -701,8 +541,6 @@ def verbose_wrapper(node_func, state, node_name):
 
     #  Handle Command return type first
     if isinstance(result, Command):
-        print(f"🪄 Node '{node_name}' returned a Command object")
-
         # Try to inspect the Command contents safely
         update = getattr(result, "update", None)
         if isinstance(update, dict):
@@ -710,10 +548,7 @@ def verbose_wrapper(node_func, state, node_name):
         else:
             messages = []
 
-        if messages:
-            print(f" Command contains {len(messages)} messages")
-        else:
-            print(" Command returned with no messages (state update only).")
+        logger.debug("Node %s returned a Command with %d messages", node_name, len(messages))
 
         # Important: return Command to LangGraph unchanged
         return result
@@ -722,7 +557,7 @@ def verbose_wrapper(node_func, state, node_name):
     elif isinstance(result, dict):
         messages = result.get("messages", [])
     else:
-        print(f" Unexpected return type from node '{node_name}': {type(result)}")
+        logger.warning("Unexpected return type from node %s: %s", node_name, type(result))
         return result
 
    
@@ -731,39 +566,25 @@ def verbose_wrapper(node_func, state, node_name):
             last_msg = messages[-1]
 
             if hasattr(last_msg, "tool_calls") and last_msg.tool_calls:
-                print(" Agent Decision: CALL TOOL")
+                logger.debug("Agent decision: call tool")
                 for tool_call in last_msg.tool_calls:
                     tool_name = tool_call.get('name', 'unknown')
                     tool_args = tool_call.get('args', {})
                     
-                    print(f"\n Tool: {tool_name}")
-                    
                     # ✅ FIXED: Display arguments based on tool type
                     if tool_name == "execute_python_query":
-                        print(f" Code to execute:")
-                        print("─" * 40)
-                        print(tool_args.get("code", "N/A"))
-                        print("─" * 40)
+                        log_payload(logger, "Code to execute", tool_args.get("code", "N/A"), tool=tool_name)
                     else:
-                        # For other tools, display their arguments
-                        print(f" Arguments:")
-                        print("─" * 40)
-                        for key, value in tool_args.items():
-                            print(f"  {key}: {value}")
-                        print("─" * 40)
+                        log_payload(logger, "Tool arguments", tool_args, tool=tool_name)
             else:
-                print(" Agent Decision: PROVIDE ANSWER")
+                logger.debug("Agent decision: provide answer")
                 if hasattr(last_msg, "content") and last_msg.content:
-                    print(f"\n💬 Response: {last_msg.content}")
+                    log_payload(logger, "Response", last_msg.content)
 
     elif node_name == "tools":
-        if messages:
-            print("  Tool Execution Results:")
-            for msg in messages:
-                if isinstance(msg, ToolMessage):
-                    print("─" * 40)
-                    print(msg.content)
-                    print("─" * 40)
+        for msg in messages:
+            if isinstance(msg, ToolMessage):
+                log_payload(logger, "Tool result", msg.content, tool_call_id=msg.tool_call_id)
 
     return result
 
@@ -777,6 +598,36 @@ def verbose_wrapper(node_func, state, node_name):
 
 
 
+def normalize_tool_calls(message):
+    """
+    Give every tool call on an AIMessage a dict of args and an id.
+    Some models send `null` arguments for no-argument calls, which CopilotKit
+    and the message schemas reject; fixing them here keeps them out of state.
+    """
+    if not isinstance(message, AIMessage) or not message.tool_calls:
+        return message
+    if all(isinstance(call, dict) and isinstance(call.get("args"), dict) and call.get("id")
+           for call in message.tool_calls):
+        return message
+
+    fixed_tool_calls = []
+    for idx, call in enumerate(message.tool_calls):
+        if not isinstance(call, dict):
+            continue
+        fixed_tool_calls.append({
+            "name": call.get("name"),
+            "id": call.get("id") or f"call_{idx}",
+            "args": call.get("args") if isinstance(call.get("args"), dict) else {},
+            "type": call.get("type") or "tool_call",
+        })
+    message.tool_calls = fixed_tool_calls
+    for raw in message.additional_kwargs.get("tool_calls") or []:
+        function = raw.get("function") if isinstance(raw, dict) else None
+        if isinstance(function, dict) and function.get("arguments") in (None, "", "null"):
+            function["arguments"] = "{}"
+    return message
+
+
 def clean_messages_for_groq(messages):
     """
     Clean messages for CopilotKit compatibility and reduce token usage.
@@ -799,25 +650,10 @@ def clean_messages_for_groq(messages):
     cleaned = messages[last_user_idx:]
 
     # Clean up AI tool_calls structure for safety
-    final_cleaned = []
-    for msg in cleaned:
-        if isinstance(msg, AIMessage):
-            if hasattr(msg, "tool_calls") and msg.tool_calls:
-                fixed_tool_calls = []
-                for idx, call in enumerate(msg.tool_calls):
-                    if not isinstance(call, dict):
-                        continue
-                    fixed_call = {
-                        "name": call.get("name"),
-                        "id": call.get("id", f"call_{idx}"),
-                        "args": call.get("args", {}) if isinstance(call.get("args"), dict) else {},
-                        "type": call.get("type"),
-                    }
-                    fixed_tool_calls.append(fixed_call)
-                msg.tool_calls = fixed_tool_calls
-        final_cleaned.append(msg)
-
-    print(f"✅ Reduced {len(messages)} → {len(final_cleaned)} (kept messages since last user input)")
+    final_cleaned = [normalize_tool_calls(msg) for msg in cleaned]
+
+    logger.debug("Reduced %d → %d messages (kept messages since last user input)",
+                 len(messages), len(final_cleaned))
     return final_cleaned
 
 
@@ -0,0 +1,385 @@
+"""
+Shared caching primitives for the agent tools
+- TTLCache: in-process LRU tier with per-entry expiry
+- SQLiteCache: persistent tier that survives restarts
+- TieredCache: memory tier in front of the persistent tier, with hit/miss stats
+- SemanticCache: nearest-neighbour lookup over query embeddings
+- SentenceEmbedder: lazily loaded sentence-transformers embedder for it
+- SingleFlight: collapses concurrent identical calls into one upstream call
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+
+# ============================================================================
+# MEMORY TIER
+# ============================================================================
+
+class TTLCache:
+    """Thread-safe LRU cache where every entry carries its own expiry time"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        """Live (unexpired, not evicted) entry; does not touch the LRU order"""
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.time()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ============================================================================
+# PERSISTENT TIER
+# ============================================================================
+
+class SQLiteCache:
+    """JSON-serialised key/value store on SQLite with expiry"""
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Tuple[Any, Optional[float]]:
+        """Return (value, expires_at), or (_MISSING, None) if absent or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return _MISSING, None
+        value, expires_at = row
+        if expires_at <= time.time():
+            self.delete(key)
+            return _MISSING, None
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+
+# ============================================================================
+# TIERED CACHE
+# ============================================================================
+
+class TieredCache:
+    """
+    LRU memory tier in front of an optional SQLite tier.
+    Persistent hits are promoted into memory with their remaining TTL.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024,
+                 persist_path: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.persistent = None
+        if persist_path:
+            try:
+                self.persistent = SQLiteCache(persist_path, table=name)
+            except sqlite3.Error as e:
+                logger.warning("Persistent cache '%s' disabled: %s", name, e)
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or None, counting the lookup in the stats"""
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.persistent is not None:
+            value, expires_at = self.persistent.get(key)
+            if value is not _MISSING:
+                self.memory.set(key, value, ttl=expires_at - time.time())
+        with self._stats_lock:
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value, ttl)
+            except sqlite3.Error as e:
+                logger.warning("Persistent cache write failed for '%s': %s", self.name, e)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.persistent is not None:
+            self.persistent.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+# ============================================================================
+# SEMANTIC TIER
+# ============================================================================
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace/trailing punctuation for exact keys"""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+# model name -> loaded SentenceTransformer (False if it could not be loaded)
+_sentence_models: Dict[str, Any] = {}
+_sentence_models_lock = threading.Lock()
+
+
+class SentenceEmbedder:
+    """
+    embed callable for SemanticCache. The model loads on warm() (call it at
+    startup, off the event loop) or else on first use; embedders naming the
+    same model share one instance. If sentence-transformers is unavailable
+    it returns None, so the cache degrades to exact matching.
+    """
+
+    def __init__(self, model_name: str, name: str = "semantic"):
+        self.model_name = model_name
+        self.name = name
+        self._model = None
+
+    def warm(self) -> bool:
+        """Load the model now; False if it is unavailable"""
+        if self._model is None:
+            with _sentence_models_lock:
+                model = _sentence_models.get(self.model_name)
+                if model is None:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        model = SentenceTransformer(self.model_name)
+                    except Exception as e:
+                        logger.warning("%s cache falling back to exact matching: %s", self.name, e)
+                        model = False
+                    _sentence_models[self.model_name] = model
+            self._model = model
+        return self._model is not False
+
+    def __call__(self, text: str) -> Optional[np.ndarray]:
+        if self._model is None:
+            self.warm()
+        if self._model is False:
+            return None
+        return np.asarray(self._model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+
+class SemanticCache:
+    """
+    Cache keyed by text similarity. Lookups try an exact match on the
+    normalized text first, then fall back to cosine similarity between
+    unit-normalized embeddings within the same namespace.
+
+    embed(text) must return a unit-length vector, or None when no embedder
+    is available - the cache then degrades to exact matching.
+    """
+
+    def __init__(self, name: str, embed: Callable[[str], Optional[np.ndarray]],
+                 threshold: float = 0.92, maxsize: int = 512):
+        self.name = name
+        self.embed = embed
+        self.threshold = threshold
+        self.maxsize = maxsize
+        # (namespace, normalized text) -> (vector, value, expires_at)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[np.ndarray], Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, (_, _, expires_at) in self._entries.items() if expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+
+    def get(self, text: str, namespace: str = "") -> Any:
+        key = (namespace, normalize_text(text))
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            candidates = [(k, v) for k, v in self._entries.items()
+                          if k[0] == namespace and v[0] is not None]
+
+        vector = self.embed(text) if candidates else None
+        if vector is not None:
+            matrix = np.stack([v[0] for _, v in candidates])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                best_key, (_, value, _) = candidates[best]
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text: str, value: Any, ttl: float, namespace: str = "") -> None:
+        vector = self.embed(text)
+        key = (namespace, normalize_text(text))
+        with self._lock:
+            self._entries[key] = (vector, value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+# ============================================================================
+# SINGLE-FLIGHT
+# ============================================================================
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Ensures only one thread runs fn for a given key at a time; concurrent
+    callers with the same key block and share the leader's result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key. Returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
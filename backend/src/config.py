@@ -14,10 +14,13 @@ langsmith_api_key = os.getenv("LANGCHAIN_API_KEY")
 # os.environ["LANGSMITH_API_KEY"] = "LANGSMITH_API_KEY"
 import os
 
-os.environ["LANGCHAIN_TRACING"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "AqarIntelOS"
-os.environ["LANGCHAIN_API_KEY"] = langsmith_api_key
-os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
+# LangSmith exports every run over the network: only trace when a key is set
+# (LANGCHAIN_TRACING=false turns it off even then). /metrics works without it.
+if langsmith_api_key:
+    os.environ.setdefault("LANGCHAIN_TRACING", "true")
+    os.environ.setdefault("LANGCHAIN_PROJECT", "AqarIntelOS")
+    os.environ["LANGCHAIN_API_KEY"] = langsmith_api_key
+    os.environ.setdefault("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
 
 
 
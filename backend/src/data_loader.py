@@ -1,9 +1,163 @@
-# from langchain.document_loaders import PyPDFLoader, CSVLoader
-from langchain_community.document_loaders import PyPDFLoader, CSVLoader
+"""
+Document loaders
+- PDFs are parsed page-range by page-range in a process pool and streamed
+  back in page order as Documents, so splitting and embedding start before
+  the last page is parsed and only a bounded number of pages is in memory
+- load_pdfs keeps the old list-returning interface
+"""
+
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+
+# ============================================================================
+# PDF PAGES
+# ============================================================================
+
+def _parse_page_range(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Worker: extract the text of pages [start, stop) of one PDF"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def _page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _page_tasks(paths: Iterable[str], pages_per_task: int) -> Iterator[Tuple[str, int, int, int]]:
+    for path in paths:
+        total = _page_count(path)
+        for start in range(0, total, pages_per_task):
+            yield path, start, min(start + pages_per_task, total), total
+
+
+def _to_documents(path: str, total: int, pages: List[Tuple[int, str]]) -> Iterator[Document]:
+    for page, text in pages:
+        yield Document(page_content=text, metadata={"source": path, "page": page, "total_pages": total})
+
+
+def iter_pdf_pages(paths: Iterable[str], workers: Optional[int] = None,
+                   pages_per_task: int = PAGES_PER_TASK) -> Iterator[Document]:
+    """
+    Yield one Document per page across all paths, in file and page order.
+    At most 2 x workers page ranges are parsed ahead of the consumer.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    tasks = _page_tasks(paths, pages_per_task)
+
+    if workers <= 1:
+        for path, start, stop, total in tasks:
+            yield from _to_documents(path, total, _parse_page_range(path, start, stop))
+        return
+
+    # spawn: the API process runs threads, which fork would copy mid-lock
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        pending = deque()
+        for path, start, stop, total in tasks:
+            pending.append((path, total, pool.submit(_parse_page_range, path, start, stop)))
+            if len(pending) >= 2 * workers:
+                path_done, total_done, future = pending.popleft()
+                yield from _to_documents(path_done, total_done, future.result())
+        while pending:
+            path_done, total_done, future = pending.popleft()
+            yield from _to_documents(path_done, total_done, future.result())
+
+
+def iter_chunks(pages: Iterable[Document], splitter) -> Iterator[Document]:
+    """Split page by page as pages arrive"""
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def load_pdfs(path):
-    loader = PyPDFLoader(path)
-    return loader.load()
+    return list(iter_pdf_pages([path]))
+
 
 def load_csv(path):
+    from langchain_community.document_loaders import CSVLoader
+
     loader = CSVLoader(path, encoding="utf-8")
     return loader.load()
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_loader(copies: int = 8, pdf_dir: str = "data"):
+    """
+    Parse + split the bundled PDFs duplicated `copies` times, sequentially
+    and with the process pool, reporting wall time and peak RSS of this
+    process and of the largest finished pool worker (RUSAGE_CHILDREN), where
+    the parsing happens.
+    """
+    import glob
+    import resource
+    import shutil
+    import tempfile
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    sources = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+    workdir = tempfile.mkdtemp(prefix="pdf-bench-")
+    try:
+        paths = []
+        for n in range(copies):
+            for source in sources:
+                path = os.path.join(workdir, f"{n}-{os.path.basename(source)}")
+                shutil.copyfile(source, path)
+                paths.append(path)
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
+        print(f"\n⏱️ PDF loader benchmark ({len(paths)} files, {os.cpu_count()} CPUs)")
+        print("=" * 60)
+        print(f"{'workers':<10}{'pages':>8}{'chunks':>8}{'seconds':>10}{'pages/s':>10}{'RSS MB':>10}{'worker MB':>11}")
+        for workers in sorted({1, PDF_WORKERS}):
+            start = time.perf_counter()
+            pages = chunks = 0
+
+            def counted(docs):
+                nonlocal pages
+                for doc in docs:
+                    pages += 1
+                    yield doc
+
+            for _ in iter_chunks(counted(iter_pdf_pages(paths, workers=workers)), splitter):
+                chunks += 1
+            elapsed = time.perf_counter() - start
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            print(f"{workers:<10}{pages:>8}{chunks:>8}{elapsed:>10.2f}{pages / elapsed:>10.1f}"
+                  f"{rss:>10.1f}{worker_rss:>11.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_loader(copies=int(sys.argv[1]) if len(sys.argv) > 1 else 8)
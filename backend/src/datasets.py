@@ -0,0 +1,373 @@
+"""
+Shared columnar store for the projects and units datasets
+- A build step converts data/*_cleaned.csv into Arrow IPC snapshots with
+  categorical string columns; numerics keep 64-bit width because generated
+  pandas code multiplies and sums them (int32 prices overflow silently)
+- Snapshots are memory-mapped at load; the CSVs remain the fallback
+- pyarrow is an optional dependency (not in pyproject.toml): install it
+  with `pip install pyarrow` to build and load snapshots; without it
+  everything loads from the CSVs
+- A value -> row-positions index on location/unit_type makes substring
+  filters touch only the matching rows
+- DatasetManager watches the sources (and an optional DB watermark),
+  loads new versions in the background and swaps them in atomically
+
+Usage:
+    python -m src.datasets build       # write data/snapshot/*.arrow
+    python -m src.datasets benchmark   # load time and RSS, CSV vs snapshot
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.logging_config import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Snapshots are optional; CSV loading still works
+    pa = None
+    feather = None
+
+logger = get_logger(__name__)
+
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshot")
+DATASET_RELOAD_INTERVAL = float(os.getenv("DATASET_RELOAD_INTERVAL", "30"))
+# Bumped when optimize_dtypes changes, so older snapshots are rebuilt
+SNAPSHOT_FORMAT = 2
+
+SOURCES = {
+    "projects": "projects_cleaned.csv",
+    "units": "units_cleaned.csv",
+}
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = {
+    "projects": ["developer", "location"],
+    "units": ["project_name", "developer", "location", "unit_type"],
+}
+
+# Columns with a value -> row positions index
+INDEXED_COLUMNS = {
+    "units": ["location", "unit_type"],
+}
+
+
+# ============================================================================
+# DTYPE OPTIMIZATION
+# ============================================================================
+
+def optimize_dtypes(df: pd.DataFrame, categorical: List[str]) -> pd.DataFrame:
+    """
+    Categorize repeated strings. Numerics are left at int64/float64: these
+    frames are handed to LLM-written code, where narrowed dtypes overflow
+    (price * unit_count in int32) or lose precision without any error.
+    """
+    df = df.copy()
+    for column in categorical:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def source_version(data_dir: str = DATA_DIR) -> str:
+    """Identify the CSV sources by size and mtime"""
+    parts = []
+    for filename in SOURCES.values():
+        stat = os.stat(os.path.join(data_dir, filename))
+        parts.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+# ============================================================================
+# VALUE INDEX
+# ============================================================================
+
+class ValueIndex:
+    """Maps each distinct value of a column to the sorted row positions holding it"""
+
+    def __init__(self, series: pd.Series):
+        categorical = series.astype("category")
+        codes = categorical.cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        boundaries = np.searchsorted(codes[order], np.arange(len(categorical.cat.categories) + 1))
+        self.values = [str(v) for v in categorical.cat.categories]
+        self._lower = [v.lower() for v in self.values]
+        self._positions = [order[boundaries[i]:boundaries[i + 1]] for i in range(len(self.values))]
+
+    def positions_containing(self, text: str) -> np.ndarray:
+        """Row positions whose value contains text (case-insensitive)"""
+        needle = text.lower()
+        hits = [self._positions[i] for i, value in enumerate(self._lower) if needle in value]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        if len(hits) == 1:
+            return hits[0]
+        return np.sort(np.concatenate(hits))
+
+    def values_containing(self, text: str) -> List[str]:
+        needle = text.lower()
+        return [self.values[i] for i, value in enumerate(self._lower) if needle in value]
+
+
+# ============================================================================
+# DATASETS
+# ============================================================================
+
+@dataclass(eq=False)
+class Datasets:
+    """
+    One consistent snapshot of the projects and units tables. Hashed by
+    identity, so memoized functions can key on the snapshot itself.
+    """
+    projects: pd.DataFrame
+    units: pd.DataFrame
+    version: str
+    source: str
+    indexes: Dict[str, ValueIndex] = field(default_factory=dict)
+
+    def positions_containing(self, column: str, text: str) -> np.ndarray:
+        """Unit row positions whose column contains text, via the value index"""
+        return self.indexes[column].positions_containing(text)
+
+    def mask_containing(self, column: str, text: str) -> np.ndarray:
+        """Boolean mask over units whose column contains text (case-insensitive, literal)"""
+        mask = np.zeros(len(self.units), dtype=bool)
+        mask[self.positions_containing(column, text)] = True
+        return mask
+
+
+def _snapshot_path(name: str, snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, f"{name}.arrow")
+
+
+def _manifest_path(snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, "manifest.json")
+
+
+def build_snapshot(data_dir: str = DATA_DIR, snapshot_dir: Optional[str] = None) -> str:
+    """Convert the CSVs into uncompressed Arrow IPC files and record their version"""
+    if feather is None:
+        raise RuntimeError("pyarrow is required to build dataset snapshots")
+    snapshot_dir = snapshot_dir or os.path.join(data_dir, "snapshot")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    version = source_version(data_dir)
+    for name, filename in SOURCES.items():
+        df = optimize_dtypes(pd.read_csv(os.path.join(data_dir, filename)), CATEGORICAL_COLUMNS[name])
+        tmp_path = _snapshot_path(name, snapshot_dir) + ".tmp"
+        # Uncompressed so the file can be memory-mapped without decoding
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, _snapshot_path(name, snapshot_dir))
+        print(f"📦 {name}: {len(df):,} rows -> {_snapshot_path(name, snapshot_dir)}")
+
+    with open(_manifest_path(snapshot_dir), "w") as f:
+        json.dump({"version": version, "format": SNAPSHOT_FORMAT, "built_at": time.time()}, f)
+    return version
+
+
+def _read_snapshot(name: str, snapshot_dir: str) -> pd.DataFrame:
+    with pa.memory_map(_snapshot_path(name, snapshot_dir), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks avoids consolidating columns into one copied 2D block
+    return table.to_pandas(split_blocks=True)
+
+
+def load_datasets(data_dir: str = DATA_DIR, snapshot_dir: Optional[str] = None) -> Datasets:
+    """
+    Load the snapshot if it matches the current CSVs, otherwise parse the
+    CSVs and apply the same dtype optimizations in memory.
+    """
+    snapshot_dir = snapshot_dir or os.path.join(data_dir, "snapshot")
+    version = source_version(data_dir)
+    frames = None
+    source = "csv"
+
+    if feather is not None and os.path.exists(_manifest_path(snapshot_dir)):
+        with open(_manifest_path(snapshot_dir)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == version and manifest.get("format") == SNAPSHOT_FORMAT:
+            frames = {name: _read_snapshot(name, snapshot_dir) for name in SOURCES}
+            source = "snapshot"
+        else:
+            logger.warning("Dataset snapshot is stale, loading CSVs (run: python -m src.datasets build)")
+
+    if frames is None:
+        frames = {
+            name: optimize_dtypes(pd.read_csv(os.path.join(data_dir, filename)), CATEGORICAL_COLUMNS[name])
+            for name, filename in SOURCES.items()
+        }
+
+    units = frames["units"]
+    indexes = {column: ValueIndex(units[column]) for column in INDEXED_COLUMNS["units"]}
+    return Datasets(
+        projects=frames["projects"],
+        units=units,
+        version=version,
+        source=source,
+        indexes=indexes,
+    )
+
+
+# ============================================================================
+# HOT RELOAD
+# ============================================================================
+
+class DatasetManager:
+    """
+    Holds the current Datasets snapshot and replaces it when the sources change.
+
+    Readers call current() once per operation and use that snapshot
+    throughout, so a reload never mixes old and new rows. current() takes no
+    lock.
+
+    A change is detected from the CSV size/mtime, the snapshot manifest and,
+    if given, watermark() - e.g. a SELECT max(updated_at) on the catalog table.
+    Listeners registered with on_swap(fn) are called as fn(old, new) after
+    the swap, to drop caches keyed by the old snapshot.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, interval: float = DATASET_RELOAD_INTERVAL,
+                 watermark: Optional[Callable[[], str]] = None):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.watermark = watermark
+        self._current: Optional[Datasets] = None
+        self._fingerprint: Optional[str] = None
+        self._listeners: List[Callable[[Datasets, Datasets], None]] = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+
+    def _read_fingerprint(self) -> str:
+        parts = [source_version(self.data_dir)]
+        manifest = _manifest_path(os.path.join(self.data_dir, "snapshot"))
+        if os.path.exists(manifest):
+            parts.append(str(os.stat(manifest).st_mtime_ns))
+        if self.watermark is not None:
+            parts.append(str(self.watermark()))
+        return "|".join(parts)
+
+    def current(self) -> Datasets:
+        """The active snapshot; loads the first one synchronously"""
+        data = self._current
+        if data is None:
+            self.reload()
+            data = self._current
+        return data
+
+    def on_swap(self, listener: Callable[[Datasets, Datasets], None]) -> None:
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = False) -> bool:
+        """Load and swap in a new snapshot if the sources changed. Returns True on swap"""
+        with self._reload_lock:
+            fingerprint = self._read_fingerprint()
+            if not force and self._current is not None and fingerprint == self._fingerprint:
+                return False
+
+            start = time.perf_counter()
+            new = load_datasets(self.data_dir)
+            if self._current is not None and self._read_fingerprint() != fingerprint:
+                # Sources changed while loading (a CSV still being written); retry next poll
+                return False
+            old, self._current = self._current, new
+            self._fingerprint = fingerprint
+
+        if old is not None:
+            self.reloads += 1
+            logger.info("Datasets reloaded in %.0fms (%d units, %d projects)",
+                        (time.perf_counter() - start) * 1000, len(new.units), len(new.projects))
+            for listener in self._listeners:
+                try:
+                    listener(old, new)
+                except Exception as e:
+                    logger.warning("Dataset swap listener failed: %s", e)
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the last good snapshot, e.g. while a CSV is half-written
+                logger.warning("Dataset reload failed, keeping current version: %s", e)
+
+    def start(self) -> None:
+        """Start polling the sources in a background thread (no-op if interval <= 0)"""
+        self.current()
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="dataset-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _measure_load(use_snapshot: bool, data_dir: str, queue) -> None:
+    import resource
+    if pa is not None:
+        # Load pyarrow's pandas bridge up front so RSS reflects the data, not the library
+        pa.table({"warmup": [0]}).to_pandas()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if use_snapshot:
+        datasets = load_datasets(data_dir)
+    else:
+        datasets = Datasets(
+            projects=pd.read_csv(os.path.join(data_dir, SOURCES["projects"])),
+            units=pd.read_csv(os.path.join(data_dir, SOURCES["units"])),
+            version="", source="csv",
+        )
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    deep = (datasets.units.memory_usage(deep=True).sum()
+            + datasets.projects.memory_usage(deep=True).sum())
+    queue.put((elapsed, (after - before) / 1024, deep / 1e6, datasets.source))
+
+
+def benchmark_load(data_dir: str = DATA_DIR):
+    """Load time and RSS growth of plain CSV parsing versus the snapshot, each in a fresh process"""
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")
+    print("\n⏱️ Dataset load benchmark")
+    print("=" * 66)
+    print(f"{'loader':<22}{'time ms':>10}{'RSS MB':>10}{'frame MB':>12}{'source':>12}")
+    for label, use_snapshot in [("pd.read_csv", False), ("load_datasets", True)]:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure_load, args=(use_snapshot, data_dir, queue))
+        process.start()
+        elapsed, rss_mb, frame_mb, source = queue.get()
+        process.join()
+        print(f"{label:<22}{elapsed * 1000:>10.1f}{rss_mb:>10.1f}{frame_mb:>12.1f}{source:>12}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_snapshot()
+    elif command == "benchmark":
+        benchmark_load()
+    else:
+        print(f"Unknown command: {command} (expected build or benchmark)")
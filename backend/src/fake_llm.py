@@ -0,0 +1,139 @@
+"""
+Scripted chat model for offline runs (load tests)
+- Drop-in for ChatOpenAI in agent.py: the planner (unbound model) gets a fixed
+  plan, the reasoning agent (bind_tools copy) replays the tool calls scripted
+  for the user's question one step at a time, then answers
+- Deterministic: the next step depends only on the conversation since the
+  last user message, so any number of concurrent threads can share one instance
+- Latency is time to first token plus a per-token delay, streamed token by
+  token, so TTFT measured through /copilotkit behaves like the real model's
+"""
+
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+DEFAULT_PLAN = """1. Use the most relevant tool for the question
+2. Summarize the results for the user"""
+
+_TOKENS = re.compile(r"\S+\s*")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    scripts maps a user question to the tool calls the agent makes for it,
+    e.g. {"Market trends in Sheikh Zayed?": [{"name": "search_market_intelligence",
+    "args": {"query": "Sheikh Zayed market trends"}}]}. Unknown questions are
+    answered directly.
+    """
+
+    scripts: Dict[str, List[Dict[str, Any]]] = Field(default_factory=dict)
+    plan: str = DEFAULT_PLAN
+    answer_tokens: int = 120
+    first_token_latency: float = 0.4
+    token_latency: float = 0.02
+    model_name: str = "scripted"
+    tools_bound: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools, **kwargs) -> "ScriptedChatModel":
+        # Schemas don't matter to a script; binding marks the reasoning agent's copy
+        return self.model_copy(update={"tools_bound": True})
+
+    # ------------------------------------------------------------------
+    # Script
+    # ------------------------------------------------------------------
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        if not self.tools_bound:
+            return AIMessage(content=self.plan)
+
+        question, steps_taken = "", 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                question = message.content if isinstance(message.content, str) else str(message.content)
+                break
+            if isinstance(message, AIMessage) and message.tool_calls:
+                steps_taken += 1
+
+        steps = self.scripts.get(question.strip(), [])
+        if steps_taken < len(steps):
+            step = steps[steps_taken]
+            return AIMessage(content="", tool_calls=[{
+                "name": step["name"],
+                "args": dict(step.get("args") or {}),
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "tool_call",
+            }])
+        words = ("Based on the results above, here is a summary tailored to your budget "
+                 "and preferred locations. ").split()
+        return AIMessage(content=" ".join(words[i % len(words)] for i in range(self.answer_tokens)))
+
+    def _usage(self, messages: List[BaseMessage], message: AIMessage) -> Dict[str, int]:
+        tokens_in = sum(_estimate_tokens(str(m.content)) for m in messages)
+        tokens_out = (len(_TOKENS.findall(message.content)) if message.content
+                      else _estimate_tokens(json.dumps(message.tool_calls)))
+        return {"input_tokens": tokens_in, "output_tokens": tokens_out,
+                "total_tokens": tokens_in + tokens_out}
+
+    # ------------------------------------------------------------------
+    # BaseChatModel
+    # ------------------------------------------------------------------
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self._next_message(messages)
+        usage = self._usage(messages, message)
+        time.sleep(self.first_token_latency + self.token_latency * usage["output_tokens"])
+        message.usage_metadata = usage
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name,
+                        "token_usage": {"prompt_tokens": usage["input_tokens"],
+                                        "completion_tokens": usage["output_tokens"]}},
+        )
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._next_message(messages)
+        usage = self._usage(messages, message)
+        message_id = f"run-{uuid.uuid4()}"
+        time.sleep(self.first_token_latency)
+
+        for token in _TOKENS.findall(message.content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, id=message_id))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            time.sleep(self.token_latency)
+
+        tool_call_chunks = [{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"],
+                             "index": index, "type": "tool_call_chunk"}
+                            for index, call in enumerate(message.tool_calls)]
+        if tool_call_chunks:
+            time.sleep(self.token_latency * usage["output_tokens"])
+        chunk = ChatGenerationChunk(message=AIMessageChunk(
+            content="", id=message_id, tool_call_chunks=tool_call_chunks, usage_metadata=usage,
+        ))
+        if run_manager:
+            run_manager.on_llm_new_token("", chunk=chunk)
+        yield chunk
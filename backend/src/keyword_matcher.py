@@ -0,0 +1,76 @@
+"""
+Compiled multi-keyword matcher
+- Keywords are folded into a trie and rendered as a single regex, so the
+  scan runs inside the C regex engine instead of one `in` check per keyword
+- A zero-width lookahead visits every start position, which reports
+  overlapping matches exactly like substring checks ("rent" in "current")
+- Each keyword carries tags; one scan returns every tag that was hit
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def _trie_to_regex(node: Dict[str, dict]) -> str:
+    """Render a character trie as a regex that prefers the longest match"""
+    terminal = "" in node
+    branches = []
+    for char in sorted(k for k in node if k):
+        branches.append(re.escape(char) + _trie_to_regex(node[char]))
+
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if terminal:
+        # Greedy optional: try the longer keyword first, then stop here
+        if len(branches) == 1 and len(branches[0]) > 1:
+            body = "(?:" + body + ")"
+        body += "?"
+    return body
+
+
+class KeywordMatcher:
+    """
+    Match many keywords against a text in one pass.
+
+    >>> m = KeywordMatcher([("rent", "rental_market"), ("trend", "market_trends")])
+    >>> sorted(m.tags("current trends"))
+    ['market_trends', 'rental_market']
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, str]]):
+        self._tags_by_keyword: Dict[str, Set[str]] = {}
+        for keyword, tag in keywords:
+            self._tags_by_keyword.setdefault(keyword.lower(), set()).add(tag)
+
+        trie: Dict[str, dict] = {}
+        for keyword in self._tags_by_keyword:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        self._regex = re.compile("(?=(" + _trie_to_regex(trie) + "))")
+
+        # The regex reports only the longest keyword at each position; every
+        # other keyword starting there is a prefix of it, so precompute the
+        # tags of all keyword prefixes (the trie's output links)
+        self._outputs: Dict[str, Set[str]] = {}
+        for keyword in self._tags_by_keyword:
+            tags: Set[str] = set()
+            for end in range(1, len(keyword) + 1):
+                tags |= self._tags_by_keyword.get(keyword[:end], set())
+            self._outputs[keyword] = tags
+
+    def keywords(self, text: str) -> List[str]:
+        """Longest keyword found at each position of the (lowercased) text"""
+        return [m.group(1) for m in self._regex.finditer(text)]
+
+    def tags(self, text: str) -> Set[str]:
+        """All tags whose keywords occur anywhere in the (lowercased) text"""
+        found: Set[str] = set()
+        outputs = self._outputs
+        for match in self._regex.finditer(text):
+            found |= outputs[match.group(1)]
+        return found
+
@@ -0,0 +1,44 @@
+"""
+Egyptian Real Estate Legal Documents Tool
+Retrieves passages from the bundled legal PDFs (data/*.pdf) through the
+incremental vector index in src.vectorstore
+"""
+
+from langchain_core.tools import tool
+
+from src.vectorstore import load_index
+
+
+@tool
+def search_legal_documents(query: str, k: int = 4) -> str:
+    """
+    Search the bundled Egyptian real estate LAW documents (ownership law guide,
+    legal regulation of foreign real estate ownership) for relevant passages.
+
+    USE THIS TOOL FOR:
+    ✅ Ownership rules ("Can foreigners own property in Egypt?", "How many units can a foreigner buy?")
+    ✅ Legal procedures ("How is a property registered?", "What contracts are required?")
+    ✅ Restrictions and conditions quoted from the law text
+
+    Args:
+        query: The legal question in natural language
+        k: Number of passages to return (default 4)
+
+    Returns:
+        Matching passages with their document and page, best match first
+    """
+    index = load_index()
+    if index is None or not len(index):
+        return "❌ Legal document index is not built yet (run: python -m src.vectorstore ingest)"
+
+    docs = index.search(query, k=max(1, min(k, 10)))
+    if not docs:
+        return f"❌ No passages found for: {query}"
+
+    response = f"📜 LEGAL DOCUMENT PASSAGES: {query}\n\n"
+    for i, doc in enumerate(docs, 1):
+        page = doc.metadata.get("page")
+        page_label = f"p.{page + 1}" if isinstance(page, int) else "p.?"
+        response += f"**[{i}] {doc.metadata['source']} ({page_label})**\n{doc.page_content.strip()}\n\n"
+    response += "📌 Quote these passages and cite the document and page in your answer."
+    return response
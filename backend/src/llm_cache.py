@@ -0,0 +1,290 @@
+"""
+Opt-in response cache for the agent's LLM calls (LLM_CACHE=true)
+- Exact tier: a LangChain BaseCache set as the chat model's `cache`. The key
+  hashes the model's serialized settings (model, temperature, bound tools,
+  stop) together with the messages, so the planner and the reasoning agent
+  share one store without colliding. Entries live in memory in front of
+  SQLite (LLM_CACHE_PATH) and expire after LLM_CACHE_TTL
+- Semantic tier, planner only (LLM_CACHE_PLANNER_SEMANTIC=true): a plan is
+  reused for a similarly worded question when the rest of the planning
+  prompt (template, user profile) is byte-identical
+- Hits, misses, tokens and estimated cost saved (LLM_PRICES, USD per 1M
+  input/output tokens) are exported through src.metrics
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumpd, load
+from langchain_core.messages import AIMessage, BaseMessage
+
+from src.cache import SemanticCache, SentenceEmbedder, TieredCache
+from src.logging_config import get_logger
+from src.metrics import LLM_CACHE_COST_SAVED, LLM_CACHE_LOOKUPS, LLM_CACHE_TOKENS_SAVED
+
+logger = get_logger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "false").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/.cache/llm_responses.sqlite3")
+LLM_CACHE_PLANNER_SEMANTIC = os.getenv("LLM_CACHE_PLANNER_SEMANTIC", "false").lower() == "true"
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+LLM_CACHE_EMBED_MODEL = os.getenv("LLM_CACHE_EMBED_MODEL", "all-MiniLM-L6-v2")
+LLM_PRICES = os.getenv("LLM_PRICES", "gpt-4o=2.50/10.00,gpt-4o-mini=0.15/0.60")
+
+_MODEL_NAME = re.compile(r"""['"]model(?:_name)?['"]\s*[:,]\s*['"]([^'"]+)['"]""")
+
+
+# ============================================================================
+# PRICING
+# ============================================================================
+
+def _parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """"gpt-4o=2.50/10.00,..." -> {"gpt-4o": (2.5, 10.0)} (USD per 1M tokens)"""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rates = item.partition("=")
+        try:
+            rate_in, _, rate_out = rates.partition("/")
+            prices[model.strip()] = (float(rate_in), float(rate_out or 0))
+        except ValueError:
+            logger.warning("Ignoring malformed LLM_PRICES entry: %s", item)
+    return prices
+
+
+PRICES = _parse_prices(LLM_PRICES)
+
+
+def cost_usd(model: str, tokens_in: int, tokens_out: int) -> float:
+    rate_in, rate_out = PRICES.get(model, (0.0, 0.0))
+    return (tokens_in * rate_in + tokens_out * rate_out) / 1e6
+
+
+def _usage(messages: Sequence[BaseMessage]) -> Tuple[int, int]:
+    tokens_in = tokens_out = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens_in += usage.get("input_tokens", 0)
+        tokens_out += usage.get("output_tokens", 0)
+    return tokens_in, tokens_out
+
+
+def _record_hit(model: str, tier: str, tokens_in: int, tokens_out: int) -> float:
+    LLM_CACHE_LOOKUPS.inc(model=model, tier=tier, result="hit")
+    if tokens_in:
+        LLM_CACHE_TOKENS_SAVED.inc(tokens_in, model=model, direction="input")
+    if tokens_out:
+        LLM_CACHE_TOKENS_SAVED.inc(tokens_out, model=model, direction="output")
+    saved = cost_usd(model, tokens_in, tokens_out)
+    if saved:
+        LLM_CACHE_COST_SAVED.inc(saved, model=model)
+    return saved
+
+
+@lru_cache(maxsize=64)
+def model_of(llm_string: str) -> str:
+    """Model name from LangChain's llm_string (serialized model + call params)"""
+    match = _MODEL_NAME.search(llm_string)
+    return match.group(1) if match else "unknown"
+
+
+def _as_cache_hit(message: AIMessage) -> AIMessage:
+    """
+    Fresh ids so a reused response never collides with an earlier message or
+    tool call in the same thread, flagged so LLM metrics skip it
+    """
+    ids = {call["id"]: f"call_{uuid.uuid4().hex[:24]}" for call in message.tool_calls if call.get("id")}
+    additional_kwargs = dict(message.additional_kwargs)
+    if ids and additional_kwargs.get("tool_calls"):
+        additional_kwargs["tool_calls"] = [{**call, "id": ids.get(call.get("id"), call.get("id"))}
+                                           for call in additional_kwargs["tool_calls"]]
+    return message.model_copy(update={
+        "id": None,
+        "tool_calls": [{**call, "id": ids.get(call.get("id"), call.get("id"))} for call in message.tool_calls],
+        "additional_kwargs": additional_kwargs,
+        "response_metadata": {**message.response_metadata, "cache_hit": True},
+    })
+
+
+# ============================================================================
+# EXACT TIER
+# ============================================================================
+
+class LLMCache(BaseCache):
+    """Exact-match cache for chat model generations, pass as ChatOpenAI(cache=...)"""
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, maxsize: int = LLM_CACHE_SIZE,
+                 persist_path: Optional[str] = LLM_CACHE_PATH):
+        self.store = TieredCache("llm_responses", ttl=ttl, maxsize=maxsize,
+                                 persist_path=persist_path or None)
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[List[Any]]:
+        model = model_of(llm_string)
+        cached = self.store.get(self.key(prompt, llm_string))
+        if cached is None:
+            LLM_CACHE_LOOKUPS.inc(model=model, tier="exact", result="miss")
+            return None
+        try:
+            generations = [load(generation) for generation in cached]
+        except Exception as e:
+            logger.warning("Discarding unreadable LLM cache entry: %s", e)
+            return None
+
+        for generation in generations:
+            if isinstance(getattr(generation, "message", None), AIMessage):
+                generation.message = _as_cache_hit(generation.message)
+        tokens_in, tokens_out = _usage([getattr(g, "message", None) for g in generations])
+        self.tokens_saved += tokens_in + tokens_out
+        self.cost_saved += _record_hit(model, "exact", tokens_in, tokens_out)
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        self.store.set(self.key(prompt, llm_string), [dumpd(generation) for generation in return_val])
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drops the memory tier; persisted entries age out with their TTL"""
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "tokens_saved": self.tokens_saved,
+                "cost_saved_usd": round(self.cost_saved, 4)}
+
+
+# ============================================================================
+# SEMANTIC TIER (PLANNER)
+# ============================================================================
+
+class PlannerCache:
+    """
+    Reuses plans across similarly worded questions. The namespace hashes the
+    model settings and the planning prompt with the question cut out, so a
+    plan is only shared between users whose profile renders identically.
+    """
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, threshold: float = LLM_CACHE_SIMILARITY,
+                 maxsize: int = LLM_CACHE_SIZE, embed=None):
+        self.ttl = ttl
+        self.cache = SemanticCache(
+            "llm_planner",
+            embed=embed or SentenceEmbedder(LLM_CACHE_EMBED_MODEL, name="Planner"),
+            threshold=threshold,
+            maxsize=maxsize,
+        )
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+
+    @staticmethod
+    def namespace(llm_string: str, messages: Sequence[BaseMessage], question: str) -> str:
+        digest = hashlib.sha256(llm_string.encode("utf-8"))
+        for message in messages:
+            digest.update(b"\x00" + message.type.encode() + b"\x00")
+            digest.update(str(message.content).replace(question, "").encode("utf-8"))
+        return digest.hexdigest()
+
+    def invoke(self, llm, messages: List[BaseMessage], question: str) -> AIMessage:
+        if not isinstance(question, str) or not question.strip():
+            return llm.invoke(messages)
+        llm_string = llm._get_llm_string()
+        model = model_of(llm_string)
+        namespace = self.namespace(llm_string, messages, question)
+
+        cached = self.cache.get(question, namespace=namespace)
+        if cached is not None:
+            tokens_in, tokens_out = cached["usage"]
+            self.tokens_saved += tokens_in + tokens_out
+            self.cost_saved += _record_hit(model, "planner", tokens_in, tokens_out)
+            return AIMessage(content=cached["content"], response_metadata={"cache_hit": True})
+
+        LLM_CACHE_LOOKUPS.inc(model=model, tier="planner", result="miss")
+        response = llm.invoke(messages)
+        # An exact-tier hit already counted its savings
+        usage = (0, 0) if response.response_metadata.get("cache_hit") else _usage([response])
+        self.cache.set(question, {"content": response.content, "usage": usage},
+                       ttl=self.ttl, namespace=namespace)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "tokens_saved": self.tokens_saved,
+                "cost_saved_usd": round(self.cost_saved, 4)}
+
+
+llm_cache = LLMCache() if LLM_CACHE_ENABLED else None
+planner_cache = PlannerCache() if LLM_CACHE_ENABLED and LLM_CACHE_PLANNER_SEMANTIC else None
+
+
+def warm_llm_cache() -> None:
+    """Load the planner cache's embedding model (API startup, in a thread)"""
+    embed = planner_cache.cache.embed if planner_cache is not None else None
+    if hasattr(embed, "warm"):
+        embed.warm()
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    stats = {}
+    if llm_cache is not None:
+        stats["exact"] = llm_cache.stats()
+    if planner_cache is not None:
+        stats["planner"] = planner_cache.stats()
+    return stats
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_llm_cache(requests: int = 200, distinct: int = 20, latency: float = 0.05):
+    """
+    Planner-style calls against a scripted model with `latency` per call:
+    `requests` prompts drawn round-robin from `distinct` profiles, uncached
+    versus through LLMCache (SQLite tier in a temp dir)
+    """
+    import statistics
+    import tempfile
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    from src.fake_llm import ScriptedChatModel
+
+    prompts = [[SystemMessage(content="You are a real estate planning expert."),
+                HumanMessage(content=f"Plan for a family of {i % 6 + 1} with budget {1 + i} M EGP")]
+               for i in range(distinct)]
+
+    def run(model) -> List[float]:
+        timings = []
+        for i in range(requests):
+            start = time.perf_counter()
+            model.invoke(prompts[i % distinct])
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    settings = dict(model_name="gpt-4o", first_token_latency=latency, token_latency=0.0)
+    uncached = run(ScriptedChatModel(**settings))
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(persist_path=os.path.join(tmp, "llm.sqlite3"))
+        cached = run(ScriptedChatModel(cache=cache, **settings))
+        stats = cache.stats()
+
+    print(f"\n⏱️ LLM cache benchmark ({requests} calls, {distinct} distinct prompts, "
+          f"{latency * 1000:.0f} ms per model call)")
+    print("=" * 60)
+    print(f"uncached:   total {sum(uncached):6.2f}s  median {statistics.median(uncached) * 1000:7.2f} ms")
+    print(f"cached:     total {sum(cached):6.2f}s  median {statistics.median(cached) * 1000:7.2f} ms")
+    print(f"hit ratio:  {stats['hit_ratio']:.0%}  tokens saved {stats['tokens_saved']}  "
+          f"cost saved ${stats['cost_saved_usd']:.4f}")
+
+
+if __name__ == "__main__":
+    benchmark_llm_cache()
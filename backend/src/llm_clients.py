@@ -0,0 +1,168 @@
+"""
+Process-wide registry of LLM and embedding clients
+- chat_openai / chat_groq / openai_embeddings build each client once per
+  distinct configuration and hand the same instance to every caller
+  (agent, API, RAG chains, PDF indexing)
+- Every client goes through one httpx.Client and one httpx.AsyncClient built
+  from the same settings (LLM_HTTP_*), so keep-alive connections and TLS
+  sessions to a provider are shared instead of one pool per client object
+- Metrics: HTTP requests vs new TCP connections per host (connection reuse)
+  and in-flight LLM calls per model (via LLMMetricsHandler)
+"""
+
+import os
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from src.config import OPENAI_API_KEY, api_key as GROQ_API_KEY
+from src.logging_config import get_logger
+from src.metrics import LLM_HTTP_CONNECTIONS, LLM_HTTP_REQUESTS, llm_metrics
+
+logger = get_logger(__name__)
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "90"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "120"))
+
+
+# ============================================================================
+# SHARED HTTP POOLS
+# ============================================================================
+
+def http_settings() -> Dict[str, Any]:
+    """Pool limits and timeouts shared by the sync and async clients"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_HTTP_READ_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+        "follow_redirects": True,
+    }
+
+
+def _count_connection(host: str, event: str) -> None:
+    if event == "connection.connect_tcp.complete":
+        LLM_HTTP_CONNECTIONS.inc(host=host)
+
+
+def _trace_request(request: httpx.Request) -> None:
+    host = request.url.host
+    LLM_HTTP_REQUESTS.inc(host=host)
+    request.extensions["trace"] = lambda event, info: _count_connection(host, event)
+
+
+async def _atrace_request(request: httpx.Request) -> None:
+    host = request.url.host
+    LLM_HTTP_REQUESTS.inc(host=host)
+
+    async def trace(event, info):
+        _count_connection(host, event)
+
+    request.extensions["trace"] = trace
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return id(value)
+
+
+class LLMClients:
+    """
+    get-or-create by (kind, settings). Clients are long-lived: the pools
+    close only on aclose() at shutdown, so never close a client you got here.
+    After aclose() the getters build new pools and clients; anything holding
+    an old client (e.g. the agent's llm) must fetch it again.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[Hashable, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._http: Optional[httpx.Client] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(event_hooks={"request": [_trace_request]}, **http_settings())
+            return self._http
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_http is None:
+                self._async_http = httpx.AsyncClient(event_hooks={"request": [_atrace_request]},
+                                                     **http_settings())
+            return self._async_http
+
+    def _get(self, kind: str, factory, settings: Dict[str, Any]) -> Any:
+        key = (kind, _freeze(settings))
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        client = factory(http_client=self.http_client, http_async_client=self.async_http_client, **settings)
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+        logger.info("LLM client created", extra={"kind": kind, "clients": len(self._clients)})
+        return client
+
+    def chat_openai(self, model: str, **settings) -> Any:
+        from langchain_openai import ChatOpenAI
+
+        settings.setdefault("api_key", OPENAI_API_KEY)
+        settings.setdefault("callbacks", [llm_metrics])
+        return self._get("chat_openai", ChatOpenAI, {"model_name": model, **settings})
+
+    def chat_groq(self, model: str, **settings) -> Any:
+        from langchain_groq import ChatGroq
+
+        settings.setdefault("api_key", GROQ_API_KEY)
+        settings.setdefault("callbacks", [llm_metrics])
+        return self._get("chat_groq", ChatGroq, {"model": model, **settings})
+
+    def openai_embeddings(self, **settings) -> Any:
+        from langchain_openai import OpenAIEmbeddings
+
+        settings.setdefault("api_key", OPENAI_API_KEY)
+        return self._get("openai_embeddings", OpenAIEmbeddings, settings)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = LLM_HTTP_REQUESTS.total()
+        connections = LLM_HTTP_CONNECTIONS.total()
+        return {
+            "clients": len(self._clients),
+            "http_requests": requests,
+            "connections_opened": connections,
+            "connection_reuse_ratio": round(1 - connections / requests, 4) if requests else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        """Close both pools and forget every client built on them"""
+        with self._lock:
+            http, async_http = self._http, self._async_http
+            self._http = self._async_http = None
+            self._clients.clear()
+        if async_http is not None:
+            await async_http.aclose()
+        if http is not None:
+            http.close()
+
+
+llm_clients = LLMClients()
@@ -0,0 +1,511 @@
+"""
+Offline load test for the API
+- Boots the FastAPI app in a subprocess with ScriptedChatModel in place of
+  ChatOpenAI, and Google CSE, Tavily, Nominatim and Overpass pointed at local
+  stub servers with configurable latency and error rate
+- Virtual users register/log in, run conversations through /copilotkit
+  (streamed) and call the REST endpoints between turns
+- Reports throughput, p50/p95/p99 latency per endpoint and time to first
+  token; --json writes the report and --max-p95 / --max-error-rate fail the
+  run, for CI
+- Only the auth database is real (AUTH_DATABASE_URL, e.g. a Postgres service
+  container); nothing leaves the machine
+
+Usage:
+    python -m src.loadtest --users 20 --conversations 3
+    python -m src.loadtest --users 50 --upstream-latency 0.5 --upstream-error-rate 0.05 --json report.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+AGENT_NAME = "policy_qa_agent"
+
+# Each question is answered with its scripted tool calls (see ScriptedChatModel)
+SCENARIOS: List[Dict[str, Any]] = [
+    {"question": "Find me 3 bedroom apartments in New Cairo under 5 million",
+     "tool_calls": [{"name": "search_egyptian_real_estate_tavily",
+                     "args": {"location": "New Cairo", "bedrooms": 3, "max_price": 5000000}}]},
+    {"question": "What are the market trends in Sheikh Zayed this year?",
+     "tool_calls": [{"name": "search_market_intelligence",
+                     "args": {"query": "Sheikh Zayed real estate market trends"}}]},
+    {"question": "Is Maadi a good neighborhood for a family with kids?",
+     "tool_calls": [{"name": "analyze_egyptian_neighborhood_advanced",
+                     "args": {"neighborhood": "Maadi", "user_scenario": "family"}}]},
+    {"question": "Compare average prices by location and show me the market outlook",
+     "tool_calls": [{"name": "execute_python_query", "args": {"code": "analyze_prices_by_location()"}},
+                    {"name": "search_market_intelligence",
+                     "args": {"query": "Egypt real estate price outlook"}}]},
+    {"question": "Hi! What can you help me with?", "tool_calls": []},
+]
+
+
+# ============================================================================
+# STUB UPSTREAMS
+# ============================================================================
+
+_SITES = ["nawy.com", "aqarmap.com.eg", "bayut.eg", "olx.com.eg", "propertyfinder.eg"]
+
+
+def _cse_response(query: str, rng: random.Random) -> Dict[str, Any]:
+    site = next((s for s in _SITES if f"site:{s}" in query), _SITES[0])
+    items = []
+    for _ in range(3):
+        bedrooms = rng.randint(2, 4)
+        price = rng.randrange(2_500_000, 6_000_000, 50_000)
+        listing = rng.randint(1_000_000, 9_999_999)
+        items.append({
+            "title": f"{bedrooms} Bedroom Apartment for sale in New Cairo",
+            "link": f"https://www.{site}/en/property/apartment-new-cairo-{listing}",
+            "snippet": f"{bedrooms} bedrooms, {rng.randint(120, 260)} sqm, price {price:,} EGP, "
+                       f"compound with pool and security.",
+        })
+    return {"kind": "customsearch#search", "items": items}
+
+
+def _tavily_response(body: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    query = body.get("query", "")
+    domains = body.get("include_domains") or ["propertyfinder.eg", "globalpropertyguide.com"]
+    return {
+        "query": query,
+        "answer": f"Prices for {query} rose {rng.randint(8, 30)}% year over year, driven by "
+                  "inflation hedging and new compound launches.",
+        "results": [{"title": f"{query} report {i + 1}",
+                     "url": f"https://{domains[i % len(domains)]}/research/report-{i + 1}",
+                     "content": "Average prices per square meter increased across New Cairo, "
+                                "Sheikh Zayed and the New Capital. " * 3,
+                     "score": round(0.9 - i * 0.05, 2)}
+                    for i in range(min(int(body.get("max_results", 5)), 5))],
+        "response_time": round(rng.uniform(0.5, 2.0), 2),
+    }
+
+
+def _nominatim_response(query: str) -> List[Dict[str, Any]]:
+    return [{"lat": "29.9602", "lon": "31.2569", "display_name": f"{query}, Cairo, Egypt",
+             "importance": 0.62, "boundingbox": ["29.94", "29.98", "31.23", "31.28"],
+             "type": "suburb", "class": "place"}]
+
+
+def _overpass_response(rng: random.Random) -> Dict[str, Any]:
+    kinds = [{"amenity": "school"}, {"amenity": "cafe"}, {"amenity": "hospital"},
+             {"amenity": "pharmacy"}, {"amenity": "restaurant"}, {"amenity": "place_of_worship"},
+             {"shop": "supermarket"}, {"shop": "mall"}, {"leisure": "park"},
+             {"highway": "primary"}, {"highway": "residential"}, {"public_transport": "station"}]
+    elements = []
+    for i in range(rng.randint(20, 60)):
+        tags = dict(kinds[i % len(kinds)], name=f"Place {i}")
+        elements.append({"type": "node", "id": 1000 + i, "tags": tags,
+                         "lat": 29.96 + rng.uniform(-0.01, 0.01), "lon": 31.25 + rng.uniform(-0.01, 0.01)})
+    return {"version": 0.6, "elements": elements}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: "StubUpstreams"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _reply(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, body: bytes) -> None:
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        service = url.path.strip("/").split("/", 1)[0]
+        rng, latency, failed = self.server.draw(service)
+        time.sleep(latency)
+        if failed:
+            self._reply(503, {"error": "stub upstream failure"})
+            return
+
+        if service == "google":
+            self._reply(200, _cse_response(params.get("q", ""), rng))
+        elif service == "tavily":
+            self._reply(200, _tavily_response(json.loads(body or b"{}"), rng))
+        elif service == "nominatim":
+            self._reply(200, _nominatim_response(params.get("q", "Cairo")))
+        elif service == "overpass":
+            self._reply(200, _overpass_response(rng))
+        else:
+            self._reply(404, {"error": f"unknown stub path {url.path}"})
+
+    def do_GET(self) -> None:
+        self._handle(b"")
+
+    def do_POST(self) -> None:
+        self._handle(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+
+class StubUpstreams(ThreadingHTTPServer):
+    """
+    Google CSE (/google), Tavily (/tavily), Nominatim (/nominatim) and
+    Overpass (/overpass) lookalikes. Each call waits latency * U(0.5, 1.5)
+    and fails with 503 at error_rate.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0, seed: int = 0):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-upstreams", daemon=True)
+
+    def draw(self, service: str):
+        with self._lock:
+            self.calls[service] += 1
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.failures[service] += 1
+            return (random.Random(self._rng.random()),
+                    self.latency * self._rng.uniform(0.5, 1.5), failed)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the app's upstream clients at this server"""
+        return {
+            "GOOGLE_CSE_URL": f"{self.url}/google/customsearch/v1",
+            "TAVILY_API_URL": f"{self.url}/tavily",
+            "NOMINATIM_URL": f"{self.url}/nominatim/search",
+            "OVERPASS_URL": f"{self.url}/overpass/api/interpreter",
+        }
+
+    def start(self) -> "StubUpstreams":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# ============================================================================
+# APP UNDER TEST
+# ============================================================================
+
+def install_scripted_model(agent_module, **settings):
+    """Replace agent.py's ChatOpenAI with a ScriptedChatModel that knows SCENARIOS"""
+    from src.fake_llm import ScriptedChatModel
+    from src.metrics import llm_metrics
+
+    model = ScriptedChatModel(scripts={s["question"]: s["tool_calls"] for s in SCENARIOS},
+                              callbacks=[llm_metrics], **settings)
+    agent_module.llm = model
+    agent_module.llm_with_tools = model.bind_tools(agent_module.tools)
+    return model
+
+
+def serve(port: int, first_token_latency: float, token_latency: float, answer_tokens: int) -> None:
+    """Run the real app with the scripted model (the subprocess side of run())"""
+    # ChatOpenAI is still constructed at import; it is never called
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-load-test")
+    import uvicorn
+
+    from src import agent, api
+
+    model = install_scripted_model(agent, first_token_latency=first_token_latency,
+                                   token_latency=token_latency, answer_tokens=answer_tokens)
+    # The lifespan fetches the agent's client through default_llm() on startup
+    api.default_llm = lambda: model
+    uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(client, base_url: str, process: subprocess.Popen, timeout: float,
+                      headers: Dict[str, str]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited during startup (code {process.returncode})")
+        try:
+            if (await client.get(f"{base_url}/metrics", headers=headers)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"app not ready after {timeout:.0f}s")
+
+
+# ============================================================================
+# LOAD DRIVER
+# ============================================================================
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.ttft: List[float] = []
+        self.ttfb: List[float] = []
+        self.conversations = 0
+
+    def record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        self.latencies[endpoint].append(elapsed)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+async def _timed(results: Results, endpoint: str, call):
+    start = time.perf_counter()
+    try:
+        response = await call
+    except Exception:
+        results.record(endpoint, time.perf_counter() - start, ok=False)
+        return None
+    results.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+    return response
+
+
+async def _chat(client, base_url: str, results: Results, user: Dict[str, Any],
+                thread_id: str, question: str) -> None:
+    """One streamed turn through the CopilotKit remote endpoint"""
+    body = {
+        "name": AGENT_NAME,
+        "threadId": thread_id,
+        "nodeName": None,
+        "state": {"user": user},
+        "messages": [{"id": str(uuid.uuid4()), "role": "user", "content": question,
+                      "type": "TextMessage", "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ")}],
+        "actions": [],
+        "config": {},
+        "properties": {},
+        "metaEvents": [],
+    }
+    start = time.perf_counter()
+    first_byte = first_token = None
+    ok = False
+    try:
+        async with client.stream("POST", f"{base_url}/copilotkit/agents/execute", json=body) as response:
+            async for chunk in response.aiter_bytes():
+                now = time.perf_counter() - start
+                if first_byte is None and chunk:
+                    first_byte = now
+                if first_token is None and b"on_chat_model_stream" in chunk:
+                    first_token = now
+            ok = response.status_code < 400
+    except Exception:
+        pass
+    results.record("POST /copilotkit", time.perf_counter() - start, ok)
+    if ok:
+        results.conversations += 1
+        if first_byte is not None:
+            results.ttfb.append(first_byte)
+        if first_token is not None:
+            results.ttft.append(first_token)
+
+
+async def _virtual_user(client, base_url: str, results: Results, index: int, run_id: str,
+                        conversations: int, start_delay: float) -> None:
+    await asyncio.sleep(start_delay)
+    email, password = f"loadtest-{run_id}-{index}@example.com", "load-test-password"
+
+    await _timed(results, "POST /api/auth/register", client.post(
+        f"{base_url}/api/auth/register", json={"email": email, "name": f"Load {index}", "password": password}))
+    login = await _timed(results, "POST /api/auth/login", client.post(
+        f"{base_url}/api/auth/login", json={"email": email, "password": password}))
+    if login is None or login.status_code != 200:
+        return
+    token = login.json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    user = {"email": email, "name": token["user"]["name"], "preferredLocations": ["New Cairo"],
+            "averageBudget": 5_000_000}
+
+    for turn in range(conversations):
+        scenario = SCENARIOS[(index + turn) % len(SCENARIOS)]
+        await _chat(client, base_url, results, user, f"{token['user']['thread_id']}-{turn}",
+                    scenario["question"])
+        await _timed(results, "GET /api/auth/me", client.get(f"{base_url}/api/auth/me", headers=headers))
+
+    if token.get("refresh_token"):
+        await _timed(results, "POST /api/auth/refresh", client.post(
+            f"{base_url}/api/auth/refresh", json={"refresh_token": token["refresh_token"]}))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _summary(values: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    return {"count": len(values), "errors": errors, "rps": len(values) / elapsed if elapsed else 0.0,
+            "p50": _percentile(values, 0.50), "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99), "max": max(values) if values else float("nan")}
+
+
+async def run(users: int = 10, conversations: int = 3, ramp: float = 2.0,
+              first_token_latency: float = 0.4, token_latency: float = 0.02, answer_tokens: int = 120,
+              upstream_latency: float = 0.2, upstream_error_rate: float = 0.0, seed: int = 0,
+              startup_timeout: float = 120.0, app_log_level: str = "WARNING") -> Dict[str, Any]:
+    """Start stubs and the app, drive `users` concurrent users, return the report"""
+    import httpx
+
+    stubs = StubUpstreams(upstream_latency, upstream_error_rate, seed).start()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cache_dir = tempfile.mkdtemp(prefix="aqar-loadtest-")
+    metrics_token = uuid.uuid4().hex
+    metrics_headers = {"Authorization": f"Bearer {metrics_token}"}
+    env = dict(os.environ, **stubs.env(),
+               METRICS_ENABLED="true", METRICS_TOKEN=metrics_token,
+               LISTING_CACHE_PATH=os.path.join(cache_dir, "listings.sqlite3"),
+               LOG_LEVEL=app_log_level, PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.loadtest", "serve", "--port", str(port),
+         "--first-token-latency", str(first_token_latency), "--token-latency", str(token_latency),
+         "--answer-tokens", str(answer_tokens)],
+        env=env,
+    )
+
+    results = Results()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=10.0), limits=limits) as client:
+            await _wait_ready(client, base_url, process, startup_timeout, metrics_headers)
+            run_id = uuid.uuid4().hex[:8]
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                _virtual_user(client, base_url, results, i, run_id, conversations, ramp * i / max(users, 1))
+                for i in range(users)
+            ))
+            elapsed = time.perf_counter() - start
+            metrics_text = (await client.get(f"{base_url}/metrics", headers=metrics_headers)).text
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stubs.stop()
+
+    requests_total = sum(len(v) for v in results.latencies.values())
+    errors_total = sum(results.errors.values())
+    return {
+        "config": {"users": users, "conversations": conversations, "ramp": ramp,
+                   "first_token_latency": first_token_latency, "token_latency": token_latency,
+                   "answer_tokens": answer_tokens, "upstream_latency": upstream_latency,
+                   "upstream_error_rate": upstream_error_rate, "seed": seed},
+        "elapsed": elapsed,
+        "requests": requests_total,
+        "rps": requests_total / elapsed,
+        "conversations_per_s": results.conversations / elapsed,
+        "error_rate": errors_total / requests_total if requests_total else 0.0,
+        "endpoints": {name: _summary(values, elapsed, results.errors.get(name, 0))
+                      for name, values in sorted(results.latencies.items())},
+        "ttfb": _summary(results.ttfb, elapsed),
+        "ttft": _summary(results.ttft, elapsed),
+        "upstream_calls": dict(stubs.calls),
+        "upstream_failures": dict(stubs.failures),
+        "app_metrics": metrics_text,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(f"\n⏱️ Load test: {config['users']} users × {config['conversations']} conversations "
+          f"in {report['elapsed']:.1f}s")
+    print("=" * 92)
+    print(f"{'endpoint':<28}{'count':>7}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+    def row(name: str, s: Dict[str, float]) -> None:
+        print(f"{name:<28}{s['count']:>7}{s['errors']:>8}{s['rps']:>9.2f}"
+              f"{s['p50'] * 1000:>10.0f}{s['p95'] * 1000:>10.0f}{s['p99'] * 1000:>10.0f}{s['max'] * 1000:>10.0f}")
+
+    for name, summary in report["endpoints"].items():
+        row(name, summary)
+    row("copilotkit first byte", report["ttfb"])
+    row("copilotkit first token", report["ttft"])
+    print("-" * 92)
+    print(f"total: {report['requests']} requests, {report['rps']:.2f} req/s, "
+          f"{report['conversations_per_s']:.2f} conversations/s, {report['error_rate']:.1%} errors")
+    calls = ", ".join(f"{k} {v} ({report['upstream_failures'].get(k, 0)} failed)"
+                      for k, v in sorted(report["upstream_calls"].items()))
+    print(f"upstream calls: {calls or 'none'}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test (scripted LLM, stub upstreams)")
+    sub = parser.add_subparsers(dest="command")
+
+    serve_parser = sub.add_parser("serve", help="internal: run the app with the scripted model")
+    serve_parser.add_argument("--port", type=int, required=True)
+
+    for p in (parser, serve_parser):
+        p.add_argument("--first-token-latency", type=float, default=0.4, help="seconds before the first token")
+        p.add_argument("--token-latency", type=float, default=0.02, help="seconds per streamed token")
+        p.add_argument("--answer-tokens", type=int, default=120, help="tokens in each final answer")
+
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--conversations", type=int, default=3, help="conversations per user")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users start")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="mean stub latency in seconds")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="fraction of stub calls failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--max-p95", type=float, help="fail if any endpoint's p95 exceeds this many seconds")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the error rate exceeds this fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.port, args.first_token_latency, args.token_latency, args.answer_tokens)
+        return 0
+
+    report = asyncio.run(run(
+        users=args.users, conversations=args.conversations, ramp=args.ramp,
+        first_token_latency=args.first_token_latency, token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens, upstream_latency=args.upstream_latency,
+        upstream_error_rate=args.upstream_error_rate, seed=args.seed,
+    ))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = []
+    if args.max_p95 is not None:
+        failed += [f"{name} p95 {s['p95']:.2f}s > {args.max_p95}s"
+                   for name, s in report["endpoints"].items() if s["p95"] > args.max_p95]
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {report['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    for reason in failed:
+        print(f"❌ {reason}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Structured logging for the API process
+- One JSON object per line (LOG_FORMAT=text for local reading)
+- Records are handed to a QueueHandler and written by a background
+  listener thread, so request handlers never block on stdout; when the
+  queue is full records are dropped and counted instead of waiting
+- Per-module levels: LOG_LEVEL for the root, LOG_LEVELS="src.agent=DEBUG,
+  sqlalchemy.engine=INFO" for overrides
+- Every record carries the request id (CorrelationIdMiddleware, echoed as
+  X-Request-ID) and the conversation thread id when known
+- log_payload samples large bodies (tool results, generated code) and
+  truncates them
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "sqlalchemy.engine=WARNING,httpx=WARNING,httpcore=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.05"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+thread_id_var: ContextVar[Optional[str]] = ContextVar("thread_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+# ============================================================================
+# RECORD ENRICHMENT AND FORMATTING
+# ============================================================================
+
+try:
+    # The config LangGraph propagates to nodes and tools; read directly because
+    # langgraph.config.get_config raises (slowly) outside a graph run
+    from langchain_core.runnables.config import var_child_runnable_config
+except ImportError:  # pragma: no cover
+    var_child_runnable_config = ContextVar("child_runnable_config", default=None)
+
+
+def _graph_thread_id() -> Optional[str]:
+    """thread_id of the LangGraph run executing on this task, if any"""
+    config = var_child_runnable_config.get()
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get("thread_id")
+
+
+class ContextFilter(logging.Filter):
+    """Runs in the logging thread's caller, where the context variables are visible"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.thread_id = thread_id_var.get() or _graph_thread_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record"""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format args now (the listener thread may see mutated objects later)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: stopping must flush, even with a full queue
+        self.queue.put(self._sentinel)
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+_listener: Optional[QueueListener] = None
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT,
+                  stream=None) -> None:
+    """Install the queue handler on the root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == "text":
+        output.setFormatter(TextFormatter())
+    else:
+        output.setFormatter(JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, module_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = _Listener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.DEBUG,
+                **fields) -> None:
+    """
+    Log a potentially large payload: only when `level` is enabled, for a
+    LOG_PAYLOAD_SAMPLE_RATE fraction of calls, truncated to LOG_PAYLOAD_MAX_CHARS
+    """
+    if not logger.isEnabledFor(level) or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else str(payload)
+    fields["payload_chars"] = len(text)
+    fields["payload"] = text[:LOG_PAYLOAD_MAX_CHARS]
+    logger.log(level, message, extra=fields)
+
+
+# ============================================================================
+# CORRELATION IDS
+# ============================================================================
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class CorrelationIdMiddleware:
+    """Pure ASGI: sets request_id_var per request and echoes it as X-Request-ID"""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                request_id = candidate if _REQUEST_ID.match(candidate) else None
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((self.header, request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        request_token = request_id_var.set(request_id)
+        thread_token = thread_id_var.set(None)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            thread_id_var.reset(thread_token)
+            request_id_var.reset(request_token)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_logging(records: int = 20000, payload_chars: int = 4000, sink_mb_per_s: float = 20.0):
+    """
+    Caller-side cost of writing a tool-result-sized line with print versus
+    the queued logger (payload sampled), both into a pipe drained by a log
+    shipper that reads at `sink_mb_per_s`.
+    """
+    import subprocess
+
+    shipper = (
+        "import sys, time\n"
+        f"rate = {sink_mb_per_s * 1e6}\n"
+        "while True:\n"
+        "    chunk = sys.stdin.buffer.read1(65536)\n"
+        "    if not chunk: break\n"
+        "    time.sleep(len(chunk) / rate)\n"
+    )
+    payload = "x" * payload_chars
+
+    def run(write) -> float:
+        sink = subprocess.Popen([sys.executable, "-c", shipper], stdin=subprocess.PIPE,
+                                text=True, encoding="utf-8")
+        try:
+            start = time.perf_counter()
+            write(sink.stdin)
+            return time.perf_counter() - start
+        finally:
+            sink.stdin.close()
+            sink.wait()
+
+    def with_print(stream):
+        for i in range(records):
+            print(f"🧰 Tool result {i}: {payload}", file=stream)
+
+    def with_logger(stream):
+        setup_logging(stream=stream)
+        logger = logging.getLogger("benchmark")
+        for i in range(records):
+            logger.info("🧰 Tool executed", extra={"tool": "execute_python_query", "n": i})
+            log_payload(logger, "Tool result", payload, level=logging.INFO)
+        shutdown_logging()
+
+    printed = run(with_print)
+    logged = run(with_logger)
+
+    print(f"\n⏱️ Logging benchmark ({records} records, {payload_chars}-char payloads, "
+          f"shipper at {sink_mb_per_s:.0f} MB/s)")
+    print("=" * 60)
+    print(f"print (full payload):     {printed / records * 1e6:8.1f} µs/record in the caller")
+    print(f"queued JSON logger:       {logged / records * 1e6:8.1f} µs/record in the caller "
+          f"({LOG_PAYLOAD_SAMPLE_RATE:.0%} payloads sampled, {DroppingQueueHandler.dropped} dropped)")
+
+
+if __name__ == "__main__":
+    benchmark_logging()
@@ -5,24 +5,31 @@ This application uses:
 - FastAPI for the web server
 - LangGraph for agent orchestration with tool calling
 - CopilotKit for frontend integration
-- OpenAI embeddings for vectorization
-- In-memory vector store for document retrieval
+- OpenAI embeddings for vectorization, cached on disk per PDF/splitter/model
+- NumPy cosine-similarity store for document retrieval
 - Tool-calling pattern where the LLM decides when to query the PDF
 """
 
+import hashlib
+import json
 import os
+import shutil
+import sys
+import time
 from typing import Annotated, Any
 from contextlib import asynccontextmanager
 import logging
 
+import numpy as np
+
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.tools.retriever import create_retriever_tool
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import DocArrayInMemorySearch
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.tools import tool
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START
@@ -33,6 +40,8 @@ from typing_extensions import TypedDict
 from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 
+from src.llm_clients import llm_clients
+
 # Load environment variables
 load_dotenv()
 
@@ -41,55 +50,145 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Path to the PDF file
+PDF_PATH = os.path.join(os.path.dirname(__file__), "..", "docs", "GIU policy_ Admin.pdf")
+
+
 class State(TypedDict):
     """State schema for the conversational agent."""
     messages: Annotated[list, add_messages]
     retrieved_chunks: list[dict[str, Any]]  # Store retrieved document chunks
 
 
+# ============================================================================
+# EMBEDDING CACHE + VECTOR STORE
+# ============================================================================
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+RETRIEVER_K = 3  # Retrieve top 3 most relevant chunks
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", ".cache", "policy_embeddings"),
+)
+
+
+class NumpyRetriever(BaseRetriever):
+    """Cosine-similarity retriever over an in-memory matrix of unit vectors."""
+
+    vectors: Any
+    documents: list[Document]
+    embeddings: Any
+    k: int = RETRIEVER_K
+
+    def search(self, query: str) -> list[Document]:
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scores = self.vectors @ query_vector
+        k = min(self.k, len(self.documents))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.documents[i] for i in top]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
+        return self.search(query)
+
+
+def _embedding_cache_key(pdf_path: str, model: str) -> str:
+    """Vectors are valid for one PDF content + splitter settings + embedding model."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    params = json.dumps({"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "model": model})
+    digest.update(params.encode())
+    return digest.hexdigest()[:32]
+
+
+def _load_cached_embeddings(cache_path: str):
+    vectors_path = os.path.join(cache_path, "vectors.npy")
+    chunks_path = os.path.join(cache_path, "chunks.json")
+    if not (os.path.exists(vectors_path) and os.path.exists(chunks_path)):
+        return None
+    with open(chunks_path, encoding="utf-8") as f:
+        chunks = json.load(f)
+    documents = [Document(page_content=c["content"], metadata=c["metadata"]) for c in chunks]
+    return np.load(vectors_path), documents
+
+
+def _save_cached_embeddings(cache_path: str, vectors: np.ndarray, documents: list[Document]):
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, "vectors.npy"), vectors)
+    with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump([{"content": d.page_content, "metadata": d.metadata} for d in documents], f)
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Another process cached the same key first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
 def load_and_index_pdf(pdf_path: str):
     """
     Load PDF, split into chunks, and create a vector store with embeddings.
 
+    Chunk embeddings are cached on disk keyed by the PDF's hash, the splitter
+    settings and the embedding model, so warm starts skip parsing and the
+    embeddings API entirely.
+
     Args:
         pdf_path: Path to the PDF file
 
     Returns:
         A retriever object for querying the indexed documents
     """
-    logger.info(f"Loading PDF from: {pdf_path}")
-
-    # Load the PDF
-    loader = PyPDFLoader(pdf_path)
-    documents = loader.load()
-
-    logger.info(f"Loaded {len(documents)} pages from PDF")
-
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
-    splits = text_splitter.split_documents(documents)
-
-    logger.info(f"Split into {len(splits)} chunks")
+    start = time.perf_counter()
+    embeddings = llm_clients.openai_embeddings()
+    cache_path = os.path.join(EMBEDDING_CACHE_DIR, _embedding_cache_key(pdf_path, embeddings.model))
+
+    cached = _load_cached_embeddings(cache_path)
+    if cached is not None:
+        vectors, splits = cached
+        logger.info(f"Loaded {len(splits)} cached chunk embeddings in {time.perf_counter() - start:.2f}s (warm start)")
+    else:
+        logger.info(f"Loading PDF from: {pdf_path}")
+
+        # Load the PDF
+        loader = PyPDFLoader(pdf_path)
+        documents = loader.load()
+
+        logger.info(f"Loaded {len(documents)} pages from PDF")
+
+        # Split documents into chunks
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+        )
+        splits = text_splitter.split_documents(documents)
 
-    # Create embeddings and vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = DocArrayInMemorySearch.from_documents(
-        documents=splits,
-        embedding=embeddings
-    )
+        logger.info(f"Split into {len(splits)} chunks")
 
-    logger.info("Vector store created successfully")
+        # Embed once and normalise so search is a single matrix product
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in splits]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        _save_cached_embeddings(cache_path, vectors, splits)
+        logger.info(f"Embedded and cached {len(splits)} chunks in {time.perf_counter() - start:.2f}s (cold start)")
 
     # Create and return retriever
-    retriever = vectorstore.as_retriever(
-        search_kwargs={"k": 3}  # Retrieve top 3 most relevant chunks
-    )
+    return NumpyRetriever(vectors=vectors, documents=splits, embeddings=embeddings, k=RETRIEVER_K)
+
 
-    return retriever
+def benchmark_startup(pdf_path: str):
+    """Time retriever construction with an empty embedding cache, then a warm one."""
+    shutil.rmtree(EMBEDDING_CACHE_DIR, ignore_errors=True)
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        load_and_index_pdf(pdf_path)
+        print(f"{label:>5} start: {time.perf_counter() - start:.2f}s")
 
 
 def create_agent_graph(retriever):
@@ -102,19 +201,29 @@ def create_agent_graph(retriever):
     Returns:
         Compiled LangGraph agent graph
     """
-    # Create retrieval tool
-    retriever_tool = create_retriever_tool(
-        retriever,
-        "retrieve_policy_info",
-        "Search and retrieve information from the GIU Admin Policy document. "
-        "Use this tool to answer questions about GIU administrative policies, "
-        "procedures, regulations, and guidelines."
-    )
+    # Create retrieval tool: one search yields both the text the LLM sees
+    # and the chunk metadata shown in the frontend (as the message artifact)
+    @tool("retrieve_policy_info", response_format="content_and_artifact")
+    def retriever_tool(query: str) -> tuple[str, list[dict[str, Any]]]:
+        """Search and retrieve information from the GIU Admin Policy document. Use this tool to answer questions about GIU administrative policies, procedures, regulations, and guidelines."""
+        docs = retriever.invoke(query)
+        content = "\n\n".join(doc.page_content for doc in docs)
+        chunks = [
+            {
+                "content": doc.page_content,
+                "page": doc.metadata.get("page", "Unknown"),
+                "source": doc.metadata.get("source", "GIU Policy"),
+                "index": i + 1,
+            }
+            for i, doc in enumerate(docs)
+        ]
+        return content, chunks
 
     tools = [retriever_tool]
+    tool_node = ToolNode(tools=tools)
 
     # Initialize LLM with tool binding
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = llm_clients.chat_openai("gpt-4o-mini", temperature=0)
     llm_with_tools = llm.bind_tools(tools)
 
     # Define the chatbot node
@@ -130,33 +239,14 @@ def create_agent_graph(retriever):
         """
         Custom tool node that executes retrieval and stores chunks in state.
         """
-        # Get the last message (which should have tool calls)
-        last_message = state["messages"][-1]
-
-        # Execute the tool calls
-        tool_node = ToolNode(tools=tools)
+        # Execute the tool calls (each retrieval runs exactly once)
         result = tool_node.invoke(state)
 
-        # Extract retrieved chunks if the retrieval tool was called
+        # Collect the chunk metadata the retrieval tool attached to its messages
         retrieved_chunks = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            for tool_call in last_message.tool_calls:
-                if tool_call.get("name") == "retrieve_policy_info":
-                    # Get the query that was used
-                    query = tool_call.get("args", {}).get("query", "")
-
-                    # Retrieve documents to get chunk details
-                    docs = retriever.invoke(query)
-
-                    # Format chunks for frontend display
-                    for i, doc in enumerate(docs):
-                        chunk_info = {
-                            "content": doc.page_content,
-                            "page": doc.metadata.get("page", "Unknown"),
-                            "source": doc.metadata.get("source", "GIU Policy"),
-                            "index": i + 1,
-                        }
-                        retrieved_chunks.append(chunk_info)
+        for message in result.get("messages", []):
+            if message.name == "retrieve_policy_info" and message.artifact:
+                retrieved_chunks.extend(message.artifact)
 
         return {
             "messages": result.get("messages", []),
@@ -204,11 +294,8 @@ async def lifespan(app: FastAPI):
     logger.info("Starting GIU Admin Policy QA Agent API")
     logger.info("=" * 60 + "\n")
 
-    # Path to the PDF file
-    pdf_path = os.path.join(os.path.dirname(__file__), "..", "docs", "GIU policy_ Admin.pdf")
-
-    # Load and index the PDF
-    retriever = load_and_index_pdf(pdf_path)
+    # Load and index the PDF (embeddings come from the on-disk cache after the first run)
+    retriever = load_and_index_pdf(PDF_PATH)
 
     # Create the agent graph
     graph = create_agent_graph(retriever)
@@ -279,4 +366,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark-startup" in sys.argv:
+        benchmark_startup(PDF_PATH)
+    else:
+        main()
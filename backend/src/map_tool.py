@@ -2,19 +2,24 @@
 # COMPREHENSIVE OSM ANALYZER FOR EGYPTIAN NEIGHBORHOODS
 # ============================================================================
 
+import os
 import httpx
+from src.metrics import external_call
+from src.logging_config import get_logger
 from typing import List, Dict, Any, Optional, Tuple
 import math
 from collections import Counter
 from langchain.tools import tool
 
 OSM_CONFIG = {
-    "overpass_url": "https://overpass-api.de/api/interpreter",
-    "nominatim_url": "https://nominatim.openstreetmap.org/search",
+    "overpass_url": os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter"),
+    "nominatim_url": os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search"),
     "timeout": 45,
     "max_retries": 3
 }
 
+logger = get_logger(__name__)
+
 # Comprehensive Egyptian neighborhood mappings
 EGYPTIAN_NEIGHBORHOODS = {
     # New Cairo Areas - FIXED names
@@ -103,8 +108,9 @@ class AdvancedNeighborhoodAnalyzer:
         }
         
         try:
-            response = httpx.get(self.config["nominatim_url"], params=params, timeout=15)
-            data = response.json()
+            with external_call("nominatim"):
+                response = httpx.get(self.config["nominatim_url"], params=params, timeout=15)
+                data = response.json()
             
             if data:
                 result = data[0]
@@ -121,7 +127,7 @@ class AdvancedNeighborhoodAnalyzer:
                 }
                 
         except Exception as e:
-            print(f"Geocoding failed for {neighborhood}: {e}")
+            logger.warning("Geocoding failed for %s: %s", neighborhood, e)
         
         return None
     
@@ -131,15 +137,16 @@ class AdvancedNeighborhoodAnalyzer:
      Execute Overpass API query and return results
     """
      try:
-        response = httpx.post(
-            self.config["overpass_url"],
-            data={'data': query},
-            timeout=self.config["timeout"]
-        )
-        response.raise_for_status()
-        return response.json().get('elements', [])
+        with external_call("overpass"):
+            response = httpx.post(
+                self.config["overpass_url"],
+                data={'data': query},
+                timeout=self.config["timeout"]
+            )
+            response.raise_for_status()
+            return response.json().get('elements', [])
      except Exception as e:
-        print(f"Overpass query failed: {e}")
+        logger.warning("Overpass query failed: %s", e)
         return []
     
     def analyze_neighborhood_comprehensive(self, neighborhood: str, analysis_focus: List[str] = None) -> Dict[str, Any]:
@@ -154,7 +161,7 @@ class AdvancedNeighborhoodAnalyzer:
         if not geo_data:
             return {"error": f"Could not find neighborhood: {neighborhood}"}
         
-        print(f"🔍 Analyzing {neighborhood} with focus: {analysis_focus}")
+        logger.info("Analyzing %s", neighborhood, extra={"analysis_focus": analysis_focus})
         
         # Perform comprehensive OSM queries
         analysis_results = {}
@@ -7,13 +7,27 @@ Separate tool for market information, trends, regulations, investment analysis
 from langchain_core.tools import tool
 from typing import Literal, Optional, List, Dict, Any
 from tavily import TavilyClient
+from src.metrics import instrumented
+from src.logging_config import get_logger
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 import re
 
+from src.cache import SemanticCache, SentenceEmbedder, SingleFlight, normalize_text
+from src.keyword_matcher import KeywordMatcher
+
 # Initialize Tavily client
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "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")
 tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
+if os.getenv("TAVILY_API_URL"):
+    # e.g. the load test's local stub
+    tavily_client.base_url = os.getenv("TAVILY_API_URL")
+_tavily_search = instrumented("tavily", tavily_client.search)
+
+logger = get_logger(__name__)
 
 
 # =============================================
@@ -238,41 +252,61 @@ INFO_QUERY_PATTERNS = {
 }
 
 
+# Locations mentioned for context
+EGYPT_LOCATIONS = [
+    "new cairo", "6th october", "sheikh zayed", "new administrative capital", "new capital",
+    "zamalek", "maadi", "heliopolis", "north coast", "ain sokhna",
+    "5th settlement", "fifth settlement", "nasr city", "giza", "cairo", "alexandria",
+    "hurghada", "sharm el sheikh", "el gouna"
+]
+
+COMPARATIVE_WORDS = ["compare", "vs", "versus", "difference", "better"]
+FUTURE_WORDS = ["future", "forecast", "will", "2026", "2027", "2028"]
+
+_YEAR_RE = re.compile(r'20\d{2}')
+
+
+def _build_info_matcher() -> KeywordMatcher:
+    """One matcher for categories, locations and temporal/comparative flags"""
+    keywords = []
+    for category, config in INFO_QUERY_PATTERNS.items():
+        keywords.extend((keyword, f"category:{category}") for keyword in config["keywords"])
+    keywords.extend((location, f"location:{location}") for location in EGYPT_LOCATIONS)
+    keywords.extend((word, "flag:comparative") for word in COMPARATIVE_WORDS)
+    keywords.extend((word, "flag:future") for word in FUTURE_WORDS)
+    return KeywordMatcher(keywords)
+
+
+# Built once at import; classify_info_query scans the query a single time
+INFO_QUERY_MATCHER = _build_info_matcher()
+
+
 def classify_info_query(query: str) -> Dict[str, Any]:
     """
     Classify market information queries (not property searches)
     """
     query_lower = query.lower()
+    tags = INFO_QUERY_MATCHER.tags(query_lower)
     
-    # Detect categories
-    detected_categories = []
-    for category, config in INFO_QUERY_PATTERNS.items():
-        if any(keyword in query_lower for keyword in config["keywords"]):
-            detected_categories.append(category)
+    # Detect categories (in INFO_QUERY_PATTERNS order)
+    detected_categories = [c for c in INFO_QUERY_PATTERNS if f"category:{c}" in tags]
     
     # Default to market trends if nothing specific detected
     if not detected_categories:
         detected_categories = ["market_trends"]
     
     # Extract temporal context
-    years = re.findall(r'20\d{2}', query_lower)
+    years = _YEAR_RE.findall(query_lower)
     
     # Detect if question is about specific location (for context)
-    egypt_locations = [
-        "new cairo", "6th october", "sheikh zayed", "new administrative capital", "new capital",
-        "zamalek", "maadi", "heliopolis", "north coast", "ain sokhna",
-        "5th settlement", "fifth settlement", "nasr city", "giza", "cairo", "alexandria",
-        "hurghada", "sharm el sheikh", "el gouna"
-    ]
-    
-    mentioned_locations = [loc for loc in egypt_locations if loc in query_lower]
+    mentioned_locations = [loc for loc in EGYPT_LOCATIONS if f"location:{loc}" in tags]
     
     return {
         "categories": detected_categories,
         "locations": mentioned_locations,
         "years": years,
-        "is_comparative": any(word in query_lower for word in ["compare", "vs", "versus", "difference", "better"]),
-        "is_future_focused": any(word in query_lower for word in ["future", "forecast", "will", "2026", "2027", "2028"]),
+        "is_comparative": "flag:comparative" in tags,
+        "is_future_focused": "flag:future" in tags,
         "is_regulatory": "regulations_laws" in detected_categories or "government_policy" in detected_categories
     }
 
@@ -327,6 +361,117 @@ def build_info_domain_filter(classification: Dict[str, Any]) -> List[str]:
     return filtered[:6]  # Top 6 sources
 
 
+# =============================================
+# 💾 MARKET ANSWER CACHE
+# =============================================
+
+# How long an answer stays fresh, per category. Laws and market sizing move
+# slowly; trends, pricing and developer news go stale within a day.
+CATEGORY_CACHE_TTL = {
+    "regulations_laws": 7 * 86400,
+    "foreign_investment": 7 * 86400,
+    "market_size": 7 * 86400,
+    "government_policy": 3 * 86400,
+    "market_forecast": 3 * 86400,
+    "new_cities": 3 * 86400,
+    "investment_advice": 86400,
+    "rental_market": 86400,
+    "economic_factors": 12 * 3600,
+    "market_trends": 12 * 3600,
+    "pricing_analysis": 12 * 3600,
+    "developer_activity": 6 * 3600,
+}
+DEFAULT_CACHE_TTL = 86400
+FALLBACK_CACHE_TTL = 3600  # Unfiltered fallback answers are lower quality
+
+MARKET_CACHE_SIMILARITY = float(os.getenv("MARKET_CACHE_SIMILARITY", "0.92"))
+MARKET_CACHE_SIZE = int(os.getenv("MARKET_CACHE_SIZE", "512"))
+MARKET_CACHE_EMBED_MODEL = os.getenv("MARKET_CACHE_EMBED_MODEL", "all-MiniLM-L6-v2")
+
+# Fallback search starts if the primary hasn't answered within the hedge
+# delay (or as soon as it fails); whichever succeeds first within the
+# deadline wins
+MARKET_HEDGE_DELAY = float(os.getenv("MARKET_HEDGE_DELAY", "6"))
+MARKET_SEARCH_DEADLINE = float(os.getenv("MARKET_SEARCH_DEADLINE", "25"))
+
+_embed_query = SentenceEmbedder(MARKET_CACHE_EMBED_MODEL, name="Market")
+
+market_answer_cache = SemanticCache(
+    "market_answers",
+    embed=_embed_query,
+    threshold=MARKET_CACHE_SIMILARITY,
+    maxsize=MARKET_CACHE_SIZE,
+)
+_market_flight = SingleFlight()
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="market-search")
+
+
+def cache_ttl_for(classification: Dict[str, Any]) -> int:
+    """Shortest TTL among the detected categories"""
+    return min(
+        (CATEGORY_CACHE_TTL.get(c, DEFAULT_CACHE_TTL) for c in classification["categories"]),
+        default=DEFAULT_CACHE_TTL,
+    )
+
+
+def warm_market_cache() -> None:
+    """Load the semantic tier's model (API startup, in a thread)"""
+    _embed_query.warm()
+
+
+def get_market_cache_stats() -> Dict[str, Any]:
+    """Hit ratio of the market answer cache"""
+    return market_answer_cache.stats()
+
+
+def _hedged_search(primary_params: Dict[str, Any], fallback_params: Dict[str, Any]) -> tuple:
+    """
+    Run the primary Tavily search, racing the fallback against it once the
+    hedge delay passes or the primary fails. Returns (response, used_fallback).
+    """
+    deadline = time.monotonic() + MARKET_SEARCH_DEADLINE
+
+    def submit(params: Dict[str, Any]):
+        # The HTTP timeout ends each call at the deadline, so abandoned
+        # searches free their pool thread instead of piling up under load
+        request_timeout = max(1, math.ceil(deadline - time.monotonic()))
+        return _search_pool.submit(_tavily_search, timeout=request_timeout, **params)
+
+    primary = submit(primary_params)
+    pending = {primary}
+    fallback = None
+    errors = []
+
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = remaining if fallback is not None else min(remaining, MARKET_HEDGE_DELAY)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            # Prefer the primary (domain-filtered) answer when both are ready
+            for future in sorted(done, key=lambda f: f is not primary):
+                try:
+                    return future.result(), future is fallback
+                except Exception as e:
+                    errors.append(e)
+
+            if fallback is None:
+                logger.info("Racing fallback search")
+                fallback = submit(fallback_params)
+                pending.add(fallback)
+    finally:
+        # Searches still queued behind a busy pool are dropped; running ones
+        # end at their request timeout
+        for future in pending:
+            future.cancel()
+
+    if errors:
+        raise errors[-1]
+    raise TimeoutError(f"No search response within {MARKET_SEARCH_DEADLINE:.0f}s")
+
+
 # =============================================
 # 🔍 MAIN MARKET INTELLIGENCE TOOL
 # =============================================
@@ -373,53 +518,81 @@ def search_market_intelligence(
         Formatted market intelligence with expert sources and analysis
     """
     
+    # Step 1: Classify query
+    classification = classify_info_query(query)
+    logger.info("Market intelligence search", extra={"query": query, "categories": classification['categories']})
+    
+    # Answers are only interchangeable between calls with the same options,
+    # places and topics: "Sheikh Zayed market trends" must never be served
+    # the cached "New Cairo market trends" answer however similar the text
+    variant = "|".join([
+        str(max_results), str(include_answer), search_depth,
+        ",".join(sorted(classification["locations"])),
+        ",".join(sorted(classification["categories"])),
+    ])
+    cached = market_answer_cache.get(query, namespace=variant)
+    if cached is not None:
+        logger.debug("Served from market answer cache")
+        return format_intelligence_report(cached, classification, query)
+    
+    flight_key = f"{variant}|{normalize_text(query)}"
     try:
-        print(f"\n🧠 MARKET INTELLIGENCE SEARCH")
-        print(f"📝 Query: {query}")
-        
-        # Step 1: Classify query
-        classification = classify_info_query(query)
-        print(f"🎯 Categories: {classification['categories']}")
-        
-        # Step 2: Build search query
-        search_query = build_info_search_query(query, classification)
-        print(f"🔎 Enhanced: {search_query}")
-        
-        # Step 3: Get priority domains
-        domains = build_info_domain_filter(classification)
-        print(f"🌐 Sources: {domains}")
-        
-        # Step 4: Execute search
-        search_params = {
-            "query": search_query,
-            "max_results": max_results,
-            "search_depth": search_depth,
-            "include_answer": include_answer,
-            "include_domains": domains if domains else None
-        }
-        
-        print(f"⚙️ Searching...")
-        response = tavily_client.search(**search_params)
+        response, shared = _market_flight.do(
+            flight_key,
+            lambda: _search_and_cache(query, classification, variant,
+                                      max_results, include_answer, search_depth)
+        )
+        if shared:
+            logger.debug("Shared in-flight market search")
         
         # Step 5: Format results
-        output = format_intelligence_report(response, classification, query)
-        
-        return output
-        
+        return format_intelligence_report(response, classification, query)
+    
     except Exception as e:
-        error_msg = f"❌ Search Error: {str(e)}\n\n"
-        error_msg += "🔄 Attempting fallback search...\n"
-        
-        try:
-            # Fallback without domain restrictions
-            fallback_response = tavily_client.search(
-                query=query + " egypt real estate 2025",
-                max_results=max_results,
-                include_answer=True
-            )
-            return format_intelligence_report(fallback_response, classification, query)
-        except Exception as fallback_error:
-            return f"❌ Search failed: {str(fallback_error)}\n\n💡 Suggestion: Try rephrasing your question or being more specific about what information you need."
+        return f"❌ Search failed: {str(e)}\n\n💡 Suggestion: Try rephrasing your question or being more specific about what information you need."
+
+
+def _search_and_cache(
+    query: str,
+    classification: Dict[str, Any],
+    variant: str,
+    max_results: int,
+    include_answer: bool,
+    search_depth: str
+) -> Dict[str, Any]:
+    """Run the hedged Tavily search and store the response in the answer cache"""
+    
+    # Step 2: Build search query
+    search_query = build_info_search_query(query, classification)
+    
+    # Step 3: Get priority domains
+    domains = build_info_domain_filter(classification)
+    logger.debug("Enhanced query: %s", search_query, extra={"domains": domains})
+    
+    # Step 4: Execute search
+    search_params = {
+        "query": search_query,
+        "max_results": max_results,
+        "search_depth": search_depth,
+        "include_answer": include_answer,
+        "include_domains": domains if domains else None
+    }
+    
+    # Fallback without domain restrictions
+    fallback_params = {
+        "query": query + " egypt real estate 2025",
+        "max_results": max_results,
+        "include_answer": True
+    }
+    
+    response, used_fallback = _hedged_search(search_params, fallback_params)
+    
+    ttl = cache_ttl_for(classification)
+    if used_fallback:
+        ttl = min(ttl, FALLBACK_CACHE_TTL)
+    market_answer_cache.set(query, response, ttl=ttl, namespace=variant)
+    
+    return response
 
 
 def format_intelligence_report(
@@ -495,33 +668,50 @@ def format_intelligence_report(
     return "\n".join(output)
 
 
+_DOMAIN_RE = re.compile(r'(?:https?://)?(?:www\.)?([^/]+)')
+
+GENERAL_SOURCE_INFO = {
+    "badge": "🔍 GENERAL SOURCE",
+    "specialty": "Market information"
+}
+
+
 def extract_domain(url: str) -> str:
     """Extract domain from URL"""
-    match = re.search(r'(?:https?://)?(?:www\.)?([^/]+)', url)
+    match = _DOMAIN_RE.search(url)
     return match.group(1) if match else url
 
 
+def _source_badge(priority: str) -> str:
+    if priority == "high":
+        return "⭐⭐⭐ VERIFIED"
+    elif priority == "medium":
+        return "⭐⭐ RELIABLE"
+    return "⭐ STANDARD"
+
+
+# Display info per source, found with one scan of the host for every source
+# name. Path-qualified sources (aqarmap.com.eg/ar/research) never occur in a
+# bare host, so they are left out instead of matching the whole site
+SOURCE_INFO = {
+    source_domain: {
+        "badge": _source_badge(config["priority"]),
+        "specialty": config["specialty"]
+    }
+    for source_domain, config in TRUSTED_INFO_SOURCES.items()
+    if "/" not in source_domain
+}
+_SOURCE_ORDER = {source_domain: i for i, source_domain in enumerate(SOURCE_INFO)}
+_SOURCE_MATCHER = KeywordMatcher((source_domain, source_domain) for source_domain in SOURCE_INFO)
+
+
 def get_source_info(domain: str) -> Dict[str, str]:
     """Get information about source reliability and specialty"""
-    for source_domain, config in TRUSTED_INFO_SOURCES.items():
-        if source_domain in domain:
-            priority = config["priority"]
-            if priority == "high":
-                badge = "⭐⭐⭐ VERIFIED"
-            elif priority == "medium":
-                badge = "⭐⭐ RELIABLE"
-            else:
-                badge = "⭐ STANDARD"
-            
-            return {
-                "badge": badge,
-                "specialty": config["specialty"]
-            }
-    
-    return {
-        "badge": "🔍 GENERAL SOURCE",
-        "specialty": "Market information"
-    }
+    # Same answer as checking `source_domain in domain` in listing order
+    found = _SOURCE_MATCHER.tags(domain)
+    if not found:
+        return dict(GENERAL_SOURCE_INFO)
+    return dict(SOURCE_INFO[min(found, key=_SOURCE_ORDER.__getitem__)])
 
 
 def generate_intelligence_recommendations(
@@ -617,5 +807,35 @@ def test_intelligence_tool():
         print(f"Domains: {domains}")
 
 
+def benchmark_classifier(iterations: int = 20_000):
+    """Micro-benchmark of query classification and source lookup"""
+    import time
+    
+    queries = [
+        "What are the current trends in Egyptian real estate market?",
+        "Is it a good time to invest in Egyptian real estate? ROI analysis",
+        "Can foreigners buy property in Egypt? What are the legal requirements?",
+        "What is the forecast for Egyptian residential market in 2026?",
+        "What are typical rental yields in New Cairo vs Sheikh Zayed?",
+    ]
+    domains = ["www.jll.com.eg", "news.reuters.com", "example.org", "lexology.com", "blog.savills.com"]
+    
+    print("\n⏱️ Classifier benchmark")
+    print("=" * 50)
+    
+    start = time.perf_counter()
+    for i in range(iterations):
+        classify_info_query(queries[i % len(queries)])
+    elapsed = time.perf_counter() - start
+    print(f"   classify_info_query: {elapsed / iterations * 1e6:6.2f} µs/query")
+    
+    start = time.perf_counter()
+    for i in range(iterations):
+        get_source_info(domains[i % len(domains)])
+    elapsed = time.perf_counter() - start
+    print(f"   get_source_info:     {elapsed / iterations * 1e6:6.2f} µs/lookup")
+
+
 if __name__ == "__main__":
-    test_intelligence_tool()
\ No newline at end of file
+    test_intelligence_tool()
+    benchmark_classifier()
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Targeted guard for tool calls with `args: None`
+- Replaces the process-wide BaseModel.validate_python patch that api.py used
+  to install: only AIMessage construction is touched, every other pydantic
+  model validates at native pydantic-core speed
+- Covers messages built outside the agent (CopilotKit converting frontend
+  messages, checkpoints written before agent.normalize_tool_calls)
+"""
+
+import time
+
+from langchain_core.messages import AIMessage
+
+_original_init = AIMessage.__init__
+
+
+def _dict_args(tool_calls) -> None:
+    for call in tool_calls:
+        if isinstance(call, dict) and call.get("args") is None:
+            call["args"] = {}
+
+
+def _init_with_dict_args(self, *args, **kwargs) -> None:
+    tool_calls = kwargs.get("tool_calls")
+    if tool_calls:
+        _dict_args(tool_calls)
+    _original_init(self, *args, **kwargs)
+
+
+def install_ai_message_args_guard() -> None:
+    """Idempotent; AIMessageChunk inherits the guarded __init__"""
+    AIMessage.__init__ = _init_with_dict_args
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_validation(rounds: int = 200000):
+    """
+    Validation throughput of a request-sized model natively and through a
+    Python wrapper like the removed global patch, plus AIMessage construction
+    with this guard.
+    """
+    from datetime import datetime
+    from typing import List, Optional
+    import uuid
+
+    from pydantic import BaseModel
+
+    class Profile(BaseModel):
+        id: uuid.UUID
+        email: str
+        name: str
+        thread_id: Optional[str] = None
+        created_at: datetime
+        preferred_locations: List[str] = []
+
+    data = {"id": str(uuid.uuid4()), "email": "user@example.com", "name": "User",
+            "thread_id": str(uuid.uuid4()), "created_at": "2024-01-01T00:00:00",
+            "preferred_locations": ["New Cairo", "Sheikh Zayed"]}
+
+    validator = Profile.__pydantic_validator__
+    native = validator.validate_python
+
+    def lenient_validate(data, **kwargs):
+        # What the global patch ran in front of every validation
+        if isinstance(data, dict) and "tool_calls" in data:
+            if data["tool_calls"]:
+                for tc in data["tool_calls"]:
+                    if isinstance(tc, dict) and tc.get("args") is None:
+                        tc["args"] = {}
+        return native(data, **kwargs)
+
+    def timed(fn, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        return count / (time.perf_counter() - start)
+
+    print(f"\n⏱️ Model validation benchmark ({rounds} validations)")
+    print("=" * 60)
+    print(f"{'path':<34}{'validations/s':>16}")
+    print(f"{'native (this change)':<34}{timed(lambda: native(data), rounds):>16.0f}")
+    print(f"{'global wrapper (removed)':<34}{timed(lambda: lenient_validate(data), rounds):>16.0f}")
+
+    message_rounds = rounds // 10
+    calls = [{"name": "execute_python_query", "args": {"code": "df.head()"}, "id": "call_1"}]
+    AIMessage.__init__ = _original_init
+    plain = timed(lambda: AIMessage(content="", tool_calls=calls), message_rounds)
+    install_ai_message_args_guard()
+    guarded = timed(lambda: AIMessage(content="", tool_calls=calls), message_rounds)
+    fixed = AIMessage(content="", tool_calls=[{"name": "x", "args": None, "id": "call_2"}])
+    print(f"{'AIMessage()':<34}{plain:>16.0f}")
+    print(f"{'AIMessage() with guard':<34}{guarded:>16.0f}")
+    print(f"null args become: {fixed.tool_calls[0]['args']}")
+
+
+if __name__ == "__main__":
+    benchmark_validation()
@@ -0,0 +1,437 @@
+"""
+Built-in metrics, exposed at /metrics in Prometheus text format
+  (off unless METRICS_ENABLED=true; scrapes need the METRICS_TOKEN bearer token)
+- Counters, gauges and histograms are plain in-process structures (no exporter
+  thread, no network), cheap enough to leave on: one lock and a bisect
+  per observation
+- Collectors turn the existing stats() dicts (caches, sandbox pool, plot
+  store, auth) into gauges at scrape time
+- Helpers: instrument_node for graph nodes, track / external_call for
+  timed blocks, LLMMetricsHandler as a LangChain callback for LLM calls
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+_INVALID_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ============================================================================
+# METRIC TYPES
+# ============================================================================
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class Registry:
+    def __init__(self, prefix: str = "aqar"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Tuple[Callable[[], Dict[str, Any]], str]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]],
+                           documentation: str = "") -> None:
+        """collect() returns a stats dict; numeric values become gauges named <prefix>_<name>_<key>"""
+        self._collectors[name] = (collect, documentation or f"{name} stats")
+
+    def _collected(self) -> List[str]:
+        lines = []
+        for name, (collect, documentation) in sorted(self._collectors.items()):
+            try:
+                stats = collect() or {}
+            except Exception as e:
+                lines.append(f"# {name} collector failed: {_escape(e)}")
+                continue
+            for key, value in _flatten(stats):
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                metric = _INVALID_NAME.sub("_", f"{self.prefix}_{name}_{key}")
+                lines.append(f"# HELP {metric} {documentation}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {_format_value(value)}")
+        return lines
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.extend(self._collected())
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+
+registry = Registry()
+
+NODE_DURATION = registry.histogram(
+    "node_duration_seconds", "Agent graph node execution time", ["node"])
+TOOL_DURATION = registry.histogram(
+    "tool_duration_seconds", "Tool execution time", ["tool"])
+TOOL_ERRORS = registry.counter(
+    "tool_errors_total", "Tool calls that raised", ["tool"])
+LLM_DURATION = registry.histogram(
+    "llm_request_duration_seconds", "LLM call latency", ["model"])
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "LLM tokens by direction (input/output)", ["model", "direction"])
+LLM_ERRORS = registry.counter(
+    "llm_errors_total", "LLM calls that failed", ["model"])
+LLM_IN_FLIGHT = registry.gauge(
+    "llm_requests_in_flight", "LLM calls currently waiting on the provider", ["model"])
+LLM_HTTP_REQUESTS = registry.counter(
+    "llm_http_requests_total", "HTTP requests sent by the shared LLM client pools", ["host"])
+LLM_HTTP_CONNECTIONS = registry.counter(
+    "llm_http_connections_opened_total", "New TCP connections opened by the shared LLM client pools", ["host"])
+LLM_PROMPT_CACHE_TOKENS = registry.counter(
+    "llm_prompt_cache_tokens_total", "Input tokens served from the provider's prompt cache", ["model"])
+LLM_PROMPT_CACHE_DURATION = registry.histogram(
+    "llm_prompt_cache_request_duration_seconds",
+    "LLM call latency by whether the provider's prompt cache was hit (hit/miss)", ["model", "prompt_cache"])
+LLM_CACHE_LOOKUPS = registry.counter(
+    "llm_cache_lookups_total", "LLM response cache lookups by tier and result (hit/miss)",
+    ["model", "tier", "result"])
+LLM_CACHE_TOKENS_SAVED = registry.counter(
+    "llm_cache_tokens_saved_total", "LLM tokens not sent/generated thanks to cache hits",
+    ["model", "direction"])
+LLM_CACHE_COST_SAVED = registry.counter(
+    "llm_cache_cost_saved_usd_total", "Estimated LLM spend avoided by cache hits (USD)", ["model"])
+DB_POOL_WAIT = registry.histogram(
+    "db_pool_wait_seconds", "Time to get a connection from a DB pool", ["pool"], WAIT_BUCKETS)
+EXTERNAL_DURATION = registry.histogram(
+    "external_request_duration_seconds", "External API latency", ["service"])
+EXTERNAL_ERRORS = registry.counter(
+    "external_request_errors_total", "External API calls that failed", ["service"])
+
+
+# ============================================================================
+# INSTRUMENTATION HELPERS
+# ============================================================================
+
+@contextmanager
+def track(histogram: Histogram, errors: Optional[Counter] = None, **labels) -> Iterator[None]:
+    """Time a block; exceptions are counted on `errors` and re-raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def external_call(service: str):
+    """with external_call("overpass"): ... """
+    return track(EXTERNAL_DURATION, EXTERNAL_ERRORS, service=service)
+
+
+def instrumented(service: str, fn: Callable) -> Callable:
+    """fn wrapped in external_call(service)"""
+    def call(*args, **kwargs):
+        with external_call(service):
+            return fn(*args, **kwargs)
+    return call
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Graph node wrapper recording NODE_DURATION (single-argument nodes)"""
+    def timed_node(state):
+        with NODE_DURATION.time(node=name):
+            return node(state)
+    timed_node.__name__ = getattr(node, "__name__", name)
+    return timed_node
+
+
+def _is_cache_hit(response) -> bool:
+    generations = (response.generations or [[]])[0]
+    return bool(generations) and all(
+        (getattr(getattr(g, "message", None), "response_metadata", None) or {}).get("cache_hit")
+        for g in generations)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """LangChain callback: latency, token usage and errors per model"""
+
+    def __init__(self):
+        self._runs: Dict[Any, Tuple[float, str]] = {}
+
+    @staticmethod
+    def _model(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model")
+        if not model and serialized:
+            model = (serialized.get("kwargs") or {}).get("model_name") or (serialized.get("kwargs") or {}).get("model")
+        return model or "unknown"
+
+    def _start(self, serialized, run_id, kwargs) -> None:
+        model = self._model(serialized, kwargs)
+        self._runs[run_id] = (time.perf_counter(), model)
+        LLM_IN_FLIGHT.inc(model=model)
+
+    def _finish(self, run_id) -> Tuple[Optional[float], str]:
+        start, model = self._runs.pop(run_id, (None, "unknown"))
+        if start is not None:
+            LLM_IN_FLIGHT.dec(model=model)
+        return start, model
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        start, model = self._finish(run_id)
+        if _is_cache_hit(response):
+            # No request was made; the LLM cache records hits and savings
+            return
+        output = response.llm_output or {}
+        model = output.get("model_name") or model
+
+        usage = output.get("token_usage") or {}
+        tokens_in = usage.get("prompt_tokens")
+        tokens_out = usage.get("completion_tokens")
+        tokens_cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        if tokens_in is None:
+            # Streaming responses carry usage on the message instead
+            for generation in (response.generations or [[]])[0]:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                tokens_in = (tokens_in or 0) + metadata.get("input_tokens", 0)
+                tokens_out = (tokens_out or 0) + metadata.get("output_tokens", 0)
+                tokens_cached += (metadata.get("input_token_details") or {}).get("cache_read", 0)
+        if tokens_in:
+            LLM_TOKENS.inc(tokens_in, model=model, direction="input")
+        if tokens_out:
+            LLM_TOKENS.inc(tokens_out, model=model, direction="output")
+        if tokens_cached:
+            LLM_PROMPT_CACHE_TOKENS.inc(tokens_cached, model=model)
+
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            LLM_DURATION.observe(elapsed, model=model)
+            if tokens_in:
+                LLM_PROMPT_CACHE_DURATION.observe(
+                    elapsed, model=model, prompt_cache="hit" if tokens_cached else "miss")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        start, model = self._finish(run_id)
+        LLM_ERRORS.inc(model=model)
+        if start is not None:
+            LLM_DURATION.observe(time.perf_counter() - start, model=model)
+
+
+llm_metrics = LLMMetricsHandler()
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_overhead(rounds: int = 200000):
+    """Per-observation cost of the instrumentation and the cost of a scrape"""
+    def timed(fn, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        return (time.perf_counter() - start) / count * 1e6
+
+    bench = Registry(prefix="bench")
+    histogram = bench.histogram("latency_seconds", "bench", ["tool"])
+    counter = bench.counter("calls_total", "bench", ["tool"])
+    tools = [f"tool_{i}" for i in range(15)]
+
+    def with_track():
+        with track(histogram, counter, tool="tool_3"):
+            pass
+
+    print(f"\n⏱️ Metrics overhead ({rounds} observations)")
+    print("=" * 60)
+    print(f"counter.inc:             {timed(lambda: counter.inc(tool='tool_1'), rounds):.2f} µs")
+    print(f"histogram.observe:       {timed(lambda: histogram.observe(0.123, tool='tool_2'), rounds):.2f} µs")
+    print(f"track() block:           {timed(with_track, rounds):.2f} µs")
+    for tool in tools:
+        histogram.observe(0.1, tool=tool)
+        counter.inc(tool=tool)
+    bench.register_collector("cache", lambda: {"hits": 10, "misses": 2, "hit_ratio": 0.83})
+    print(f"scrape ({len(bench.render().splitlines())} lines):      {timed(bench.render, 1000):.0f} µs")
+
+
+if __name__ == "__main__":
+    benchmark_overhead()
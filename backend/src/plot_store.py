@@ -0,0 +1,135 @@
+"""
+Content-addressed store for chart payloads
+- Figures are serialized once to compact Plotly JSON (no template, typed
+  arrays for numeric data) and identified by a hash of that JSON
+- Agent state keeps only {"id": ...}; the frontend fetches the payload from
+  /api/plots/{id}, so checkpoints no longer copy chart data on every step
+- Memory LRU in front of a directory of <id>.json files
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import plotly.io as pio
+
+from src.cache import TTLCache
+
+
+PLOT_STORE_DIR = os.getenv("PLOT_STORE_DIR", "data/.cache/plots")
+PLOT_STORE_TTL = int(os.getenv("PLOT_STORE_TTL", str(30 * 86400)))
+PLOT_STORE_MEMORY_SIZE = int(os.getenv("PLOT_STORE_MEMORY_SIZE", "256"))
+
+PLOT_ID_LENGTH = 16
+
+
+def compact_figure_json(figure: Any) -> str:
+    """
+    Serialize a Figure, figure dict or figure JSON string compactly.
+    The layout template is dropped: it is several KB per chart and the
+    frontend applies its own styling.
+    """
+    if isinstance(figure, str):
+        figure = json.loads(figure)
+    elif hasattr(figure, "to_dict"):
+        figure = figure.to_dict()
+    figure = dict(figure)
+    layout = dict(figure.get("layout") or {})
+    layout.pop("template", None)
+    figure["layout"] = layout
+    return pio.to_json(figure, validate=False, pretty=False)
+
+
+def plot_id_for(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:PLOT_ID_LENGTH]
+
+
+class PlotStore:
+    """Stores compact figure JSON under its content hash"""
+
+    def __init__(self, directory: Optional[str] = PLOT_STORE_DIR, ttl: float = PLOT_STORE_TTL,
+                 memory_size: int = PLOT_STORE_MEMORY_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.puts = 0
+        self.duplicates = 0
+        self.bytes_stored = 0
+
+    def _path(self, plot_id: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"{plot_id}.json")
+
+    def put(self, figure: Any, plot_id: Optional[str] = None) -> str:
+        """
+        Store a figure and return its id. JSON that was already compacted
+        (with a matching plot_id_for hash) is stored as-is.
+        """
+        if isinstance(figure, str) and plot_id is not None and plot_id_for(figure) == plot_id:
+            payload = figure
+        else:
+            payload = compact_figure_json(figure)
+            plot_id = plot_id_for(payload)
+
+        self.puts += 1
+        path = self._path(plot_id)
+        if self.memory.get(plot_id) is not None or (path and os.path.exists(path)):
+            self.duplicates += 1
+            self.memory.set(plot_id, payload)
+            if path and os.path.exists(path):
+                os.utime(path)  # Keep in-use plots from being purged
+            return plot_id
+
+        self.memory.set(plot_id, payload)
+        self.bytes_stored += len(payload)
+        if path:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        return plot_id
+
+    def get(self, plot_id: str) -> Optional[str]:
+        if len(plot_id) != PLOT_ID_LENGTH or not all(c in "0123456789abcdef" for c in plot_id):
+            return None
+        payload = self.memory.get(plot_id)
+        if payload is not None:
+            return payload
+        path = self._path(plot_id)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                payload = f.read()
+            self.memory.set(plot_id, payload)
+        return payload
+
+    def purge_expired(self) -> int:
+        """Delete stored plots not written within the TTL"""
+        if not self.directory:
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "puts": self.puts,
+            "duplicates": self.duplicates,
+            "bytes_stored": self.bytes_stored,
+            "memory_entries": len(self.memory),
+        }
+
+
+plot_store = PlotStore()
@@ -9,6 +9,10 @@ from typing import Dict, List, Optional, Literal
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 # =============================================
 # Database Connection Configuration
 # =============================================
@@ -77,8 +81,7 @@ def get_project_info_tool(project_name: str, info_type: str = "overview") -> str
 """
         
         # FIXED: Consistent parameter passing - use the same format for both placeholders
-        print(f"🔍 Query: {query}")
-        print(f"🔍 Parameters: {(project_name, project_name)}")
+        logger.debug("Project lookup", extra={"project_name": project_name})
         cursor.execute(query, (project_name, project_name))
         
         results = cursor.fetchall()
@@ -87,7 +90,7 @@ def get_project_info_tool(project_name: str, info_type: str = "overview") -> str
 
         
         if not results:
-            print(f"📌 Using ILIKE fallback for: {project_name}")
+            logger.debug("Using ILIKE fallback for %s", project_name)
             query_like = """
                 SELECT 
                     name, developer_name, location_name, 
@@ -108,16 +111,11 @@ def get_project_info_tool(project_name: str, info_type: str = "overview") -> str
             search_pattern = f"%{project_name}%"
             starts_with_pattern = f"{project_name}%"
             
-            print(f"🔍 ILIKE Query parameters:")
-            print(f"   1. Pattern: {search_pattern}")
-            print(f"   2. Exact: {project_name}")
-            print(f"   3. Starts: {starts_with_pattern}")
-            
             cursor.execute(query_like, (search_pattern, project_name, starts_with_pattern))
             results = cursor.fetchall()
             
             if results:
-                print(f"✅ Found {len(results)} results using ILIKE")
+                logger.debug("Found %d results using ILIKE", len(results))
         
         cursor.close()
         conn.close()
@@ -355,10 +353,7 @@ def get_project_info_tool(project_name: str, info_type: str = "overview") -> str
         return response
         
     except Exception as e:
-        error_msg = f"❌ Error: {str(e)}"
-        print(f"🚨 FULL ERROR: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Project info lookup failed")
         return f"❌ Oops! Something went wrong: {str(e)}\n\nPlease try again or ask about a different project."
 
 
@@ -424,7 +419,6 @@ def compare_projects_tool(
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        print("✅ Database connection established for compare_projects_tool")
         
         # Fetch all matching projects
         projects_data = []
@@ -500,7 +494,7 @@ def compare_projects_tool(
         
     except Exception as e:
         error_msg = f"❌ Error comparing projects: {str(e)}\n\nPlease try again."
-        print(error_msg)
+        logger.error("Error comparing projects: %s", e)
         return error_msg
 
 
@@ -490,372 +490,616 @@
 
 
 import pandas as pd
-from typing import Dict, Union, Any, Annotated
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Union, Any, Annotated, Callable, List, Optional, Tuple
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import Command
-import io
-import sys
-import uuid
 from langchain_core.messages import ToolMessage
 import plotly.express as px
 import plotly.graph_objects as go
-import io
-import contextlib
-from langgraph.prebuilt import InjectedState
 
-projects_df = pd.read_csv("data/projects_cleaned.csv")
-units_df = pd.read_csv("data/units_cleaned.csv")
+from src.sandbox import SandboxPool, SandboxError
+from src.datasets import Datasets, DatasetManager
+from src.logging_config import get_logger, log_payload
+from src.plot_store import compact_figure_json, plot_id_for, plot_store
 
-@tool
-def execute_python_query(
-    code: str,
-    tool_call_id: Annotated[str, InjectedToolCallId]
-) -> Union[str, Command]:
+# Shared columnar snapshot (categorical dtypes, value indexes on location/unit_type),
+# hot-reloaded when the CSVs change. Memoized results below are keyed on the
+# snapshot object, so a new version never sees stale aggregates.
+dataset_manager = DatasetManager()
+
+logger = get_logger(__name__)
+
+SMART_FUNCTIONS = [
+    'analyze_prices_by_location', 'compare_unit_types',
+    'find_affordable_options', 'analyze_price_trends',
+    'compare_developers', 'get_market_summary', 'filter_units'
+]
+
+# Plots produced by smart functions go to the sink of the running call
+_plot_sink: ContextVar[Optional[Callable[..., str]]] = ContextVar("plot_sink", default=None)
+
+
+def _emit_plots(plots: List[Tuple[str, str]]) -> None:
+    sink = _plot_sink.get()
+    if sink is not None:
+        for plot_id, payload in plots:
+            sink(payload, plot_id)
+
+
+def _compacting_saver(save_plot_to_state: Callable[..., str]) -> Callable[[Any], str]:
+    """save_plot_in_state for user code: compact and content-address inside the worker"""
+    def save_plot_in_state(figure: Any) -> str:
+        payload = compact_figure_json(figure)
+        return save_plot_to_state(payload, plot_id_for(payload))
+    return save_plot_in_state
+
+
+# ============================================================================
+# PRECOMPUTED AGGREGATES
+# ============================================================================
+
+def _box_stats(df: pd.DataFrame, by: str, value: str) -> pd.DataFrame:
     """
-    Execute Python code with access to smart analysis functions.
+    Per-group box plot summary matching Plotly's own computation: linear
+    quartiles, whiskers at the furthest points within 1.5 IQR of the box.
+    """
+    grouped = df.groupby(by, observed=True)[value]
+    box = pd.DataFrame({
+        'q1': grouped.quantile(0.25),
+        'median': grouped.median(),
+        'q3': grouped.quantile(0.75),
+        'mean': grouped.mean(),
+    })
+    iqr = box['q3'] - box['q1']
+    low = df[by].map(box['q1'] - 1.5 * iqr).astype(float)
+    high = df[by].map(box['q3'] + 1.5 * iqr).astype(float)
+    values = df[value]
+    box['lowerfence'] = values.where(values >= low).groupby(df[by], observed=True).min()
+    box['upperfence'] = values.where(values <= high).groupby(df[by], observed=True).max()
+    return box
+
+
+def _box_figure(box: pd.DataFrame, title: str, x_label: str, y_label: str) -> go.Figure:
+    """Box chart drawn from precomputed quartiles, one trace per group, no raw points"""
+    fig = go.Figure()
+    for name, row in box.iterrows():
+        fig.add_trace(go.Box(
+            name=str(name),
+            x=[str(name)],
+            q1=[row['q1']],
+            median=[row['median']],
+            q3=[row['q3']],
+            mean=[row['mean']],
+            lowerfence=[row['lowerfence']],
+            upperfence=[row['upperfence']],
+        ))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, legend_title_text=x_label)
+    return fig
+
+
+def _plot_payload(fig: go.Figure) -> Tuple[str, str]:
+    """(plot_id, compact JSON) - built once per memoized report"""
+    payload = compact_figure_json(fig)
+    return plot_id_for(payload), payload
+
+
+@lru_cache(maxsize=2)
+def get_aggregates(data: Datasets) -> Dict[str, Any]:
+    """Full-dataset groupbys, computed once per dataset version"""
+    units_df, projects_df = data.units, data.projects
+    prices = units_df['price']
     
-    Available datasets:
-    - units_df: Individual real estate units
-    - projects_df: Real estate projects
+    location_stats = units_df.groupby('location', observed=True)['price'].agg(['mean', 'median', 'count', 'min', 'max'])
+    location_stats = location_stats.sort_values('mean', ascending=False)
+    location_box = _box_stats(units_df, 'location', 'price').loc[location_stats.index]
     
-    Available smart functions (call these for instant insights):
-    - analyze_prices_by_location(location=None)
-    - compare_unit_types()
-    - find_affordable_options(budget)
-    - analyze_price_trends()
-    - compare_developers(top_n=5)
-    - get_market_summary()
-    - filter_units(location, unit_type, min_price, max_price, bedrooms)
-    """
+    type_stats = units_df.groupby('unit_type', observed=True).agg({
+        'price': ['mean', 'median', 'count'],
+        'area_sqm': 'mean'
+    }).round(0)
+    type_stats.columns = ['avg_price', 'median_price', 'count', 'avg_area']
+    type_stats = type_stats.sort_values('avg_price', ascending=False)
+    type_stats['price_per_sqm'] = (type_stats['avg_price'] / type_stats['avg_area']).round(0)
     
-    command_to_return = None
-    plots_to_save = []
-
-    def save_plot_to_state(plot_json: dict) -> str:
-        """
-        Function exposed to LLM's Python environment.
-        Saves plot to state and returns confirmation message.
-        """
-        nonlocal plots_to_save
-        plot_id = str(uuid.uuid4())
-        print(f"💾 Saving plot with ID: {plot_id}")
-        plots_to_save.append({"id": plot_id, "data": plot_json})
-        return f"Plot saved with ID {plot_id}"
-
-    def analyze_prices_by_location(location=None):
-        """Smart price analysis by location with automatic insights."""
-        if location:
-            data = units_df[units_df['location'].str.contains(location, case=False, na=False)]
-            title = f"Price Analysis: {location}"
-        else:
-            data = units_df.copy()
-            title = "Price Analysis: All Locations"
-        
-        # Calculate statistics
-        stats = data.groupby('location')['price'].agg(['mean', 'median', 'count', 'min', 'max'])
-        stats = stats.sort_values('mean', ascending=False)
-        
-        # Create visualization
-        fig = px.box(
-            data,
-            x='location',
-            y='price',
-            title=title,
-            labels={'price': 'Price (EGP)', 'location': 'Location'},
-            color='location',
-            points=False
-        )
-        
-        # Save plot
-        save_plot_to_state(fig.to_dict())
-        
-        # Generate insights
-        insights = f"""
+    recent = units_df['delivery_year'] >= 2023
+    trends = units_df.loc[recent, ['delivery_year', 'price']].groupby('delivery_year', observed=True).agg({
+        'price': ['mean', 'count']
+    }).round(0)
+    trends.columns = ['avg_price', 'count']
+    
+    developer_stats = projects_df.groupby('developer', observed=True).agg({
+        'name': 'count',
+        'avg_price': 'mean',
+        'unit_count': 'sum'
+    }).sort_values('name', ascending=False)
+    developer_stats.columns = ['projects', 'avg_price', 'total_units']
+    
+    return {
+        "location_stats": location_stats,
+        "location_box": location_box,
+        "type_stats": type_stats,
+        "trends": trends,
+        "developer_stats": developer_stats,
+        "price_mean": prices.mean(),
+        "price_median": prices.median(),
+        "price_min": prices.min(),
+        "price_max": prices.max(),
+        "unit_count": len(units_df),
+        "project_count": len(projects_df),
+        "developer_count": projects_df['developer'].nunique(),
+        "type_counts": units_df['unit_type'].value_counts(),
+        "location_counts": units_df['location'].value_counts(),
+    }
+
+
+def _contains(series: pd.Series, text: str) -> pd.Series:
+    # Literal match, consistent with the dataset value indexes
+    return series.str.contains(text, case=False, na=False, regex=False)
+
+
+# ============================================================================
+# MEMOIZED REPORTS
+# ============================================================================
+# Each report returns (insights, plots) and is cached per dataset version and
+# arguments; the public smart functions below replay the plots into the
+# current call's sink.
+
+@lru_cache(maxsize=256)
+def _price_by_location_report(data: Datasets, location: Optional[str]) -> Tuple[str, List[Tuple[str, str]]]:
+    agg = get_aggregates(data)
+    
+    if location:
+        # Filtering rows by location substring selects whole location groups,
+        # so the per-location stats are a slice of the precomputed table
+        matches = _contains(agg["location_stats"].index.to_series(), location)
+        stats = agg["location_stats"][matches]
+        if stats.empty:
+            return f"❌ No units found in {location}", []
+        prices = data.units['price'].iloc[data.positions_containing('location', location)]
+        box = agg["location_box"][matches.to_numpy()]
+        title = f"Price Analysis: {location}"
+        mean, median, count = prices.mean(), prices.median(), len(prices)
+    else:
+        stats = agg["location_stats"]
+        box = agg["location_box"]
+        title = "Price Analysis: All Locations"
+        mean, median, count = agg["price_mean"], agg["price_median"], agg["unit_count"]
+    
+    # Create visualization from quartiles rather than every unit's price
+    fig = _box_figure(box, title, 'Location', 'Price (EGP)')
+    
+    # Generate insights
+    insights = f"""
 📊 PRICE ANALYSIS BY LOCATION
 
 📈 Statistics:
 • Most Expensive: {stats.index[0]} ({stats.iloc[0]['mean']/1_000_000:.2f}M avg)
 • Most Affordable: {stats.index[-1]} ({stats.iloc[-1]['mean']/1_000_000:.2f}M avg)
-• Overall Average: {data['price'].mean()/1_000_000:.2f}M EGP
-• Total Units Analyzed: {len(data)}
+• Overall Average: {mean/1_000_000:.2f}M EGP
+• Total Units Analyzed: {count}
 
 💡 Key Insights:
 • Price difference: {((stats.iloc[0]['mean'] - stats.iloc[-1]['mean'])/stats.iloc[-1]['mean']*100):.0f}% between highest and lowest
-• Median vs Mean gap: {abs((data['price'].median() - data['price'].mean())/data['price'].mean()*100):.1f}% (indicates price distribution)
+• Median vs Mean gap: {abs((median - mean)/mean*100):.1f}% (indicates price distribution)
 """
-        return insights
+    return insights, [_plot_payload(fig)]
+
+
+@lru_cache(maxsize=8)
+def _unit_types_report(data: Datasets) -> str:
+    stats = get_aggregates(data)["type_stats"]
     
-    def compare_unit_types():
-        """Compare different unit types (Apartment, Villa, Studio, etc.)"""
-        stats = units_df.groupby('unit_type').agg({
-            'price': ['mean', 'median', 'count'],
-            'area_sqm': 'mean'
-        }).round(0)
-        
-        stats.columns = ['avg_price', 'median_price', 'count', 'avg_area']
-        stats = stats.sort_values('avg_price', ascending=False)
-        stats['price_per_sqm'] = (stats['avg_price'] / stats['avg_area']).round(0)
-        
-        insights = f"""
+    insights = f"""
 🏠 UNIT TYPE COMPARISON
 
 💰 Pricing Analysis:
 """
-        for unit_type, row in stats.iterrows():
-            insights += f"• {unit_type}: {row['avg_price']/1_000_000:.2f}M avg | {int(row['count'])} units | {row['price_per_sqm']:.0f} EGP/sqm\n"
-        
-        best_value = stats['price_per_sqm'].idxmin()
-        most_popular = stats['count'].idxmax()
-        
-        insights += f"""
+    for unit_type, row in stats.iterrows():
+        insights += f"• {unit_type}: {row['avg_price']/1_000_000:.2f}M avg | {int(row['count'])} units | {row['price_per_sqm']:.0f} EGP/sqm\n"
+    
+    best_value = stats['price_per_sqm'].idxmin()
+    most_popular = stats['count'].idxmax()
+    
+    insights += f"""
 ✨ Smart Recommendations:
 • Best Value: {best_value} ({stats.loc[best_value, 'price_per_sqm']:.0f} EGP/sqm)
 • Most Available: {most_popular} ({int(stats.loc[most_popular, 'count'])} units)
 • Premium Segment: {', '.join(stats[stats['avg_price'] > stats['avg_price'].mean()].index)}
 """
-        return insights
-    
-    def find_affordable_options(budget):
-        """Find what's available within a budget with smart recommendations."""
-        affordable = units_df[units_df['price'] <= budget].copy()
-        
-        if len(affordable) == 0:
-            return f"❌ No units found within {budget/1_000_000:.1f}M EGP. Minimum available: {units_df['price'].min()/1_000_000:.1f}M"
-        
-        # Breakdown
-        by_type = affordable.groupby('unit_type').agg({
-            'unit_code': 'count',
-            'price': 'mean'
-        }).sort_values('unit_code', ascending=False)
-        
-        by_location = affordable.groupby('location').agg({
-            'unit_code': 'count',
-            'price': 'mean'
-        }).sort_values('unit_code', ascending=False)
-        
-        # Create chart
-        fig = px.pie(
-            by_type.reset_index(),
-            values='unit_code',
-            names='unit_type',
-            title=f'Available Units Within {budget/1_000_000:.1f}M Budget'
-        )
-        save_plot_to_state(fig.to_dict())
-        
-        insights = f"""
+    return insights
+
+
+@lru_cache(maxsize=256)
+def _affordable_report(data: Datasets, budget: float) -> Tuple[str, List[Tuple[str, str]]]:
+    agg = get_aggregates(data)
+    units_df = data.units
+    mask = units_df['price'] <= budget
+    
+    if not mask.any():
+        return f"❌ No units found within {budget/1_000_000:.1f}M EGP. Minimum available: {agg['price_min']/1_000_000:.1f}M", []
+    
+    affordable = units_df.loc[mask, ['unit_code', 'unit_type', 'location', 'price']]
+    
+    # Breakdown
+    by_type = affordable.groupby('unit_type', observed=True).agg({
+        'unit_code': 'count',
+        'price': 'mean'
+    }).sort_values('unit_code', ascending=False)
+    
+    by_location = affordable.groupby('location', observed=True).agg({
+        'unit_code': 'count',
+        'price': 'mean'
+    }).sort_values('unit_code', ascending=False)
+    
+    # Create chart
+    fig = px.pie(
+        by_type.reset_index(),
+        values='unit_code',
+        names='unit_type',
+        title=f'Available Units Within {budget/1_000_000:.1f}M Budget'
+    )
+    
+    average = affordable['price'].mean()
+    insights = f"""
 💰 AFFORDABILITY ANALYSIS ({budget/1_000_000:.1f}M EGP)
 
 📊 Overview:
 • Total Options: {len(affordable)} units
-• Average Price: {affordable['price'].mean()/1_000_000:.2f}M
-• Your Savings: {(budget - affordable['price'].mean())/1_000_000:.2f}M on average
+• Average Price: {average/1_000_000:.2f}M
+• Your Savings: {(budget - average)/1_000_000:.2f}M on average
 
 🏠 Best Unit Types:
 """
-        for i, (unit_type, row) in enumerate(by_type.head(3).iterrows(), 1):
-            insights += f"{i}. {unit_type}: {int(row['unit_code'])} units @ {row['price']/1_000_000:.2f}M avg\n"
-        
-        insights += f"\n📍 Best Locations:\n"
-        for i, (loc, row) in enumerate(by_location.head(3).iterrows(), 1):
-            insights += f"{i}. {loc}: {int(row['unit_code'])} units @ {row['price']/1_000_000:.2f}M avg\n"
-        
-        insights += f"\n💡 Recommendation: Focus on {by_type.index[0]} in {by_location.index[0]} for maximum choice"
-        
-        return insights
+    for i, (unit_type, row) in enumerate(by_type.head(3).iterrows(), 1):
+        insights += f"{i}. {unit_type}: {int(row['unit_code'])} units @ {row['price']/1_000_000:.2f}M avg\n"
     
-    def analyze_price_trends():
-        """Analyze price trends by delivery year."""
-        data = units_df[units_df['delivery_year'].notna()].copy()
-        data = data[data['delivery_year'] >= 2023]
-        
-        trends = data.groupby('delivery_year').agg({
-            'price': ['mean', 'count']
-        }).round(0)
-        
-        trends.columns = ['avg_price', 'count']
-        
-        insights = f"""
+    insights += f"\n📍 Best Locations:\n"
+    for i, (loc, row) in enumerate(by_location.head(3).iterrows(), 1):
+        insights += f"{i}. {loc}: {int(row['unit_code'])} units @ {row['price']/1_000_000:.2f}M avg\n"
+    
+    insights += f"\n💡 Recommendation: Focus on {by_type.index[0]} in {by_location.index[0]} for maximum choice"
+    
+    return insights, [_plot_payload(fig)]
+
+
+@lru_cache(maxsize=8)
+def _price_trends_report(data: Datasets) -> str:
+    trends = get_aggregates(data)["trends"]
+    
+    insights = f"""
 📈 PRICE TRENDS BY DELIVERY YEAR
 
 📊 Year-by-Year:
 """
-        for year, row in trends.iterrows():
-            insights += f"• {int(year)}: {row['avg_price']/1_000_000:.2f}M avg ({int(row['count'])} units)\n"
-        
-        if len(trends) > 1:
-            change = ((trends.iloc[-1]['avg_price'] - trends.iloc[0]['avg_price']) / trends.iloc[0]['avg_price'] * 100)
-            insights += f"\n💡 Trend: {'📈 Growing' if change > 0 else '📉 Declining'} market ({abs(change):.1f}% change)"
-        
-        return insights
+    for year, row in trends.iterrows():
+        insights += f"• {int(year)}: {row['avg_price']/1_000_000:.2f}M avg ({int(row['count'])} units)\n"
     
-    def compare_developers(top_n=5):
-        """Compare top developers in the market."""
-        dev_stats = projects_df.groupby('developer').agg({
-            'name': 'count',
-            'avg_price': 'mean',
-            'unit_count': 'sum'
-        }).sort_values('name', ascending=False).head(top_n)
-        
-        dev_stats.columns = ['projects', 'avg_price', 'total_units']
-        
-        insights = f"""
+    if len(trends) > 1:
+        change = ((trends.iloc[-1]['avg_price'] - trends.iloc[0]['avg_price']) / trends.iloc[0]['avg_price'] * 100)
+        insights += f"\n💡 Trend: {'📈 Growing' if change > 0 else '📉 Declining'} market ({abs(change):.1f}% change)"
+    
+    return insights
+
+
+@lru_cache(maxsize=64)
+def _developers_report(data: Datasets, top_n: int) -> str:
+    dev_stats = get_aggregates(data)["developer_stats"].head(top_n)
+    
+    insights = f"""
 🏢 TOP {top_n} DEVELOPERS
 
 📊 Rankings:
 """
-        for i, (dev, row) in enumerate(dev_stats.iterrows(), 1):
-            insights += f"{i}. {dev}\n"
-            insights += f"   • Projects: {int(row['projects'])} | Units: {int(row['total_units'])} | Avg: {row['avg_price']/1_000_000:.2f}M\n"
-        
-        premium = dev_stats[dev_stats['avg_price'] > dev_stats['avg_price'].mean()]
-        insights += f"\n💎 Premium Developers: {', '.join(premium.index)}"
-        
-        return insights
+    for i, (dev, row) in enumerate(dev_stats.iterrows(), 1):
+        insights += f"{i}. {dev}\n"
+        insights += f"   • Projects: {int(row['projects'])} | Units: {int(row['total_units'])} | Avg: {row['avg_price']/1_000_000:.2f}M\n"
+    
+    premium = dev_stats[dev_stats['avg_price'] > dev_stats['avg_price'].mean()]
+    insights += f"\n💎 Premium Developers: {', '.join(premium.index)}"
+    
+    return insights
+
+
+@lru_cache(maxsize=8)
+def _market_summary_report(data: Datasets) -> str:
+    agg = get_aggregates(data)
     
-    def get_market_summary():
-        """Get comprehensive market overview."""
-        insights = f"""
+    insights = f"""
 🏘️ REAL ESTATE MARKET SUMMARY
 
 📊 Market Size:
-• Total Units: {len(units_df):,}
-• Total Projects: {len(projects_df)}
-• Active Developers: {projects_df['developer'].nunique()}
+• Total Units: {agg['unit_count']:,}
+• Total Projects: {agg['project_count']}
+• Active Developers: {agg['developer_count']}
 
 💰 Pricing:
-• Average Unit Price: {units_df['price'].mean()/1_000_000:.2f}M EGP
-• Median Price: {units_df['price'].median()/1_000_000:.2f}M EGP
-• Price Range: {units_df['price'].min()/1_000_000:.1f}M - {units_df['price'].max()/1_000_000:.1f}M
+• Average Unit Price: {agg['price_mean']/1_000_000:.2f}M EGP
+• Median Price: {agg['price_median']/1_000_000:.2f}M EGP
+• Price Range: {agg['price_min']/1_000_000:.1f}M - {agg['price_max']/1_000_000:.1f}M
 
 🏠 Unit Types:
 """
-        type_dist = units_df['unit_type'].value_counts()
-        for unit_type, count in type_dist.head(5).items():
-            insights += f"• {unit_type}: {count:,} units ({count/len(units_df)*100:.1f}%)\n"
-        
-        insights += f"""
+    for unit_type, count in agg["type_counts"].head(5).items():
+        insights += f"• {unit_type}: {count:,} units ({count/agg['unit_count']*100:.1f}%)\n"
+    
+    insights += f"""
 📍 Top Locations:
 """
-        loc_dist = units_df['location'].value_counts()
-        for location, count in loc_dist.head(5).items():
-            insights += f"• {location}: {count:,} units\n"
-        
-        return insights
+    for location, count in agg["location_counts"].head(5).items():
+        insights += f"• {location}: {count:,} units\n"
     
-    def filter_units(location=None, unit_type=None, min_price=None, max_price=None, bedrooms=None):
-        """Smart filtering with automatic insights."""
-        filtered = units_df.copy()
-        filters_applied = []
-        
-        if location:
-            filtered = filtered[filtered['location'].str.contains(location, case=False, na=False)]
-            filters_applied.append(f"Location: {location}")
-        
-        if unit_type:
-            filtered = filtered[filtered['unit_type'].str.contains(unit_type, case=False, na=False)]
-            filters_applied.append(f"Type: {unit_type}")
-        
-        if min_price:
-            filtered = filtered[filtered['price'] >= min_price]
-            filters_applied.append(f"Min Price: {min_price/1_000_000:.1f}M")
-        
-        if max_price:
-            filtered = filtered[filtered['price'] <= max_price]
-            filters_applied.append(f"Max Price: {max_price/1_000_000:.1f}M")
-        
-        if bedrooms:
-            filtered = filtered[filtered['bedrooms'] == bedrooms]
-            filters_applied.append(f"Bedrooms: {bedrooms}")
-        
-        if len(filtered) == 0:
-            return f"❌ No units found matching: {', '.join(filters_applied)}"
-        
-        insights = f"""
+    return insights
+
+
+@lru_cache(maxsize=256)
+def _filter_report(data: Datasets, location, unit_type, min_price, max_price, bedrooms) -> str:
+    units_df = data.units
+    mask = pd.Series(True, index=units_df.index)
+    filters_applied = []
+    
+    if location:
+        mask &= data.mask_containing('location', location)
+        filters_applied.append(f"Location: {location}")
+    
+    if unit_type:
+        mask &= data.mask_containing('unit_type', unit_type)
+        filters_applied.append(f"Type: {unit_type}")
+    
+    if min_price:
+        mask &= units_df['price'] >= min_price
+        filters_applied.append(f"Min Price: {min_price/1_000_000:.1f}M")
+    
+    if max_price:
+        mask &= units_df['price'] <= max_price
+        filters_applied.append(f"Max Price: {max_price/1_000_000:.1f}M")
+    
+    if bedrooms:
+        mask &= units_df['bedrooms'] == bedrooms
+        filters_applied.append(f"Bedrooms: {bedrooms}")
+    
+    if not mask.any():
+        return f"❌ No units found matching: {', '.join(filters_applied)}"
+    
+    filtered = units_df.loc[mask, ['project_name', 'location', 'price', 'area_sqm', 'bedrooms']]
+    prices = filtered['price']
+    
+    insights = f"""
 🔍 FILTERED RESULTS
 
 📋 Filters Applied: {', '.join(filters_applied)}
 
 📊 Results:
 • Found: {len(filtered)} units
-• Price Range: {filtered['price'].min()/1_000_000:.1f}M - {filtered['price'].max()/1_000_000:.1f}M
-• Average: {filtered['price'].mean()/1_000_000:.2f}M
-• Median: {filtered['price'].median()/1_000_000:.2f}M
+• Price Range: {prices.min()/1_000_000:.1f}M - {prices.max()/1_000_000:.1f}M
+• Average: {prices.mean()/1_000_000:.2f}M
+• Median: {prices.median()/1_000_000:.2f}M
 
 🏠 Top Options:
 """
-        top_options = filtered.nsmallest(5, 'price')[['project_name', 'location', 'price', 'area_sqm', 'bedrooms']]
-        for idx, row in top_options.iterrows():
-            insights += f"• {row['project_name']}: {row['price']/1_000_000:.2f}M | {row['area_sqm']:.0f} sqm | {row['bedrooms']} BR\n"
-        
-        return insights
+    top_options = filtered.nsmallest(5, 'price')
+    for idx, row in top_options.iterrows():
+        insights += f"• {row['project_name']}: {row['price']/1_000_000:.2f}M | {row['area_sqm']:.0f} sqm | {row['bedrooms']} BR\n"
+    
+    return insights
+
+
+# ============================================================================
+# SMART FUNCTIONS (exposed to LLM code)
+# ============================================================================
 
-    # Capture stdout
-    old_stdout = sys.stdout
-    captured_output = io.StringIO()
-    sys.stdout = captured_output
+def analyze_prices_by_location(location=None):
+    """Smart price analysis by location with automatic insights."""
+    insights, plots = _price_by_location_report(dataset_manager.current(), location)
+    _emit_plots(plots)
+    return insights
 
+
+def compare_unit_types():
+    """Compare different unit types (Apartment, Villa, Studio, etc.)"""
+    return _unit_types_report(dataset_manager.current())
+
+
+def find_affordable_options(budget):
+    """Find what's available within a budget with smart recommendations."""
+    insights, plots = _affordable_report(dataset_manager.current(), budget)
+    _emit_plots(plots)
+    return insights
+
+
+def analyze_price_trends():
+    """Analyze price trends by delivery year."""
+    return _price_trends_report(dataset_manager.current())
+
+
+def compare_developers(top_n=5):
+    """Compare top developers in the market."""
+    return _developers_report(dataset_manager.current(), top_n)
+
+
+def get_market_summary():
+    """Get comprehensive market overview."""
+    return _market_summary_report(dataset_manager.current())
+
+
+def filter_units(location=None, unit_type=None, min_price=None, max_price=None, bedrooms=None):
+    """Smart filtering with automatic insights."""
+    return _filter_report(dataset_manager.current(), location, unit_type, min_price, max_price, bedrooms)
+
+
+def build_sandbox_namespace(save_plot_to_state) -> Dict[str, Any]:
+    """
+    Globals for one execute_python_query call. Runs inside a sandbox worker,
+    where units_df/projects_df are the datasets the worker loaded at startup.
+    """
+    _plot_sink.set(save_plot_to_state)
+    data = dataset_manager.current()
+    return {
+        "pd": pd,
+        "px": px,
+        "go": go,
+        "units_df": data.units,
+        "projects_df": data.projects,
+        "save_plot_in_state": _compacting_saver(save_plot_to_state),
+        "analyze_prices_by_location": analyze_prices_by_location,
+        "compare_unit_types": compare_unit_types,
+        "find_affordable_options": find_affordable_options,
+        "analyze_price_trends": analyze_price_trends,
+        "compare_developers": compare_developers,
+        "get_market_summary": get_market_summary,
+        "filter_units": filter_units
+    }
+
+
+# Warm the aggregates; sandbox workers run this too when they import the module
+get_aggregates(dataset_manager.current())
+
+# Started lazily on first use, or eagerly from the API lifespan
+sandbox_pool = SandboxPool(build_sandbox_namespace)
+
+_MEMOIZED_REPORTS = [
+    _price_by_location_report, _unit_types_report, _affordable_report,
+    _price_trends_report, _developers_report, _market_summary_report,
+    _filter_report,
+]
+
+
+def _on_dataset_swap(old: Datasets, new: Datasets) -> None:
+    """Drop everything keyed by the old snapshot and restart workers on the new one"""
+    get_aggregates.cache_clear()
+    for report in _MEMOIZED_REPORTS:
+        report.cache_clear()
+    get_aggregates(new)
+    # Runs on the watcher thread: safe, since replacements are spawned
+    # (nothing is forked from this thread) and load the new snapshot themselves
+    sandbox_pool.recycle()
+
+
+dataset_manager.on_swap(_on_dataset_swap)
+
+
+def prepare_code(code: str) -> str:
+    """Strip display/file side effects and auto-print bare smart function calls"""
+    code_cleaned = code.replace('.show()', '')
+    code_cleaned = code_cleaned.replace('.write_image(', '# .write_image(')
+    code_cleaned = code_cleaned.replace('.write_html(', '# .write_html(')
+    
+    for func in SMART_FUNCTIONS:
+        if f"{func}(" in code_cleaned and f"print({func}" not in code_cleaned:
+            # Wrap the function call with print
+            code_cleaned = f"result = {code_cleaned}\nprint(result)"
+            break
+    
+    return code_cleaned
+
+
+@tool
+def execute_python_query(
+    code: str,
+    tool_call_id: Annotated[str, InjectedToolCallId]
+) -> Union[str, Command]:
+    """
+    Execute Python code with access to smart analysis functions.
+    
+    Available datasets:
+    - units_df: Individual real estate units
+    - projects_df: Real estate projects
+    
+    Available smart functions (call these for instant insights):
+    - analyze_prices_by_location(location=None)
+    - compare_unit_types()
+    - find_affordable_options(budget)
+    - analyze_price_trends()
+    - compare_developers(top_n=5)
+    - get_market_summary()
+    - filter_units(location, unit_type, min_price, max_price, bedrooms)
+    """
+    
     try:
-        namespace = {
-            "pd": pd,
-            "units_df": units_df,
-            "projects_df": projects_df,
-            "__builtins__": __builtins__,
-            "save_plot_in_state": save_plot_to_state,
-            "analyze_prices_by_location": analyze_prices_by_location,
-            "compare_unit_types": compare_unit_types,  
-            "find_affordable_options": find_affordable_options,
-            "analyze_price_trends": analyze_price_trends,
-            "compare_developers": compare_developers,
-            "get_market_summary": get_market_summary,
-            "filter_units": filter_units
-        }
-
-        smart_functions = [
-            'analyze_prices_by_location', 'compare_unit_types', 
-            'find_affordable_options', 'analyze_price_trends',
-            'compare_developers', 'get_market_summary', 'filter_units'
-        ]
-        
-        
-
-        code_cleaned = code.replace('.show()', '')
-        code_cleaned = code_cleaned.replace('.write_image(', '# .write_image(')
-        code_cleaned = code_cleaned.replace('.write_html(', '# .write_html(')
-        
-        for func in smart_functions:
-            if f"{func}(" in code_cleaned and f"print({func}" not in code_cleaned:
-                # Wrap the function call with print
-                code_cleaned = f"result = {code_cleaned}\nprint(result)"
-                break
-
-        exec(code_cleaned, namespace)
-
-        # Restore stdout
-        sys.stdout = old_stdout
-        output = captured_output.getvalue()
-
-        # If no print output, try to get a 'result' variable
-        if not output.strip():
-            if "result" in namespace:
-                output = str(namespace["result"])
-            else:
-                output = "Code executed successfully but produced no output. Use print() to display results."
-
-        # ✅ KEY FIX: Return Command with BOTH plots AND text output
-        if plots_to_save:
-            print(f"✅ Returning Command with {len(plots_to_save)} plots and text output")
-            return Command(
-                update={
-                    "saved_plots": plots_to_save,
-                    "messages": [
-                        ToolMessage(content=output, tool_call_id=tool_call_id)
-                    ]
-                }
-            )
-        
-        # If no plots, just return the text output
-        return output
-
-    except Exception as e:
-        sys.stdout = old_stdout
-        return f"Error executing code: {str(e)}"
\ No newline at end of file
+        result = sandbox_pool.run(prepare_code(code))
+    except SandboxError as e:
+        return f"❌ Code execution failed: {e}"
+    
+    logger.info("Sandbox: queued %.0fms, executed %.0fms",
+                result["queue_wait"] * 1000, result["exec_time"] * 1000)
+    log_payload(logger, "Sandbox code", code)
+    
+    output = result["output"]
+    if result["error"]:
+        return f"{output}\n❌ Error executing code: {result['error']}".strip()
+    
+    if not output.strip():
+        output = "Code executed successfully but produced no output. Use print() to display results."
+    
+    # Chart payloads go to the plot store; state only carries their ids
+    plots_to_save = [{"id": plot_store.put(plot["data"], plot["id"])} for plot in result["plots"]]
+    
+    # ✅ KEY FIX: Return Command with BOTH plots AND text output
+    if plots_to_save:
+        logger.debug("Returning Command with %d plots and text output", len(plots_to_save))
+        return Command(
+            update={
+                "saved_plots": plots_to_save,
+                "messages": [
+                    ToolMessage(content=output, tool_call_id=tool_call_id)
+                ]
+            }
+        )
+    
+    # If no plots, just return the text output
+    return output
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_smart_functions(repeats: int = 20):
+    """
+    Per-call latency and peak traced memory of the smart functions, first
+    call for an argument (report cache cleared, aggregates already built)
+    versus memoized.
+    """
+    import time
+    import tracemalloc
+    
+    calls = [
+        ("analyze_prices_by_location", ()),
+        ("analyze_prices_by_location", ("Cairo",)),
+        ("compare_unit_types", ()),
+        ("find_affordable_options", (5_000_000,)),
+        ("analyze_price_trends", ()),
+        ("compare_developers", (5,)),
+        ("get_market_summary", ()),
+        ("filter_units", ("Cairo", "Apartment", None, 10_000_000, 3)),
+    ]
+    namespace = build_sandbox_namespace(lambda plot: "")
+    get_aggregates(dataset_manager.current())
+    
+    print(f"\n⏱️ Smart function benchmark ({len(namespace['units_df']):,} units)")
+    print("=" * 72)
+    print(f"{'function':<40}{'first ms':>10}{'warm ms':>10}{'peak MB':>12}")
+    
+    for name, args in calls:
+        for cached in _MEMOIZED_REPORTS:
+            cached.cache_clear()
+        
+        tracemalloc.start()
+        start = time.perf_counter()
+        namespace[name](*args)
+        cold = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            namespace[name](*args)
+        warm = (time.perf_counter() - start) / repeats
+        
+        label = f"{name}{args}" if args else name
+        print(f"{label[:39]:<40}{cold * 1000:>10.2f}{warm * 1000:>10.3f}{peak / 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_smart_functions()
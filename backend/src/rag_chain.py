@@ -1,16 +1,13 @@
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
-from src.config import api_key
+from src.llm_clients import llm_clients
 from langsmith import trace
 
 
 def build_rag(vectordb):
   with trace("build_rag"):
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",  # or "llama-3.1-70b-versatile" if you want more reasoning
-        api_key=api_key
-    )
+    llm = llm_clients.chat_groq("llama-3.1-8b-instant")  # or "llama-3.1-70b-versatile" if you want more reasoning
     qa = RetrievalQA.from_chain_type(
         llm=llm,
         retriever=vectordb.as_retriever(),
@@ -20,10 +17,7 @@ def build_rag(vectordb):
 
 def build_rag2(vectordb):
   with trace("build_rag"):
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",  # or "llama-3.1-70b-versatile" if you want more reasoning
-        api_key=api_key
-    )
+    llm = llm_clients.chat_groq("llama-3.1-8b-instant")  # or "llama-3.1-70b-versatile" if you want more reasoning
     qa2 = RetrievalQA.from_chain_type(
         llm=llm,
         retriever=vectordb.as_retriever(),
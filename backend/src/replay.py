@@ -0,0 +1,392 @@
+"""
+Record and replay agent conversations
+- ConversationRecorder is a callback handler: passed in the graph config of a
+  real run it captures every LLM response and tool output, in order
+- A fixture file holds the questions, the user profile and those events;
+  replaying serves them back through ReplayChatModel / ReplayTool, so the
+  graph runs with no network and no tool work
+- What remains is pure orchestration (planner/agent/tools nodes, state
+  merging, checkpointing, clean_messages_for_groq, verbose_wrapper), timed
+  per turn; final answers are compared with the recording to flag divergence
+- --baseline / --max-regression compare with an earlier report, for CI
+
+Usage:
+    python -m src.replay record data/replays/scenarios.json      # real LLM and tools
+    python -m src.replay record data/replays/offline.json --offline  # scripted LLM, stub upstreams
+    python -m src.replay benchmark data/replays/scenarios.json --rounds 20
+    python -m src.replay benchmark data/replays/scenarios.json --json now.json --baseline main.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumpd, load
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.types import Command
+from pydantic import PrivateAttr
+
+FIXTURE_VERSION = 1
+
+
+class ReplayDivergence(RuntimeError):
+    """The graph asked for an LLM response or tool output the recording doesn't have"""
+
+
+def _dump(value: Any) -> Dict[str, Any]:
+    if isinstance(value, Command):
+        return {"command": dumpd(value.update)}
+    return {"value": dumpd(value)}
+
+
+def _restore(entry: Dict[str, Any]) -> Any:
+    if "command" in entry:
+        return Command(update=load(entry["command"]))
+    return load(entry["value"])
+
+
+# ============================================================================
+# RECORDING
+# ============================================================================
+
+class ConversationRecorder(BaseCallbackHandler):
+    """Collects LLM responses and top-level tool outputs of the current turn, in call order"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self._tools: Dict[Any, str] = {}
+
+    def take(self) -> List[Dict[str, Any]]:
+        events, self.events = self.events, []
+        return events
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        generation = (response.generations or [[]])[0]
+        message = getattr(generation[0], "message", None) if generation else None
+        if message is not None:
+            self.events.append({"kind": "llm", **_dump(message)})
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._tools[run_id] = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        name = self._tools.pop(run_id, None)
+        if name is not None:
+            self.events.append({"kind": "tool", "name": name, **_dump(output)})
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        # tool_node turns the exception into an error string; replay raises it again
+        name = self._tools.pop(run_id, None)
+        if name is not None:
+            self.events.append({"kind": "tool", "name": name, "error": str(error)})
+
+
+def _final_answer(messages: List[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and not message.tool_calls:
+            return str(message.content)
+    return ""
+
+
+async def record(graph, conversations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run each conversation ({"user": {...}, "questions": [...]}) through a
+    graph from build_agent and return the fixture.
+    """
+    recorder = ConversationRecorder()
+    recorded = []
+    for conversation in conversations:
+        thread_id = str(uuid.uuid4())
+        turns = []
+        for question in conversation["questions"]:
+            config = {"configurable": {"thread_id": thread_id}, "callbacks": [recorder]}
+            state = await graph.ainvoke({"messages": [HumanMessage(content=question)],
+                                         "user": conversation["user"]}, config=config)
+            turns.append({"question": question, "events": recorder.take(),
+                          "final_answer": _final_answer(state["messages"])})
+        recorded.append({"user": conversation["user"], "turns": turns})
+    return {"version": FIXTURE_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "conversations": recorded}
+
+
+def save_fixture(fixture: Dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=1)
+
+
+def load_fixture(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        fixture = json.load(f)
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"{path}: fixture version {fixture.get('version')}, expected {FIXTURE_VERSION}")
+    return fixture
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+class ReplayChatModel(BaseChatModel):
+    """Serves the recorded responses of the current turn in order (planner and agent share the queue)"""
+
+    model_name: str = "replay"
+    _responses: Deque[AIMessage] = PrivateAttr(default_factory=deque)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs) -> "ReplayChatModel":
+        return self
+
+    def load_turn(self, responses: List[AIMessage]) -> None:
+        self._responses = deque(responses)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if not self._responses:
+            raise ReplayDivergence("LLM called more often than in the recording")
+        return ChatResult(generations=[ChatGeneration(message=self._responses.popleft())])
+
+
+class ReplayTool:
+    """Stands in for a tool object in agent.py: .invoke(tool_call) returns the next recorded output"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outputs: Deque[Dict[str, Any]] = deque()
+
+    def invoke(self, tool_call: Any, config: Any = None, **kwargs) -> Any:
+        if not self.outputs:
+            raise ReplayDivergence(f"tool {self.name} called more often than in the recording")
+        entry = self.outputs.popleft()
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return _restore(entry)
+
+
+def install_replay(agent_module) -> tuple:
+    """Point agent.py's LLM and tool globals at replay stand-ins; returns (model, tools by name)"""
+    from langchain_core.tools import BaseTool
+
+    model = agent_module.llm if isinstance(agent_module.llm, ReplayChatModel) else ReplayChatModel()
+    agent_module.llm = model
+    agent_module.llm_with_tools = model
+
+    tools = {}
+    for attr, value in list(vars(agent_module).items()):
+        if isinstance(value, BaseTool):
+            value = ReplayTool(value.name)
+            setattr(agent_module, attr, value)
+        if isinstance(value, ReplayTool):
+            tools[value.name] = value
+    return model, tools
+
+
+def _load_turn(model: ReplayChatModel, tools: Dict[str, ReplayTool], turn: Dict[str, Any]) -> None:
+    for tool in tools.values():
+        tool.outputs.clear()
+    responses = []
+    for event in turn["events"]:
+        if event["kind"] == "llm":
+            responses.append(_restore(event))
+        elif event["name"] in tools:
+            tools[event["name"]].outputs.append(event)
+        else:
+            raise ReplayDivergence(f"recording uses tool {event['name']}, not known to agent.py")
+    model.load_turn(responses)
+
+
+async def replay(graph, model: ReplayChatModel, tools: Dict[str, ReplayTool],
+                 fixture: Dict[str, Any]) -> Dict[str, Any]:
+    """One pass over the fixture; returns turn timings and answers that differ from the recording"""
+    timings, diverged = [], []
+    for index, conversation in enumerate(fixture["conversations"]):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        for turn in conversation["turns"]:
+            start = time.perf_counter()
+            try:
+                _load_turn(model, tools, turn)
+                state = await graph.ainvoke({"messages": [HumanMessage(content=turn["question"])],
+                                             "user": conversation["user"]}, config=config)
+            except ReplayDivergence as e:
+                diverged.append({"conversation": index, "question": turn["question"], "reason": str(e)})
+                continue
+            timings.append(time.perf_counter() - start)
+            if _final_answer(state["messages"]) != turn["final_answer"]:
+                diverged.append({"conversation": index, "question": turn["question"],
+                                 "reason": "final answer differs from the recording"})
+    return {"timings": timings, "diverged": diverged}
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)] if ordered else float("nan")
+
+
+async def benchmark_replay(fixture_path: str, rounds: int = 20, warmup: int = 2) -> Dict[str, Any]:
+    """Replay the fixture `rounds` times with verbose logging on and off; per-turn latency in ms"""
+    from src import agent
+
+    fixture = load_fixture(fixture_path)
+    model, tools = install_replay(agent)
+    turns = sum(len(c["turns"]) for c in fixture["conversations"])
+    events = sum(len(t["events"]) for c in fixture["conversations"] for t in c["turns"])
+
+    report: Dict[str, Any] = {"fixture": fixture_path, "turns": turns, "events": events,
+                              "rounds": rounds, "modes": {}}
+    for verbose in (False, True):
+        graph = await agent.build_agent(model, verbose=verbose)
+        for _ in range(warmup):
+            await replay(graph, model, tools, fixture)
+        timings: List[float] = []
+        diverged: Dict[str, Dict[str, Any]] = {}
+        start = time.perf_counter()
+        for _ in range(rounds):
+            result = await replay(graph, model, tools, fixture)
+            timings += result["timings"]
+            for item in result["diverged"]:
+                diverged.setdefault(f"{item['conversation']}:{item['question']}", item)
+        elapsed = time.perf_counter() - start
+        report["modes"]["verbose" if verbose else "quiet"] = {
+            "turns_per_s": len(timings) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(timings) / len(timings) * 1000 if timings else float("nan"),
+            "p50_ms": _percentile(timings, 0.50) * 1000,
+            "p95_ms": _percentile(timings, 0.95) * 1000,
+            "p99_ms": _percentile(timings, 0.99) * 1000,
+            "diverged": list(diverged.values()),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n⏱️ Replay benchmark: {report['fixture']} "
+          f"({report['turns']} turns, {report['events']} recorded events, {report['rounds']} rounds)")
+    print("=" * 72)
+    print(f"{'mode':<10}{'turns/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'diverged':>12}")
+    for mode, s in report["modes"].items():
+        print(f"{mode:<10}{s['turns_per_s']:>10.1f}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}"
+              f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{len(s['diverged']):>12}")
+        for item in s["diverged"]:
+            print(f"   ⚠️ conversation {item['conversation']}: {item['question'][:50]!r} - {item['reason']}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Failures: p50 slower than baseline by more than max_regression, or any divergence"""
+    failures = []
+    for mode, s in report["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if base and s["p50_ms"] > base["p50_ms"] * (1 + max_regression):
+            failures.append(f"{mode}: p50 {s['p50_ms']:.2f}ms vs baseline {base['p50_ms']:.2f}ms "
+                            f"(+{s['p50_ms'] / base['p50_ms'] - 1:.0%})")
+        if s["diverged"]:
+            failures.append(f"{mode}: {len(s['diverged'])} turns diverged from the recording")
+    return failures
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _default_conversations() -> List[Dict[str, Any]]:
+    from src.loadtest import SCENARIOS
+
+    user = {"email": "replay@example.com", "name": "Replay User",
+            "preferredLocations": ["New Cairo"], "averageBudget": 5_000_000}
+    questions = [scenario["question"] for scenario in SCENARIOS]
+    # One conversation per question, plus one multi-turn conversation over all of them
+    return [{"user": user, "questions": [q]} for q in questions] + [{"user": user, "questions": questions}]
+
+
+async def _record_cli(path: str, questions_path: Optional[str], offline: bool) -> None:
+    stubs = None
+    if offline:
+        # Real tool code against the load test's stub upstreams; must precede the tool imports
+        from src.loadtest import StubUpstreams
+
+        stubs = StubUpstreams(latency=0.0).start()
+        os.environ.update(stubs.env())
+        os.environ.setdefault("OPENAI_API_KEY", "sk-offline-replay")
+    from src import agent
+
+    if offline:
+        from src.loadtest import install_scripted_model
+        install_scripted_model(agent, first_token_latency=0.0, token_latency=0.0)
+
+    if questions_path:
+        with open(questions_path, encoding="utf-8") as f:
+            conversations = json.load(f)
+    else:
+        conversations = _default_conversations()
+    graph = await agent.build_agent(agent.llm, verbose=False)
+    try:
+        fixture = await record(graph, conversations)
+    finally:
+        if stubs is not None:
+            stubs.stop()
+    save_fixture(fixture, path)
+    counts = defaultdict(int)
+    for conversation in fixture["conversations"]:
+        for turn in conversation["turns"]:
+            for event in turn["events"]:
+                counts[event.get("name", "llm")] += 1
+    print(f"📼 Recorded {sum(len(c['turns']) for c in fixture['conversations'])} turns to {path}: "
+          + ", ".join(f"{name} {n}" for name, n in sorted(counts.items())))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record and replay agent conversations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = sub.add_parser("record", help="run real conversations and save a fixture")
+    record_parser.add_argument("fixture")
+    record_parser.add_argument("--questions", help='JSON list of {"user": {...}, "questions": [...]}')
+    record_parser.add_argument("--offline", action="store_true",
+                               help="scripted LLM and stub upstreams instead of the real services")
+
+    bench_parser = sub.add_parser("benchmark", help="replay a fixture and time the orchestration")
+    bench_parser.add_argument("fixture")
+    bench_parser.add_argument("--rounds", type=int, default=20)
+    bench_parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    bench_parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    bench_parser.add_argument("--max-regression", type=float, default=0.2,
+                              help="allowed p50 slowdown versus the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        asyncio.run(_record_cli(args.fixture, args.questions, args.offline))
+        return 0
+
+    report = asyncio.run(benchmark_replay(args.fixture, rounds=args.rounds))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+    elif any(s["diverged"] for s in report["modes"].values()):
+        failures = ["replay diverged from the recording"]
+    for reason in failures:
+        print(f"❌ {reason}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
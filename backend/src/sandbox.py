@@ -0,0 +1,357 @@
+"""
+Sandboxed execution of LLM-written Python
+- A pool of pre-started worker processes, each holding its own copy of the
+  analysis namespace. Workers are spawned, never forked: the API process
+  runs threads (log writer, dataset watcher, executors), which fork would
+  copy mid-lock. Each worker imports the analysis module and loads the
+  datasets itself, from the memory-mapped Arrow snapshot when one is built
+  (pages shared between workers) or from the CSVs
+- Per-call CPU limit (RLIMIT_CPU), wall-clock timeout and address-space limit
+- stdout is captured inside the worker, never by swapping the server's sys.stdout
+- Restricted builtins and an import whitelist keep well-meaning generated
+  code on the analysis path; they are NOT a security boundary (object
+  introspection escapes the builtins, and pandas alone can read and write
+  any file the server user can). Workers run as the server's user, so only
+  the resource limits above are enforced: run the API under a dedicated
+  low-privilege user or container if untrusted users can reach the tool
+"""
+
+import builtins
+import contextlib
+import io
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from src.logging_config import get_logger
+
+try:
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_CPU_TIMEOUT = float(os.getenv("SANDBOX_CPU_TIMEOUT", "10"))
+SANDBOX_WALL_TIMEOUT = float(os.getenv("SANDBOX_WALL_TIMEOUT", "20"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "1024"))
+SANDBOX_QUEUE_TIMEOUT = float(os.getenv("SANDBOX_QUEUE_TIMEOUT", "30"))
+SANDBOX_MAX_TASKS_PER_WORKER = int(os.getenv("SANDBOX_MAX_TASKS_PER_WORKER", "200"))
+SANDBOX_START_TIMEOUT = float(os.getenv("SANDBOX_START_TIMEOUT", "120"))
+
+ALLOWED_MODULES = {
+    "math", "statistics", "datetime", "json", "re", "collections",
+    "itertools", "functools", "numpy", "pandas", "plotly",
+}
+
+SAFE_BUILTINS = [
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter",
+    "float", "format", "frozenset", "hasattr", "int", "isinstance",
+    "issubclass", "iter", "len", "list", "map", "max", "min", "next", "print",
+    "range", "repr", "reversed", "round", "set", "slice", "sorted", "str",
+    "sum", "tuple", "zip", "True", "False", "None",
+    "Exception", "ValueError", "TypeError", "KeyError", "IndexError",
+    "ZeroDivisionError", "AttributeError",
+]
+
+
+class SandboxError(Exception):
+    """Raised when code could not be run to completion in the sandbox"""
+
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split(".")[0] not in ALLOWED_MODULES:
+        raise ImportError(f"Import of '{name}' is not allowed in the sandbox")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _safe_builtins() -> Dict[str, Any]:
+    allowed = {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+    allowed["__import__"] = _restricted_import
+    return allowed
+
+
+def _current_vm_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _apply_memory_limit(memory_mb: int) -> None:
+    """Cap address space at what the worker already maps plus memory_mb"""
+    if resource is None or memory_mb <= 0:
+        return
+    baseline = _current_vm_bytes()
+    if baseline is None:
+        return
+    limit = baseline + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _apply_cpu_limit(cpu_timeout: float) -> None:
+    """Allow cpu_timeout more seconds of CPU; the kernel kills the worker past it"""
+    if resource is None or cpu_timeout <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_timeout)
+    # Only the soft limit moves (SIGXCPU kills the worker): an unprivileged
+    # process may lower its hard limit but never raise it again
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, namespace_factory: Callable, memory_mb: int) -> None:
+    # The analysis module (and its datasets) was imported while unpickling
+    # namespace_factory, so the memory limit counts from the loaded state
+    _apply_memory_limit(memory_mb)
+    safe_builtins = _safe_builtins()
+    conn.send("ready")
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        code, cpu_timeout = message
+        plots: List[Dict[str, Any]] = []
+        stdout = io.StringIO()
+        result: Dict[str, Any] = {"output": "", "plots": plots, "error": None}
+
+        def save_plot(plot_json: Any, plot_id: Optional[str] = None) -> str:
+            plot_id = plot_id or str(uuid.uuid4())
+            plots.append({"id": plot_id, "data": plot_json})
+            return f"Plot saved with ID {plot_id}"
+
+        start = time.perf_counter()
+        try:
+            _apply_cpu_limit(cpu_timeout)
+            namespace = namespace_factory(save_plot)
+            namespace["__builtins__"] = safe_builtins
+            with contextlib.redirect_stdout(stdout):
+                exec(code, namespace)
+            output = stdout.getvalue()
+            if not output.strip() and "result" in namespace:
+                output = str(namespace["result"])
+            result["output"] = output
+        except MemoryError:
+            result["error"] = "Memory limit exceeded"
+        except Exception as e:
+            result["output"] = stdout.getvalue()
+            result["error"] = f"{type(e).__name__}: {e}"
+            result["traceback"] = traceback.format_exc(limit=3)
+        result["exec_time"] = time.perf_counter() - start
+
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Unpicklable plot payloads and the like
+            conn.send({"output": result["output"], "plots": [], "error": f"Result not serializable: {e}",
+                       "exec_time": result["exec_time"]})
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class _Worker:
+    def __init__(self, ctx, namespace_factory: Callable, memory_mb: int, generation: int = 0):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, namespace_factory, memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.generation = generation
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Block until the worker has finished importing and loading its datasets"""
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = self.conn.recv() == "ready"
+        return self.ready
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of sandbox worker processes.
+
+    namespace_factory(save_plot) runs inside the worker and returns the
+    globals for each call; it must be a module-level function so it can be
+    sent to the spawned workers by reference.
+    """
+
+    def __init__(self, namespace_factory: Callable, workers: int = SANDBOX_WORKERS,
+                 memory_mb: int = SANDBOX_MEMORY_MB):
+        self.namespace_factory = namespace_factory
+        self.size = workers
+        self.memory_mb = memory_mb
+        self._ctx = mp.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._generation = 0
+        self._stats = {
+            "calls": 0, "errors": 0, "timeouts": 0, "crashes": 0,
+            "queue_wait_total": 0.0, "exec_time_total": 0.0,
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._spawn()
+            self._started = True
+            logger.info("Sandbox pool ready: %d workers (%s)", self.size, self._ctx.get_start_method())
+
+    def _spawn(self) -> None:
+        worker = _Worker(self._ctx, self.namespace_factory, self.memory_mb, self._generation)
+        self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker, graceful: bool = False) -> None:
+        if graceful:
+            worker.stop()
+        else:
+            worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._started:
+                self._spawn()
+
+    def recycle(self) -> None:
+        """
+        Replace every worker with a fresh one, which loads the current
+        datasets (e.g. after a dataset reload). Idle workers go now; busy ones
+        finish their call on the state they started with and are replaced
+        when they come back.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if not self._started:
+                return
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in idle:
+            if worker.generation != generation:
+                self._replace(worker, graceful=True)
+            else:
+                self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._started = False
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def run(self, code: str, cpu_timeout: float = SANDBOX_CPU_TIMEOUT,
+            wall_timeout: float = SANDBOX_WALL_TIMEOUT,
+            queue_timeout: float = SANDBOX_QUEUE_TIMEOUT) -> Dict[str, Any]:
+        """
+        Execute code in an idle worker. Returns a dict with output, plots,
+        error, queue_wait and exec_time. Raises SandboxError if no worker
+        frees up in time or the worker dies (timeout, CPU or memory limit).
+        """
+        self.start()
+
+        enqueued = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=queue_timeout)
+        except queue.Empty:
+            raise SandboxError(f"No sandbox worker available within {queue_timeout:.0f}s")
+        try:
+            ready = worker.wait_ready(SANDBOX_START_TIMEOUT)
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            self._replace(worker)
+            raise SandboxError("Sandbox worker failed to start")
+        queue_wait = time.perf_counter() - enqueued
+
+        dispatched = time.perf_counter()
+        try:
+            worker.conn.send((code, cpu_timeout))
+            if not worker.conn.poll(wall_timeout):
+                self._record(queue_wait, time.perf_counter() - dispatched, "timeouts")
+                self._replace(worker)
+                raise SandboxError(f"Execution timed out after {wall_timeout:.0f}s")
+            result = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            self._record(queue_wait, time.perf_counter() - dispatched, "crashes")
+            self._replace(worker)
+            raise SandboxError("Execution was terminated (CPU or memory limit exceeded)")
+
+        worker.tasks += 1
+        if worker.tasks >= SANDBOX_MAX_TASKS_PER_WORKER or worker.generation != self._generation:
+            # Recycle long-lived workers so state left behind by user code doesn't
+            # accumulate, and workers started before the last recycle()
+            self._replace(worker, graceful=True)
+        else:
+            self._idle.put(worker)
+
+        result["queue_wait"] = queue_wait
+        result["exec_time"] = result.get("exec_time", time.perf_counter() - dispatched)
+        self._record(queue_wait, result["exec_time"], "errors" if result.get("error") else None)
+        return result
+
+    def _record(self, queue_wait: float, exec_time: float, outcome: Optional[str]) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["queue_wait_total"] += queue_wait
+            self._stats["exec_time_total"] += exec_time
+            if outcome:
+                self._stats[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats["calls"] or 1
+        stats["avg_queue_wait"] = stats["queue_wait_total"] / calls
+        stats["avg_exec_time"] = stats["exec_time_total"] / calls
+        stats["workers"] = self.size
+        stats["idle_workers"] = self._idle.qsize()
+        return stats
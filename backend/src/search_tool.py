@@ -462,13 +462,19 @@ Improved Real Estate Web Search Tool for Egyptian Websites
 """
 
 import requests
+from src.metrics import external_call
+from src.logging_config import get_logger
 from typing import List, Dict, Any, Optional
 from langchain_core.tools import tool
 import re
+import os
+import threading
 from urllib.parse import quote, urlparse
 from datetime import datetime
 import time
 
+from src.cache import TieredCache, SingleFlight
+
 # Optional import of BeautifulSoup: if bs4 isn't installed, avoid raising ImportError.
 # If BeautifulSoup is required at runtime for advanced scraping, install `beautifulsoup4`.
 try:
@@ -476,6 +482,8 @@ try:
 except Exception:
     BeautifulSoup = None  # type: ignore
 
+logger = get_logger(__name__)
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -509,6 +517,69 @@ EGYPTIAN_REAL_ESTATE_SITES = {
    
 }
 
+# Number of sites queried per search (each one is a Google CSE request)
+SITES_PER_SEARCH = 4
+
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")
+
+# ============================================================================
+# LISTING RESULT CACHE
+# ============================================================================
+
+LISTING_CACHE_TTL = int(os.getenv("LISTING_CACHE_TTL", "21600"))  # 6 hours
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", "512"))
+LISTING_CACHE_PATH = os.getenv("LISTING_CACHE_PATH", "data/.cache/listings.sqlite3")
+
+listing_cache = TieredCache(
+    "listing_results",
+    ttl=LISTING_CACHE_TTL,
+    maxsize=LISTING_CACHE_SIZE,
+    persist_path=LISTING_CACHE_PATH or None,
+)
+_listing_flight = SingleFlight()
+_quota_lock = threading.Lock()
+_quota_stats = {"upstream_calls": 0, "upstream_calls_saved": 0, "coalesced_requests": 0}
+
+
+def price_bucket(max_price: Optional[int]) -> str:
+    """
+    Bucket a budget the same way build_precise_query renders it, so every
+    budget that produces the same upstream query shares one cache entry.
+    """
+    if not max_price:
+        return "any"
+    if max_price >= 1_000_000:
+        return f"{max_price / 1_000_000:.0f}M"
+    return "<1M"
+
+
+def build_listing_cache_key(location: str, bedrooms: int, max_price: int,
+                            property_type: str, listing_type: str) -> str:
+    """Normalized cache key for a listing search"""
+    action = "rent" if listing_type == "rent" else "sale"
+    return "|".join([
+        " ".join(location.lower().split()),
+        str(bedrooms),
+        price_bucket(max_price),
+        property_type.strip().lower(),
+        action,
+    ])
+
+
+def _record_quota(used: int = 0, saved: int = 0, coalesced: int = 0):
+    with _quota_lock:
+        _quota_stats["upstream_calls"] += used
+        _quota_stats["upstream_calls_saved"] += saved
+        _quota_stats["coalesced_requests"] += coalesced
+
+
+def get_listing_cache_stats() -> Dict[str, Any]:
+    """Hit ratio and Google CSE quota saved by the listing cache"""
+    stats = listing_cache.stats()
+    with _quota_lock:
+        stats.update(_quota_stats)
+    return stats
+
 # ============================================================================
 # IMPROVED URL VALIDATOR
 # ============================================================================
@@ -546,28 +617,29 @@ class URLValidator:
         r'twitter\.com',
     ]
     
+    # Each rule set is folded into one alternation so a URL is checked with
+    # a single regex scan instead of one re.search per pattern
+    _INVALID_RE = re.compile("|".join(f"(?:{p})" for p in INVALID_PATTERNS))
+    _VALID_RE = re.compile("|".join(f"(?:{p})" for p in VALID_PATTERNS))
+    _TRACKING_RE = re.compile(r'[?&](utm_|fbclid|gclid)[^&]*')
+    
     @staticmethod
     def is_valid_property_url(url: str) -> bool:
         """Check if URL is a valid property listing page"""
         url_lower = url.lower()
         
         # Check invalid patterns first
-        for pattern in URLValidator.INVALID_PATTERNS:
-            if re.search(pattern, url_lower):
-                return False
+        if URLValidator._INVALID_RE.search(url_lower):
+            return False
         
         # Check valid patterns
-        for pattern in URLValidator.VALID_PATTERNS:
-            if re.search(pattern, url_lower):
-                return True
-        
-        return False
+        return URLValidator._VALID_RE.search(url_lower) is not None
     
     @staticmethod
     def clean_url(url: str) -> str:
         """Clean and normalize URL"""
         # Remove tracking parameters
-        url = re.sub(r'[?&](utm_|fbclid|gclid)[^&]*', '', url)
+        url = URLValidator._TRACKING_RE.sub('', url)
         url = url.rstrip('?&')
         return url
 
@@ -576,103 +648,145 @@ class URLValidator:
 # ============================================================================
 
 class PropertyDataExtractor:
-    """Extract property details from text with improved accuracy"""
+    """
+    Extract property details from text with improved accuracy.
     
-    @staticmethod
-    def extract_bedrooms(text: str) -> Optional[int]:
-        """Extract bedroom count with multiple pattern matching"""
-        text_lower = text.lower()
+    All patterns are compiled once at import. extract_all lowercases the text
+    once and resolves bedrooms, price and area together; the single-field
+    methods are thin wrappers kept for existing callers.
+    """
+    
+    _STUDIO_RE = re.compile(r'\bstudio\b')
+    
+    # Bedroom patterns (ordered by specificity)
+    _BEDROOM_RES = [
+        re.compile(r'(\d+)\s*(?:bed(?:room)?s?|br|غرف نوم|غرفة نوم)'),
+        re.compile(r'(\d+)\s*bd'),
+        re.compile(r'(\d+)br'),
+        re.compile(r'(?:bed(?:room)?s?|غرف)\s*[:：]\s*(\d+)'),
+    ]
+    
+    # Price patterns with context, paired with their base multiplier
+    _PRICE_RES = [
+        # Millions: "7.5M", "7.5 million", "7.5M EGP"
+        (re.compile(r'(?:egp|price|السعر)?\s*([\d,]+(?:\.\d+)?)\s*(?:m(?:illion)?|مليون)'), 1_000_000),
+        
+        # Thousands: "750K", "750 thousand", "750K EGP"
+        (re.compile(r'(?:egp|price|السعر)?\s*([\d,]+(?:\.\d+)?)\s*(?:k|thousand|ألف)'), 1_000),
         
+        # Direct numbers: "7500000 EGP", "EGP 7500000"
+        (re.compile(r'(?:egp|price|السعر)?\s*([\d,]{6,})\s*(?:egp|جنيه|pound)?'), 1),
+        
+        # With currency symbol: "£7,500,000"
+        (re.compile(r'[£﷼]\s*([\d,]+(?:\.\d+)?)\s*(?:m(?:illion)?|k|thousand)?'), 1),
+    ]
+    
+    _AREA_RES = [
+        re.compile(r'(\d+)\s*(?:sqm|m²|m2|متر)'),
+        re.compile(r'(\d+)\s*square\s*meters?'),
+    ]
+    
+    _DIGIT_RE = re.compile(r'\d')
+    
+    @staticmethod
+    def _bedrooms(text_lower: str) -> Optional[int]:
         # Studio patterns
-        if re.search(r'\bstudio\b', text_lower):
+        if PropertyDataExtractor._STUDIO_RE.search(text_lower):
             return 1
         
-        # Bedroom patterns (ordered by specificity)
-        patterns = [
-            r'(\d+)\s*(?:bed(?:room)?s?|br|غرف نوم|غرفة نوم)',
-            r'(\d+)\s*bd',
-            r'(\d+)br',
-            r'(?:bed(?:room)?s?|غرف)\s*[:：]\s*(\d+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text_lower)
+        for pattern in PropertyDataExtractor._BEDROOM_RES:
+            match = pattern.search(text_lower)
             if match:
-                try:
-                    bedrooms = int(match.group(1))
-                    if 1 <= bedrooms <= 10:  # Sanity check
-                        return bedrooms
-                except (ValueError, IndexError):
-                    continue
+                bedrooms = int(match.group(1))
+                if 1 <= bedrooms <= 10:  # Sanity check
+                    return bedrooms
         
         return None
     
     @staticmethod
-    def extract_price(text: str) -> Optional[int]:
-        """Extract price with better pattern matching and unit detection"""
-        text_lower = text.lower()
-        
-        # Price patterns with context
-        patterns = [
-            # Millions: "7.5M", "7.5 million", "7.5M EGP"
-            (r'(?:egp|price|السعر)?\s*([\d,]+(?:\.\d+)?)\s*(?:m(?:illion)?|مليون)', 1_000_000),
-            
-            # Thousands: "750K", "750 thousand", "750K EGP"
-            (r'(?:egp|price|السعر)?\s*([\d,]+(?:\.\d+)?)\s*(?:k|thousand|ألف)', 1_000),
-            
-            # Direct numbers: "7500000 EGP", "EGP 7500000"
-            (r'(?:egp|price|السعر)?\s*([\d,]{6,})\s*(?:egp|جنيه|pound)?', 1),
-            
-            # With currency symbol: "£7,500,000"
-            (r'[£﷼]\s*([\d,]+(?:\.\d+)?)\s*(?:m(?:illion)?|k|thousand)?', 1),
-        ]
-        
-        for pattern, base_multiplier in patterns:
-            match = re.search(pattern, text_lower)
+    def _price(text_lower: str) -> Optional[int]:
+        for pattern, base_multiplier in PropertyDataExtractor._PRICE_RES:
+            match = pattern.search(text_lower)
             if match:
                 try:
-                    price_str = match.group(1).replace(',', '')
-                    price_num = float(price_str)
-                    
-                    # Determine additional multiplier from text
-                    matched_text = match.group(0)
-                    if 'million' in matched_text or 'مليون' in matched_text or 'm' in matched_text:
-                        multiplier = 1_000_000
-                    elif 'k' in matched_text or 'thousand' in matched_text or 'ألف' in matched_text:
-                        multiplier = 1_000
-                    else:
-                        multiplier = base_multiplier
-                    
-                    price = int(price_num * multiplier)
-                    
-                    # Sanity check (100K to 500M EGP)
-                    if 100_000 <= price <= 500_000_000:
-                        return price
-                    
-                except (ValueError, IndexError):
+                    price_num = float(match.group(1).replace(',', ''))
+                except ValueError:
                     continue
+                
+                # Determine additional multiplier from text
+                matched_text = match.group(0)
+                if 'million' in matched_text or 'مليون' in matched_text or 'm' in matched_text:
+                    multiplier = 1_000_000
+                elif 'k' in matched_text or 'thousand' in matched_text or 'ألف' in matched_text:
+                    multiplier = 1_000
+                else:
+                    multiplier = base_multiplier
+                
+                price = int(price_num * multiplier)
+                
+                # Sanity check (100K to 500M EGP)
+                if 100_000 <= price <= 500_000_000:
+                    return price
         
         return None
     
     @staticmethod
-    def extract_area(text: str) -> Optional[int]:
-        """Extract area in square meters"""
-        patterns = [
-            r'(\d+)\s*(?:sqm|m²|m2|متر)',
-            r'(\d+)\s*square\s*meters?',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
+    def _area(text_lower: str) -> Optional[int]:
+        for pattern in PropertyDataExtractor._AREA_RES:
+            match = pattern.search(text_lower)
             if match:
-                try:
-                    area = int(match.group(1))
-                    if 20 <= area <= 10000:  # Sanity check
-                        return area
-                except (ValueError, IndexError):
-                    continue
+                area = int(match.group(1))
+                if 20 <= area <= 10000:  # Sanity check
+                    return area
         
         return None
+    
+    @staticmethod
+    def extract_all(text: str) -> Dict[str, Optional[int]]:
+        """Extract bedrooms, price and area from one lowercased copy of text"""
+        text_lower = text.lower()
+        
+        # Every numeric pattern needs a digit; only "studio" can match without one
+        if not PropertyDataExtractor._DIGIT_RE.search(text_lower):
+            studio = PropertyDataExtractor._STUDIO_RE.search(text_lower)
+            return {
+                "found_bedrooms": 1 if studio else None,
+                "found_price": None,
+                "found_area": None,
+            }
+        
+        return {
+            "found_bedrooms": PropertyDataExtractor._bedrooms(text_lower),
+            "found_price": PropertyDataExtractor._price(text_lower),
+            "found_area": PropertyDataExtractor._area(text_lower),
+        }
+    
+    @staticmethod
+    def extract_batch(texts: List[str]) -> List[Dict[str, Optional[int]]]:
+        """Extract details for many snippets, reusing results for repeated text"""
+        seen: Dict[str, Dict[str, Optional[int]]] = {}
+        results = []
+        for text in texts:
+            extracted = seen.get(text)
+            if extracted is None:
+                extracted = seen[text] = PropertyDataExtractor.extract_all(text)
+            results.append(dict(extracted))
+        return results
+    
+    @staticmethod
+    def extract_bedrooms(text: str) -> Optional[int]:
+        """Extract bedroom count with multiple pattern matching"""
+        return PropertyDataExtractor._bedrooms(text.lower())
+    
+    @staticmethod
+    def extract_price(text: str) -> Optional[int]:
+        """Extract price with better pattern matching and unit detection"""
+        return PropertyDataExtractor._price(text.lower())
+    
+    @staticmethod
+    def extract_area(text: str) -> Optional[int]:
+        """Extract area in square meters"""
+        return PropertyDataExtractor._area(text.lower())
 
 # ============================================================================
 # IMPROVED WEB SEARCHER
@@ -732,7 +846,7 @@ class ImprovedRealEstateSearcher:
         
         site_query = f"{query} site:{site}"
         
-        url = "https://www.googleapis.com/customsearch/v1"
+        url = GOOGLE_CSE_URL
         params = {
             "key": self.google_api_key,
             "cx": self.google_cse_id,
@@ -741,9 +855,10 @@ class ImprovedRealEstateSearcher:
         }
         
         try:
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
+            with external_call("google_cse"):
+                response = self.session.get(url, params=params, timeout=15)
+                response.raise_for_status()
+                data = response.json()
             
             results = []
             for item in data.get("items", []):
@@ -760,26 +875,24 @@ class ImprovedRealEstateSearcher:
                 if not self.validator.is_valid_property_url(url):
                     continue
                 
-                # Extract data
-                combined_text = f"{item.get('title', '')} {item.get('snippet', '')}"
-                
                 result = {
                     "title": item.get("title", ""),
                     "link": url,
                     "snippet": item.get("snippet", ""),
                     "source": site,
                     "display_link": item.get("displayLink", ""),
-                    "found_bedrooms": self.extractor.extract_bedrooms(combined_text),
-                    "found_price": self.extractor.extract_price(combined_text),
-                    "found_area": self.extractor.extract_area(combined_text),
                 }
-                
                 results.append(result)
             
+            # Extract data for all validated items in one batch
+            combined_texts = [f"{r['title']} {r['snippet']}" for r in results]
+            for result, extracted in zip(results, self.extractor.extract_batch(combined_texts)):
+                result.update(extracted)
+            
             return results
             
         except Exception as e:
-            print(f"  ⚠️ Search error for {site}: {str(e)[:100]}")
+            logger.warning("Search error for %s: %s", site, str(e)[:100])
             return []
     
     def search_properties(self, location: str, bedrooms: int,
@@ -791,17 +904,26 @@ class ImprovedRealEstateSearcher:
         query = self.build_precise_query(location, bedrooms, max_price, 
                                          property_type, listing_type)
         
-        print(f"\n🔍 Search Query: {query}")
-        print(f"📍 Filters: {location} | {bedrooms} bed | ≤{max_price:,} EGP | {listing_type}")
+        logger.info("Listing search", extra={"query": query, "location": location, "bedrooms": bedrooms,
+                                             "max_price": max_price, "listing_type": listing_type})
         
-        all_results = []
-        sites = list(EGYPTIAN_REAL_ESTATE_SITES.keys())[:4]
+        cache_key = build_listing_cache_key(location, bedrooms, max_price,
+                                            property_type, listing_type)
+        all_results = listing_cache.get(cache_key)
         
-        for site in sites:
-            print(f"  → Searching {site}...")
-            results = self.search_with_validation(query, site, num_results=3)
-            all_results.extend(results)
-            time.sleep(0.5)  # Rate limiting
+        if all_results is not None:
+            logger.debug("Cache hit for %s", cache_key)
+            _record_quota(saved=SITES_PER_SEARCH)
+        else:
+            all_results, shared = _listing_flight.do(
+                cache_key, lambda: self._fetch_and_cache(query, cache_key)
+            )
+            if shared:
+                logger.debug("Shared in-flight search for %s", cache_key)
+                _record_quota(saved=SITES_PER_SEARCH, coalesced=1)
+        
+        # Scoring mutates the dicts, so work on copies of the cached listings
+        all_results = [dict(result) for result in all_results]
         
         # Score and filter results
         scored_results = self._score_results(all_results, bedrooms, max_price)
@@ -809,10 +931,34 @@ class ImprovedRealEstateSearcher:
         # Remove duplicates
         unique_results = self._remove_duplicates(scored_results)
         
-        print(f"✅ Found {len(unique_results)} validated properties")
+        logger.info("Found %d validated properties", len(unique_results))
         
         return unique_results[:num_results]
     
+    def _fetch_listings(self, query: str) -> List[Dict]:
+        """Query each site and return the validated, extracted listings"""
+        
+        all_results = []
+        sites = list(EGYPTIAN_REAL_ESTATE_SITES.keys())[:SITES_PER_SEARCH]
+        
+        for site in sites:
+            logger.debug("Searching %s", site)
+            results = self.search_with_validation(query, site, num_results=3)
+            all_results.extend(results)
+            time.sleep(0.5)  # Rate limiting
+        
+        _record_quota(used=len(sites))
+        return all_results
+    
+    def _fetch_and_cache(self, query: str, cache_key: str) -> List[Dict]:
+        """Fetch listings upstream and store them before releasing waiters"""
+        
+        all_results = self._fetch_listings(query)
+        # Don't pin an empty result (usually an upstream error) for the full TTL
+        if all_results:
+            listing_cache.set(cache_key, all_results)
+        return all_results
+    
     def _score_results(self, results: List[Dict], 
                        target_bedrooms: int, max_price: int) -> List[Dict]:
         """Score results based on relevance"""
@@ -1035,4 +1181,80 @@ def search_egyptian_real_estate_tavily(
         "listing_type": listing_type
     }
     
-    return format_results_conversational(results, query_context)
\ No newline at end of file
+    return format_results_conversational(results, query_context)
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_extraction(num_snippets: int = 10_000):
+    """
+    Micro-benchmark for the extraction engine over synthetic CSE snippets
+    """
+    import random
+    
+    templates = [
+        "Apartment for sale in {loc} - {bed} bedrooms, {area} sqm, price {price:,} EGP",
+        "{bed}br villa {loc} | {price_m}M EGP | {area} m²",
+        "Studio for rent in {loc}, {area} m2, {price_k}K monthly",
+        "شقة للبيع {bed} غرف نوم {area} متر السعر {price_m} مليون",
+        "Listing #{id} in {loc}: Bedrooms: {bed}, £{price:,}",
+    ]
+    locations = ["New Cairo", "Sheikh Zayed", "6th October", "Maadi", "North Coast"]
+    
+    random.seed(42)
+    snippets = []
+    for i in range(num_snippets):
+        price = random.randint(1, 40) * 250_000
+        snippets.append(random.choice(templates).format(
+            loc=random.choice(locations),
+            bed=random.randint(1, 5),
+            area=random.randint(60, 400),
+            price=price,
+            price_m=round(price / 1_000_000, 1),
+            price_k=price // 1_000,
+            id=random.randint(100_000, 999_999),
+        ))
+    urls = [f"https://www.{random.choice(list(EGYPTIAN_REAL_ESTATE_SITES))}/en/property-{i}"
+            for i in range(num_snippets)]
+    
+    extractor = PropertyDataExtractor()
+    
+    print(f"\n⏱️ Extraction benchmark ({num_snippets:,} snippets)")
+    print("=" * 50)
+    
+    start = time.perf_counter()
+    for text in snippets:
+        extractor.extract_bedrooms(text)
+        extractor.extract_price(text)
+        extractor.extract_area(text)
+    per_field = time.perf_counter() - start
+    print(f"   Per-field calls:  {per_field * 1000:8.1f} ms")
+    
+    start = time.perf_counter()
+    for text in snippets:
+        extractor.extract_all(text)
+    single_pass = time.perf_counter() - start
+    print(f"   extract_all:      {single_pass * 1000:8.1f} ms")
+    
+    start = time.perf_counter()
+    extractor.extract_batch(snippets)
+    batch = time.perf_counter() - start
+    print(f"   extract_batch:    {batch * 1000:8.1f} ms")
+    
+    start = time.perf_counter()
+    for url in urls:
+        URLValidator.is_valid_property_url(url)
+    url_time = time.perf_counter() - start
+    print(f"   URL validation:   {url_time * 1000:8.1f} ms")
+    
+    return {
+        "per_field_s": per_field,
+        "extract_all_s": single_pass,
+        "extract_batch_s": batch,
+        "url_validation_s": url_time,
+    }
+
+
+if __name__ == "__main__":
+    benchmark_extraction()
@@ -0,0 +1,165 @@
+"""
+ASGI middleware for the CopilotKit stream
+- New tool calls are normalized where they are created (agent.normalize_tool_calls);
+  this only covers `"args": null` in messages restored from older checkpoints
+- Body frames are passed through untouched unless a byte scan finds
+  "tool_calls" and a null args value; the fix is done in place with
+  same-length bytes, so headers (Content-Length) stay valid and nothing
+  is parsed or re-encoded
+"""
+
+import re
+import time
+from typing import Dict, List
+
+_TOOL_CALLS = b'"tool_calls"'
+_NULL_ARGS = re.compile(rb'("args"\s*:\s*)null')
+
+
+def fix_null_args(body: bytes) -> bytes:
+    """`"args": null` -> `"args": {}  ` (JSON whitespace pads it to the same length)"""
+    if _TOOL_CALLS not in body or b"null" not in body:
+        return body
+    return _NULL_ARGS.sub(rb"\1{}  ", body)
+
+
+class ToolCallArgsMiddleware:
+    """Pure ASGI: no request/response objects, no extra task or queue per response"""
+
+    def __init__(self, app, path: str = "/copilotkit"):
+        self.app = app
+        self.path = path
+        self.frames = 0
+        self.fixed = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.path not in scope["path"]:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_fixed(message):
+            if message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                self.frames += 1
+                if _TOOL_CALLS in body:
+                    fixed = fix_null_args(body)
+                    if fixed is not body:
+                        self.fixed += 1
+                        message = {**message, "body": fixed}
+            await send(message)
+
+        await self.app(scope, receive, send_fixed)
+
+    def stats(self) -> Dict[str, int]:
+        return {"frames": self.frames, "fixed": self.fixed}
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _sse_frames(count: int) -> List[bytes]:
+    """CopilotKit-like stream: mostly token deltas, every 50th frame a state snapshot with tool calls"""
+    import json
+
+    frames = []
+    for i in range(count):
+        if i % 50 == 49:
+            event = {"type": "state", "messages": [{
+                "role": "assistant", "content": "",
+                "tool_calls": [{"id": f"call_{i}", "name": "execute_python_query",
+                                "args": None if i % 100 == 99 else {"code": "df.head()"}}],
+            }]}
+        else:
+            event = {"type": "delta", "content": f"token {i} "}
+        frames.append(f"data: {json.dumps(event)}\n\n".encode())
+    return frames
+
+
+def benchmark_stream(frames: int = 50000):
+    """
+    Push `frames` SSE frames through the ASGI stack with no middleware, the
+    old BaseHTTPMiddleware json.loads/dumps sanitizer, and this middleware.
+    """
+    import asyncio
+    import json
+
+    from starlette.applications import Starlette
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import StreamingResponse
+    from starlette.routing import Route
+
+    payload = _sse_frames(frames)
+
+    async def stream(request):
+        async def body():
+            for frame in payload:
+                yield frame
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    async def json_roundtrip(request, call_next):
+        # The sanitizer this module replaces
+        response = await call_next(request)
+
+        async def sanitized():
+            async for chunk in response.body_iterator:
+                try:
+                    if chunk:
+                        data = json.loads(chunk)
+                        if isinstance(data, dict) and "messages" in data:
+                            for msg in data.get("messages", []):
+                                if isinstance(msg, dict) and "tool_calls" in msg:
+                                    for tc in msg.get("tool_calls", []):
+                                        if isinstance(tc, dict) and tc.get("args") is None:
+                                            tc["args"] = {}
+                        yield json.dumps(data).encode()
+                except Exception:
+                    yield chunk
+
+        return StreamingResponse(sanitized(), status_code=response.status_code,
+                                 headers=dict(response.headers), media_type=response.media_type)
+
+    def build(kind: str):
+        app = Starlette(routes=[Route("/copilotkit", stream)])
+        if kind == "json round-trip":
+            app.add_middleware(BaseHTTPMiddleware, dispatch=json_roundtrip)
+        elif kind == "byte scan":
+            app.add_middleware(ToolCallArgsMiddleware)
+        return app
+
+    async def drive(app):
+        received = []
+        scope = {"type": "http", "method": "GET", "path": "/copilotkit", "raw_path": b"/copilotkit",
+                 "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+                 "server": ("test", 80), "client": ("test", 1), "root_path": "", "app": app}
+
+        async def receive():
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                received.append(message.get("body", b""))
+
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        return time.perf_counter() - start, received
+
+    print(f"\n⏱️ CopilotKit stream middleware benchmark ({frames} SSE frames)")
+    print("=" * 60)
+    print(f"{'middleware':<18}{'frames/s':>12}{'MB/s':>10}{'µs/frame':>10}{'+µs/frame':>11}")
+    size = sum(len(frame) for frame in payload)
+    baseline = None
+    for kind in ("none", "json round-trip", "byte scan"):
+        elapsed, received = asyncio.run(drive(build(kind)))
+        per_frame = elapsed / frames * 1e6
+        baseline = per_frame if baseline is None else baseline
+        print(f"{kind:<18}{frames / elapsed:>12.0f}{size / elapsed / 1e6:>10.1f}"
+              f"{per_frame:>10.2f}{per_frame - baseline:>11.2f}")
+        if kind == "byte scan":
+            nulls = sum(b'"args": null' in chunk for chunk in received)
+            print(f"   null args left in stream: {nulls}")
+
+
+if __name__ == "__main__":
+    benchmark_stream()
@@ -1,8 +1,19 @@
 from langchain_core.tools import tool, InjectedToolCallId
 from typing import Dict, Union, Any, Annotated, Sequence, TypedDict, Literal
 from geopy.geocoders import Nominatim
+import os
 import psycopg2
 import requests
+from urllib.parse import urlsplit
+from src.metrics import external_call
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Upstream endpoints (overridable, e.g. to point the load test at local stubs)
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
 @tool
 def find_properties_tool(
     place_name: str, 
@@ -20,38 +31,41 @@ def find_properties_tool(
     Returns:
         String with property details, distances, and Google Maps links
     """
-    print(f"🔍 Searching for properties near: {place_name}")
-    print(f"📏 Search radius: {radius_km} km")
+    logger.info("Searching for properties near %s", place_name, extra={"radius_km": radius_km})
     
     try:
         # Geocode the location with Egypt bias
-        geolocator = Nominatim(user_agent="real_estate_agent")
+        nominatim = urlsplit(NOMINATIM_URL)
+        geolocator = Nominatim(user_agent="real_estate_agent", scheme=nominatim.scheme,
+                               domain=nominatim.netloc + nominatim.path.rsplit("/search", 1)[0])
         
         # First try: search with ", Egypt" appended
-        location = geolocator.geocode(f"{place_name}, Egypt")
+        with external_call("nominatim"):
+            location = geolocator.geocode(f"{place_name}, Egypt")
         
         # Second try: original name
         if not location:
-            print(f"⚠️ First attempt failed, trying without Egypt suffix...")
-            location = geolocator.geocode(place_name)
+            logger.debug("First geocode attempt failed, trying without Egypt suffix")
+            with external_call("nominatim"):
+                location = geolocator.geocode(place_name)
         
         if not location:
             error_msg = f"❌ Couldn't find coordinates for '{place_name}'. Please try a more specific location."
-            print(error_msg)
+            logger.warning("Couldn't geocode %s", place_name)
             return error_msg
 
         lat, lon = location.latitude, location.longitude
-        print(f"📍 Found coordinates: {lat}, {lon}")
-        print(f"📍 Location: {location.address}")
+        logger.debug("Found coordinates %s, %s (%s)", lat, lon, location.address)
         
         # Validate it's in Egypt (rough bounds: lat 22-32, lon 25-36)
         if not (22 <= lat <= 32 and 25 <= lon <= 36):
-            print(f"⚠️ Warning: Coordinates seem outside Egypt. Found: {location.address}")
+            logger.warning("Coordinates seem outside Egypt: %s", location.address)
             # Try again with explicit Egypt suffix
-            location = geolocator.geocode(f"{place_name}, Cairo, Egypt")
+            with external_call("nominatim"):
+                location = geolocator.geocode(f"{place_name}, Cairo, Egypt")
             if location and 22 <= location.latitude <= 32 and 25 <= location.longitude <= 36:
                 lat, lon = location.latitude, location.longitude
-                print(f"✅ Corrected to Egyptian location: {lat}, {lon}")
+                logger.debug("Corrected to Egyptian location: %s, %s", lat, lon)
             else:
                 return f"❌ Could not find '{place_name}' in Egypt. Please provide a more specific location in Cairo or Egypt."
 
@@ -61,10 +75,9 @@ def find_properties_tool(
                 "dbname=langgraph_db user=postgres password=123456 host=localhost"
             )
             cur = conn.cursor()
-            print("✅ Database connection established")
         except Exception as db_error:
             error_msg = f"❌ Database connection failed: {str(db_error)}"
-            print(error_msg)
+            logger.error("Database connection failed: %s", db_error)
             return error_msg
 
         # Query for nearby properties
@@ -85,17 +98,15 @@ def find_properties_tool(
         LIMIT 5;
         """
         
-        print(f"🔍 Executing spatial query...")
         cur.execute(query, (lon, lat, lon, lat, radius_km * 1000))
         results = cur.fetchall()
-        print(f"📊 Found {len(results)} properties")
+        logger.debug("Spatial query found %d properties", len(results))
         
         cur.close()
         conn.close()
 
         if not results:
             msg = f"No properties found within {radius_km}km of {place_name}. Try increasing the search radius."
-            print(f"⚠️ {msg}")
             return msg
 
         # Format response
@@ -109,14 +120,11 @@ def find_properties_tool(
             response.append(f"   🗺️ Map: {maps_link}\n")
 
         result = "\n".join(response)
-        print(f"✅ Returning {len(results)} properties")
         return result
         
     except Exception as e:
         error_msg = f"❌ Error in find_properties_tool: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("Error in find_properties_tool")
         return error_msg
     
 
@@ -148,7 +156,7 @@ def google_maps_link_tool(
     Returns:
         Google Maps URL or error message
     """
-    print(f"🗺️ Getting map link for: {project_name}")
+    logger.info("Getting map link for %s", project_name)
     
     try:
         # ✅ FIX: Use correct password
@@ -167,22 +175,21 @@ def google_maps_link_tool(
         conn.close()
 
         if not result:
-            print(f"⚠️ Property '{project_name}' not found in database")
+            logger.debug("Property %r not found in database", project_name)
             return f"❌ Property '{project_name}' not found in database. Please check the spelling."
 
         name, lat, lon = result
         maps_link = f"https://www.google.com/maps?q={lat},{lon}"
-        print(f"✅ Found: {name} at ({lat}, {lon})")
         
         return f"📍 **{name}**\n🗺️ Google Maps: {maps_link}"
     
     except psycopg2.OperationalError as e:
         error_msg = f"❌ Database connection error: {str(e)}"
-        print(error_msg)
+        logger.error("Database connection error: %s", e)
         return error_msg
     except Exception as e:
         error_msg = f"❌ Error getting map link: {str(e)}"
-        print(error_msg)
+        logger.error("Error getting map link: %s", e)
         return error_msg
     
 
@@ -312,7 +319,7 @@ def nearby_places_tool(
     Lists notable points of interest (amenities) near a property.
     Intelligently filters results based on user's question context.
     """
-    print(f"🏪 Finding places near: {project_name} (radius: {radius_m}m)")
+    logger.info("Finding places near %s", project_name, extra={"radius_m": radius_m})
     
     try:
         conn = psycopg2.connect(
@@ -337,8 +344,7 @@ def nearby_places_tool(
             return f"❌ Property matching '{project_name}' not found in database."
 
         name, lat, lon = result
-        print(f"✅ Found property: {name} at ({lat}, {lon})")
-        print(f"🔍 Querying Overpass API for amenities...")
+        logger.debug("Found property %s at (%s, %s), querying Overpass", name, lat, lon)
         
         # Query Overpass API for nearby amenities
         query = f"""[out:json][timeout:25];
@@ -348,11 +354,12 @@ def nearby_places_tool(
         );
         out center;"""
         
-        response = requests.get(
-            "https://overpass-api.de/api/interpreter",
-            params={'data': query},
-            timeout=10
-        )
+        with external_call("overpass"):
+            response = requests.get(
+                OVERPASS_URL,
+                params={'data': query},
+                timeout=10
+            )
         
         if response.status_code != 200:
             return f"⚠️ Could not fetch nearby places (API error: {response.status_code})"
@@ -479,10 +486,10 @@ def nearby_places_tool(
         
         response_text += f"\n**Total: {total_count} amenities found**"
         
-        print(f"✅ Found {total_count} categorized places")
+        logger.debug("Found %d categorized places", total_count)
         return response_text
     
     except Exception as e:
         error_msg = f"❌ Error finding nearby places: {str(e)}"
-        print(error_msg)
+        logger.error("Error finding nearby places: %s", e)
         return error_msg
\ No newline at end of file
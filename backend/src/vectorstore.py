@@ -1,42 +1,389 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-# from langchain_community.embeddings import HuggingFaceEmbeddings
-# from langchain.vectorstores import FAISS
-
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-import torch
-
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-def build_vectorstore(docs):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-    chunks = splitter.split_documents(docs)
-    # embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={"device": device},  # change to "cuda" if you have GPU
-    encode_kwargs={"batch_size": 32}  # split large input into batches
-)
-    #vectordb = FAISS.from_documents(chunks, embeddings)
-    #vectordb.save_local("faiss_index2")
-    vectordb = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-
-    return vectordb
-
-def build_vectorstore2(docs):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-    chunks = splitter.split_documents(docs)
-    # embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={"device": device},  # change to "cuda" if you have GPU
-    encode_kwargs={"batch_size": 32}  # split large input into batches
-)
-    vectordb2 = FAISS.from_documents(chunks, embeddings)
-    vectordb2.save_local("faiss_index2")
-   # vectordb = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-
-    return vectordb2
+"""
+Incremental vector index over the legal PDFs in data/
+- A manifest records each PDF's content hash and its row range, so only new
+  or changed files are parsed and embedded again
+- Stored without pickle: vectors.npy, chunks.jsonl and FAISS's own binary
+  index format, written to a fresh version directory and swapped in via
+  CURRENT
+- Changed PDFs stream through the parallel page loader; each embedded
+  batch is appended to the new version's files as it arrives, and stored
+  rows of unchanged PDFs are copied over in one pass, so ingestion holds one
+  batch of vectors in memory rather than the whole corpus
+- Loaded memory-mapped; exact inner-product search for small corpora, HNSW
+  or IVF once the corpus passes VECTOR_INDEX_ANN_THRESHOLD chunks
+
+Usage:
+    python -m src.vectorstore ingest [--force]
+    python -m src.vectorstore search "can foreigners own land in Egypt?"
+    python -m src.vectorstore stats
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.data_loader import iter_batches, iter_chunks, iter_pdf_pages
+
+try:
+    import faiss
+except ImportError:  # Exact NumPy search is used without FAISS
+    faiss = None
+
+
+PDF_DIR = os.getenv("PDF_DIR", "data")
+INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "data/vector_index")
+EMBEDDING_MODEL = os.getenv("VECTOR_INDEX_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CHUNK_SIZE = int(os.getenv("VECTOR_INDEX_CHUNK_SIZE", "2000"))
+CHUNK_OVERLAP = int(os.getenv("VECTOR_INDEX_CHUNK_OVERLAP", "100"))
+EMBED_BATCH_SIZE = int(os.getenv("VECTOR_INDEX_EMBED_BATCH", "32"))
+
+# Above this many chunks an approximate index replaces exact search
+ANN_THRESHOLD = int(os.getenv("VECTOR_INDEX_ANN_THRESHOLD", "20000"))
+ANN_KIND = os.getenv("VECTOR_INDEX_ANN_KIND", "hnsw")  # "hnsw" or "ivf"
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+
+
+# ============================================================================
+# EMBEDDINGS
+# ============================================================================
+
+_embedder = None
+
+
+def get_embedder():
+    """HuggingFace embedder, created on first use"""
+    global _embedder
+    if _embedder is None:
+        import torch
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        _embedder = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={"device": device},
+            encode_kwargs={"batch_size": EMBED_BATCH_SIZE},
+        )
+    return _embedder
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return _normalize(get_embedder().embed_documents(texts))
+
+
+def embed_query(text: str) -> np.ndarray:
+    return _normalize([get_embedder().embed_query(text)])[0]
+
+
+# ============================================================================
+# MANIFEST
+# ============================================================================
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _index_params() -> Dict[str, object]:
+    """Settings that invalidate every stored vector when they change"""
+    return {"model": EMBEDDING_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+
+def _current_version_dir(index_dir: str) -> Optional[str]:
+    pointer = os.path.join(index_dir, "CURRENT")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        version_dir = os.path.join(index_dir, f.read().strip())
+    return version_dir if os.path.isdir(version_dir) else None
+
+
+def _read_manifest(version_dir: Optional[str]) -> Dict:
+    if version_dir is None:
+        return {}
+    with open(os.path.join(version_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+# ============================================================================
+# INGESTION
+# ============================================================================
+
+def _iter_changed_chunks(paths: List[str]) -> Iterator[Document]:
+    """Stream chunks of the given PDFs; pages are parsed in parallel and split as they arrive"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return iter_chunks(iter_pdf_pages(paths), splitter)
+
+
+def _chunk_line(chunk: Document) -> str:
+    return json.dumps({
+        "text": chunk.page_content,
+        "source": os.path.basename(chunk.metadata["source"]),
+        "page": chunk.metadata.get("page"),
+    }, ensure_ascii=False)
+
+
+def build_ann_index(vectors: np.ndarray):
+    """Exact inner-product index, or HNSW/IVF above ANN_THRESHOLD rows"""
+    n, dim = vectors.shape
+    if n < ANN_THRESHOLD:
+        index = faiss.IndexFlatIP(dim)
+    elif ANN_KIND == "ivf":
+        nlist = max(1, int(4 * np.sqrt(n)))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.add(vectors)
+    return index
+
+
+def _iter_lines(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def _write_npy(raw_path: str, npy_path: str, rows: int, dim: int) -> None:
+    """Put a .npy header in front of the float32 rows appended to raw_path"""
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+              "fortran_order": False, "shape": (rows, dim)}
+    with open(npy_path, "wb") as out, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(out, header)
+        shutil.copyfileobj(raw, out, 1 << 20)
+    os.remove(raw_path)
+
+
+def ingest_pdfs(pdf_dir: str = PDF_DIR, index_dir: str = INDEX_DIR, force: bool = False) -> Dict:
+    """
+    Bring the index up to date with pdf_dir. Unchanged files keep their
+    stored chunks and vectors; new or modified files are parsed and embedded;
+    deleted files drop out. Returns the new manifest.
+    """
+    start = time.perf_counter()
+    previous_dir = _current_version_dir(index_dir)
+    previous = _read_manifest(previous_dir)
+    reusable = not force and previous.get("params") == _index_params()
+
+    # Decide per file whether its stored rows can be reused
+    paths = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+    names = [os.path.basename(path) for path in paths]
+    hashes = {os.path.basename(path): file_sha256(path) for path in paths}
+    changed = []
+    for path in paths:
+        entry = previous.get("files", {}).get(os.path.basename(path))
+        if not (reusable and entry and entry["sha256"] == hashes[os.path.basename(path)]):
+            changed.append(path)
+    changed_names = {os.path.basename(path) for path in changed}
+    kept = [name for name in names if name not in changed_names]
+
+    if previous_dir is not None and not changed and set(names) == set(previous.get("files", {})):
+        print(f"✅ Vector index up to date ({previous.get('count', 0)} chunks)")
+        return previous
+
+    version = time.strftime("v%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    version_dir = os.path.join(index_dir, version)
+    os.makedirs(version_dir)
+    raw_path = os.path.join(version_dir, "vectors.f32")
+
+    files: Dict[str, Dict] = {}
+    row = 0
+    dim = 0
+    with open(raw_path, "wb") as vectors_out, \
+            open(os.path.join(version_dir, "chunks.jsonl"), "w", encoding="utf-8") as chunks_out:
+
+        def append(vectors: np.ndarray, lines: List[str]) -> None:
+            nonlocal row
+            vectors_out.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            chunks_out.writelines(line + "\n" for line in lines)
+            row += len(lines)
+
+        # Changed files: chunks arrive file by file, so each file's rows stay contiguous
+        for batch in iter_batches(_iter_changed_chunks(changed), EMBED_BATCH_SIZE):
+            vectors = embed_texts([chunk.page_content for chunk in batch])
+            dim = vectors.shape[1]
+            for offset, chunk in enumerate(batch, start=row):
+                name = os.path.basename(chunk.metadata["source"])
+                entry = files.setdefault(name, {"sha256": hashes[name], "rows": [offset, offset]})
+                entry["rows"][1] = offset + 1
+            append(vectors, [_chunk_line(chunk) for chunk in batch])
+        for name in sorted(changed_names):
+            entry = files.setdefault(name, {"sha256": hashes[name], "rows": [row, row]})
+            print(f"🧩 Embedded {name}: {entry['rows'][1] - entry['rows'][0]} chunks")
+
+        # Unchanged files: stored rows copied in their old order, one pass over the old files
+        if kept:
+            old_vectors = np.load(os.path.join(previous_dir, "vectors.npy"), mmap_mode="r")
+            old_lines = _iter_lines(os.path.join(previous_dir, "chunks.jsonl"))
+            dim = dim or old_vectors.shape[1]
+            position = 0
+            for name in sorted(kept, key=lambda name: previous["files"][name]["rows"][0]):
+                begin, end = previous["files"][name]["rows"]
+                lines = list(islice(old_lines, begin - position, end - position))
+                position = end
+                files[name] = {"sha256": hashes[name], "rows": [row, row + len(lines)]}
+                append(old_vectors[begin:end], lines)
+
+    npy_path = os.path.join(version_dir, "vectors.npy")
+    _write_npy(raw_path, npy_path, row, dim if row else 0)
+
+    index_kind = "numpy"
+    if faiss is not None and row:
+        # FAISS reads the memory-mapped rows; the index itself lives in memory
+        index = build_ann_index(np.ascontiguousarray(np.load(npy_path, mmap_mode="r")))
+        faiss.write_index(index, os.path.join(version_dir, "index.faiss"))
+        index_kind = type(index).__name__
+
+    manifest = {
+        "params": _index_params(),
+        "dim": dim if row else 0,
+        "count": row,
+        "index": index_kind,
+        "files": {name: files[name] for name in names},
+        "built_at": time.time(),
+    }
+    with open(os.path.join(version_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap readers over to the new version, then drop the old one
+    pointer_tmp = os.path.join(index_dir, "CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(index_dir, "CURRENT"))
+    if previous_dir is not None:
+        shutil.rmtree(previous_dir, ignore_errors=True)
+
+    print(f"✅ Vector index {version}: {row} chunks, {len(changed)} file(s) embedded, "
+          f"{index_kind}, {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+class PDFIndex:
+    """Read-only view of one index version"""
+
+    def __init__(self, version_dir: str):
+        self.version_dir = version_dir
+        self.manifest = _read_manifest(version_dir)
+        # Pages are shared with every process mapping the same file
+        self.vectors = np.load(os.path.join(version_dir, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(version_dir, "chunks.jsonl"), encoding="utf-8") as f:
+            self.chunks = [json.loads(line) for line in f if line.strip()]
+        self.index = self._load_faiss()
+
+    def _load_faiss(self):
+        path = os.path.join(self.version_dir, "index.faiss")
+        if faiss is None or not os.path.exists(path):
+            return None
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type supports mmap
+            index = faiss.read_index(path)
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif hasattr(index, "nprobe"):
+            index.nprobe = IVF_NPROBE
+        return index
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search_vector(self, query_vector: np.ndarray, k: int = 4) -> List[Tuple[int, float]]:
+        if not len(self.chunks):
+            return []
+        k = min(k, len(self.chunks))
+        if self.index is not None:
+            scores, ids = self.index.search(query_vector.reshape(1, -1).astype(np.float32), k)
+            return [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+        scores = self.vectors @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search(self, query: str, k: int = 4) -> List[Document]:
+        results = []
+        for row, score in self.search_vector(embed_query(query), k):
+            chunk = self.chunks[row]
+            results.append(Document(
+                page_content=chunk["text"],
+                metadata={"source": chunk["source"], "page": chunk["page"], "score": round(score, 4)},
+            ))
+        return results
+
+
+_loaded: Optional[PDFIndex] = None
+
+
+def load_index(index_dir: str = INDEX_DIR) -> Optional[PDFIndex]:
+    """Current index version (reopened after a re-ingest), or None if none was built"""
+    global _loaded
+    version_dir = _current_version_dir(index_dir)
+    if version_dir is None:
+        return None
+    if _loaded is None or _loaded.version_dir != version_dir:
+        _loaded = PDFIndex(version_dir)
+    return _loaded
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Legal PDF vector index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="embed new or changed PDFs")
+    ingest.add_argument("--force", action="store_true", help="re-embed every file")
+    search = commands.add_parser("search", help="query the index")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=4)
+    commands.add_parser("stats", help="show the manifest")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        ingest_pdfs(force=args.force)
+    elif args.command == "search":
+        index = load_index()
+        if index is None:
+            print("❌ No index yet, run: python -m src.vectorstore ingest")
+            return
+        for doc in index.search(args.query, args.k):
+            print(f"[{doc.metadata['score']:.3f}] {doc.metadata['source']} p.{doc.metadata['page']}: "
+                  f"{doc.page_content[:160]!r}")
+    else:
+        manifest = _read_manifest(_current_version_dir(INDEX_DIR))
+        print(json.dumps(manifest, indent=2) if manifest else "❌ No index yet")
+
+
+if __name__ == "__main__":
+    main()
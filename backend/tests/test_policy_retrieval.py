@@ -0,0 +1,72 @@
+"""
+Policy QA graph: one retrieval per tool call
+- The tools node runs each retrieve_policy_info call once and fills
+  retrieved_chunks from the tool message artifact (no second search)
+
+Run from backend/: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+main = pytest.importorskip("src.main")
+
+
+class CountingEmbedder:
+    """Fixed query vector; counts how often the retriever embeds a query"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0]
+
+
+class ScriptedLLM:
+    """Stands in for the chat model: plays back the given responses in order"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        return self.responses.pop(0)
+
+
+def test_tools_node_embeds_once_and_stores_artifact(monkeypatch):
+    documents = [
+        Document(page_content="Leave requests go to HR.", metadata={"page": 4, "source": "policy.pdf"}),
+        Document(page_content="Parking is free for staff.", metadata={"page": 9, "source": "policy.pdf"}),
+    ]
+    embedder = CountingEmbedder()
+    retriever = main.NumpyRetriever(
+        vectors=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32),
+        documents=documents,
+        embeddings=embedder,
+        k=1,
+    )
+    llm = ScriptedLLM([
+        AIMessage(content="", tool_calls=[{
+            "name": "retrieve_policy_info", "args": {"query": "leave requests"}, "id": "call-1",
+        }]),
+        AIMessage(content="Leave requests go to HR."),
+    ])
+    monkeypatch.setattr(main.llm_clients, "chat_openai", lambda *args, **kwargs: llm)
+
+    graph = main.create_agent_graph(retriever)
+    state = graph.invoke(
+        {"messages": [HumanMessage(content="Who handles leave requests?")], "retrieved_chunks": []},
+        config={"configurable": {"thread_id": "test"}},
+    )
+
+    assert embedder.calls == 1
+    assert state["retrieved_chunks"] == [
+        {"content": "Leave requests go to HR.", "page": 4, "source": "policy.pdf", "index": 1},
+    ]
+    tool_message = next(m for m in state["messages"] if m.type == "tool")
+    assert tool_message.artifact == state["retrieved_chunks"]
@@ -0,0 +1,53 @@
+"""
+Market source badges: same output as the original substring loop
+- get_source_info must pick the first TRUSTED_INFO_SOURCES entry whose name
+  occurs in the host, exactly like `source_domain in domain` did
+
+Run from backend/: python -m pytest tests
+"""
+
+import random
+
+import pytest
+
+market = pytest.importorskip("src.market_info_tool")
+
+
+def reference_source_info(domain):
+    """get_source_info before the keyword matcher"""
+    for source_domain, config in market.TRUSTED_INFO_SOURCES.items():
+        if source_domain in domain:
+            priority = config["priority"]
+            if priority == "high":
+                badge = "⭐⭐⭐ VERIFIED"
+            elif priority == "medium":
+                badge = "⭐⭐ RELIABLE"
+            else:
+                badge = "⭐ STANDARD"
+            return {"badge": badge, "specialty": config["specialty"]}
+    return {"badge": "🔍 GENERAL SOURCE", "specialty": "Market information"}
+
+
+def sample_hosts(count=5000, seed=7):
+    names = list(market.TRUSTED_INFO_SOURCES)
+    hosts = [
+        "aqarmap.com.eg", "savills.com.eg", "cbre.com.eg", "news.jll.com.eg",
+        "notlexology.com", "example.org", "JLL.COM.EG", "cbe.org.eg.mirror.net",
+    ]
+    hosts += [market.extract_domain(f"https://www.{name}") for name in names]
+    rng = random.Random(seed)
+    for _ in range(count):
+        parts = [rng.choice(names).split("/", 1)[0] for _ in range(rng.randint(1, 2))]
+        parts.insert(rng.randint(0, len(parts)), rng.choice(["news", "ar", "x-", "com", "eg", ""]))
+        hosts.append(rng.choice([".", "-", ""]).join(part for part in parts if part))
+    return hosts
+
+
+def test_get_source_info_matches_reference():
+    for host in sample_hosts():
+        assert market.get_source_info(host) == reference_source_info(host), host
+
+
+def test_path_qualified_sources_do_not_badge_the_whole_site():
+    listing = market.extract_domain("https://aqarmap.com.eg/en/for-sale/apartment/cairo/")
+    assert market.get_source_info(listing) == market.GENERAL_SOURCE_INFO
@@ -3,7 +3,7 @@
 
 "use client";
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import dynamic from "next/dynamic";
 import { CopilotKit } from "@copilotkit/react-core";
 import { useCoAgent } from "@copilotkit/react-core";
@@ -64,7 +64,7 @@ interface AgentState {
   }>;
   saved_plots?: Array<{
     id: string;
-    data: any;
+    data?: any; // Older checkpoints inline the chart; new ones store only the id
   }>;
   user?: UserInfo; 
 }
@@ -169,6 +169,7 @@ function HomeContent({
   const [authModalMode, setAuthModalMode] = useState<"login" | "register">("login");
   const [messages, setMessages] = useState<AgentState["messages"]>([]);
   const [plots, setPlots] = useState<any[]>([]);
+  const plotCache = useRef<Map<string, any>>(new Map());
   const [isPlotsOpen, setIsPlotsOpen] = useState(true);
   const [isChatFullscreen, setIsChatFullscreen] = useState(false);
   const [projects, setProjects] = useState<any[]>([]);
@@ -198,10 +199,31 @@ function HomeContent({
   }, [state]);
 
   useEffect(() => {
-    if (state?.saved_plots && state.saved_plots.length > 0) {
-      setPlots(state.saved_plots);
+    if (!state?.saved_plots || state.saved_plots.length === 0) return;
+
+    // Plot ids are content hashes: dedupe them and fetch each payload once
+    const unique = Array.from(new Map(state.saved_plots.map((plot) => [plot.id, plot])).values());
+    let cancelled = false;
+
+    Promise.all(
+      unique.map(async (plot) => {
+        if (plot.data) return plot;
+        if (!plotCache.current.has(plot.id)) {
+          const response = await fetch(`http://localhost:8000/api/plots/${plot.id}`);
+          if (!response.ok) return { ...plot, data: null };
+          plotCache.current.set(plot.id, await response.json());
+        }
+        return { ...plot, data: plotCache.current.get(plot.id) };
+      })
+    ).then((loaded) => {
+      if (cancelled) return;
+      setPlots(loaded.filter((plot) => plot.data));
       setIsPlotsOpen(true);
-    }
+    });
+
+    return () => {
+      cancelled = true;
+    };
   }, [state?.saved_plots]);
 
   useEffect(() => {
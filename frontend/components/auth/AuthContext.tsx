@@ -188,7 +188,38 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({
     checkAuth();
   }, []);
 
-  const checkAuth = async () => {
+  const saveTokens = (data: { access_token: string; refresh_token?: string }) => {
+    localStorage.setItem("authToken", data.access_token);
+    if (data.refresh_token) {
+      localStorage.setItem("refreshToken", data.refresh_token);
+    }
+  };
+
+  const clearTokens = () => {
+    localStorage.removeItem("authToken");
+    localStorage.removeItem("refreshToken");
+  };
+
+  // Exchange the stored refresh token for a new pair (each refresh token works once)
+  const refreshSession = async (): Promise<boolean> => {
+    const refreshToken = localStorage.getItem("refreshToken");
+    if (!refreshToken) return false;
+
+    const response = await fetch("http://localhost:8000/api/auth/refresh", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!response.ok) return false;
+
+    saveTokens(await response.json());
+    console.log("🔄 Session refreshed");
+    return true;
+  };
+
+  const checkAuth = async (allowRefresh = true) => {
     try {
       const token = localStorage.getItem("authToken");
       console.log("🔍 Checking auth, token exists:", !!token);
@@ -209,13 +240,16 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({
         const userData = await response.json();
         console.log("✅ User authenticated:", userData);
         setUser(userData);
+      } else if (allowRefresh && (await refreshSession())) {
+        await checkAuth(false);
+        return;
       } else {
         console.log("❌ Token invalid, removing from storage");
-        localStorage.removeItem("authToken");
+        clearTokens();
       }
     } catch (error) {
       console.error("Auth check failed:", error);
-      localStorage.removeItem("authToken");
+      clearTokens();
     } finally {
       setLoading(false);
     }
@@ -240,7 +274,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({
       console.log("✅ Login response:", data);
       
       // ✅ FIX: Use data.access_token instead of data.token
-      localStorage.setItem("authToken", data.access_token);
+      saveTokens(data);
       setUser(data.user);
       
       console.log("🔐 Token saved to localStorage");
@@ -269,7 +303,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({
       console.log("✅ Register response:", data);
       
       // ✅ FIX: Use data.access_token instead of data.token
-      localStorage.setItem("authToken", data.access_token);
+      saveTokens(data);
       setUser(data.user);
       
       console.log("🔐 Token saved to localStorage");
@@ -282,18 +316,21 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({
   const logout = async () => {
     try {
       const token = localStorage.getItem("authToken");
-      if (token) {
+      const refreshToken = localStorage.getItem("refreshToken");
+      if (token || refreshToken) {
         await fetch("http://localhost:8000/api/auth/logout", {
           method: "POST",
           headers: {
-            Authorization: `Bearer ${token}`,
+            "Content-Type": "application/json",
+            ...(token ? { Authorization: `Bearer ${token}` } : {}),
           },
+          body: refreshToken ? JSON.stringify({ refresh_token: refreshToken }) : undefined,
         });
       }
     } catch (error) {
       console.error("Logout error:", error);
     } finally {
-      localStorage.removeItem("authToken");
+      clearTokens();
       setUser(null);
       console.log("✅ User logged out");
     }